@@ -0,0 +1,335 @@
+"""
+Бенчмарк всех эндпоинтов materials/urls.py и users/urls.py с контролем регрессий.
+
+Данные создает benchmarks.factory (детерминированно). Для каждого сценария
+записываются число SQL-запросов на запрос, p50/p95 времени ответа и пик
+выделенной памяти (tracemalloc), результаты сравниваются с baseline.json
+для текущей СУБД. Перед каждым запросом кэш очищается: замеряется путь без
+кэша ответов.
+
+Запуск на SQLite:
+    DB_ENGINE=sqlite python manage.py test benchmarks.bench_api --pattern="bench_*.py"
+На PostgreSQL тестовый раннер создает и удаляет временную БД test_<NAME>:
+    DB_ENGINE=postgresql NAME=school USER=... python manage.py test benchmarks.bench_api --pattern="bench_*.py"
+Обновление baseline.json для текущей СУБД (после осознанных изменений):
+    BENCH_UPDATE_BASELINE=1 python manage.py test benchmarks.bench_api --pattern="bench_*.py"
+
+Рост числа запросов - всегда регрессия. Время и память сравниваются
+с допуском, только если baseline записан с тем же BENCH_SCALE.
+"""
+import hashlib
+import hmac
+import json
+import os
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+import stripe
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from benchmarks import factory
+from benchmarks.bench_import import make_payload
+from benchmarks.fake_stripe import FakeStripeServer
+from benchmarks.utils import count_queries, print_table, summarize, timer
+from materials import transfer
+from materials.models import Course, Lesson
+from users.models import CustomUser, Payment
+from users.serializers import CustomTokenObtainPairSerializer
+
+SCALE = float(os.getenv('BENCH_SCALE', '1'))
+ROUNDS = int(os.getenv('BENCH_ROUNDS', '20'))
+LATENCY_TOLERANCE = float(os.getenv('BENCH_LATENCY_TOLERANCE', '2.0'))
+MEMORY_TOLERANCE = float(os.getenv('BENCH_MEMORY_TOLERANCE', '1.5'))
+UPDATE_BASELINE = bool(os.getenv('BENCH_UPDATE_BASELINE'))
+
+BASELINE_PATH = Path(__file__).with_name('baseline.json')
+# Абсолютный запас: у быстрых эндпоинтов велик относительный разброс
+LATENCY_SLACK_MS = 2.0
+MEMORY_SLACK_KB = 64
+
+WEBHOOK_SECRET = 'whsec_bench'
+# Уроков в импортируемом и выгружаемом курсе, не зависит от BENCH_SCALE
+TRANSFER_LESSONS = 20
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    # (номер раунда, результат prepare) -> аргументы метода тестового клиента
+    build: Callable
+    role: str = None  # None - анонимный запрос
+    status: tuple = (200,)
+    # Подготовка объекта вне замеров (например, для удаления)
+    prepare: Callable = None
+    rounds: int = None
+
+
+def request(path, data=None, **extra):
+    kwargs = {'path': path, **extra}
+    if data is not None:
+        kwargs.update(data=data, format='json')
+    return kwargs
+
+
+def load_baseline():
+    if not BASELINE_PATH.exists():
+        return {}
+    return json.loads(BASELINE_PATH.read_text(encoding='utf-8'))
+
+
+# AUTH_CACHE_ALLOW_LOCAL: пользователь берется из claims, как с Redis в CACHES['auth']
+@override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET, STRIPE_CHECKOUT_ASYNC=False, AUTH_CACHE_ALLOW_LOCAL=True)
+class APIBenchmark(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.fake_stripe = FakeStripeServer(latency=0).__enter__()
+        cls.addClassCleanup(cls.fake_stripe.__exit__, None, None, None)
+        original_api_base = stripe.api_base
+        stripe.api_base = cls.fake_stripe.url
+        cls.addClassCleanup(setattr, stripe, 'api_base', original_api_base)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = factory.seed(scale=SCALE)
+        cls.course_ids = list(Course.objects.order_by('id').values_list('id', flat=True)[:50])
+        cls.transfer_payload = make_payload(TRANSFER_LESSONS)
+        cls.export_course = transfer.import_course(cls.transfer_payload, owner=cls.data.owner)
+        cls.payment = Payment.objects.create(
+            user=cls.data.owner, paid_course=cls.data.course, amount=1000, payment_method='cash'
+        )
+        cls.unpaid_sessions = list(
+            Payment.objects.filter(payment_method='stripe', is_paid=False)
+            .order_by('id').values_list('stripe_session_id', flat=True)[:ROUNDS + 2]
+        )
+        cls.tokens = {
+            role: str(CustomTokenObtainPairSerializer.get_token(getattr(cls.data, role)).access_token)
+            for role in ('admin', 'moderator', 'owner', 'member')
+        }
+
+    def get_scenarios(self):
+        ds = self.data
+        course_url = reverse('courses-detail', args=[ds.course.id])
+        lesson_url = reverse('lessons-detail', args=[ds.lesson.id])
+        payment_url = reverse('payment-detail', args=[self.payment.id])
+
+        def new_course(i):
+            course = Course.objects.create(name=f'Удаляемый курс {i}', owner=ds.owner)
+            for n in range(3):
+                Lesson.objects.create(name=f'Урок {n}', course=course, owner=ds.owner)
+            return course
+
+        def webhook(i, prepared):
+            payload = json.dumps({
+                'id': f'evt_bench_{i}',
+                'object': 'event',
+                'type': 'checkout.session.completed',
+                'data': {'object': {
+                    'id': self.unpaid_sessions[i % len(self.unpaid_sessions)],
+                    'object': 'checkout.session',
+                    'payment_status': 'paid',
+                }},
+            })
+            timestamp = int(time.time())
+            signature = hmac.new(
+                WEBHOOK_SECRET.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256
+            ).hexdigest()
+            return {
+                'path': reverse('payment-webhook'),
+                'data': payload,
+                'content_type': 'application/json',
+                'HTTP_STRIPE_SIGNATURE': f't={timestamp},v1={signature}',
+            }
+
+        return [
+            # materials/urls.py
+            Scenario('courses list', 'get', lambda i, p: request(reverse('courses-list')), role='owner'),
+            Scenario('courses list moderator', 'get', lambda i, p: request(reverse('courses-list')), role='moderator'),
+            Scenario('courses list expand', 'get', lambda i, p: request(
+                reverse('courses-list') + '?expand=lessons&page_size=20'), role='moderator'),
+            Scenario('courses search', 'get', lambda i, p: request(
+                reverse('courses-list') + '?search=python&ordering=-popularity'), role='moderator'),
+            Scenario('courses create', 'post', lambda i, p: request(
+                reverse('courses-list'), {'name': f'Новый курс {i}'}), role='owner', status=(201,)),
+            Scenario('courses retrieve', 'get', lambda i, p: request(course_url), role='owner'),
+            Scenario('courses update', 'patch', lambda i, p: request(
+                course_url, {'name': f'Курс {i}'}), role='owner'),
+            Scenario('courses delete', 'delete', lambda i, course: request(
+                reverse('courses-detail', args=[course.id])), role='owner', status=(204,), prepare=new_course),
+            Scenario('lessons list', 'get', lambda i, p: request(reverse('lessons-list')), role='owner'),
+            Scenario('lessons list cursor', 'get', lambda i, p: request(
+                reverse('lessons-list') + '?pagination=cursor&page_size=50'), role='moderator'),
+            Scenario('lessons search', 'get', lambda i, p: request(
+                reverse('lessons-list') + '?search=django основы'), role='moderator'),
+            Scenario('lessons create', 'post', lambda i, p: request(reverse('lessons-list'), {
+                'name': f'Новый урок {i}', 'course': ds.course.id,
+                'video_link': 'https://www.youtube.com/watch?v=bench', 'owner': ds.owner.id,
+            }), role='owner', status=(201,)),
+            Scenario('lessons retrieve', 'get', lambda i, p: request(lesson_url), role='owner'),
+            Scenario('lessons update', 'patch', lambda i, p: request(
+                lesson_url, {'name': f'Урок {i}'}), role='owner'),
+            Scenario('lessons delete', 'delete', lambda i, lesson: request(
+                reverse('lessons-detail', args=[lesson.id])), role='owner', status=(204,),
+                prepare=lambda i: Lesson.objects.create(name=f'Урок {i}', course=ds.course, owner=ds.owner)),
+            Scenario('subscription toggle', 'post', lambda i, p: request(
+                reverse('subscription'), {'course_id': ds.course.id}), role='member', status=(200, 201)),
+            Scenario('subscription bulk', 'post', lambda i, p: request(
+                reverse('subscription-bulk'),
+                {'subscribe': self.course_ids} if i % 2 else {'unsubscribe': self.course_ids}
+            ), role='member'),
+            Scenario('courses import', 'post', lambda i, p: request(
+                reverse('courses-import'), self.transfer_payload), role='owner', status=(201,)),
+            Scenario('courses export', 'get', lambda i, p: request(
+                reverse('courses-export', args=[self.export_course.id]) + '?export_format=json'), role='owner'),
+            # Async-варианты (materials.async_views), тестовый клиент выполняет их через async_to_sync
+            Scenario('async courses list', 'get', lambda i, p: request(reverse('async-courses-list')), role='owner'),
+            Scenario('async courses retrieve', 'get', lambda i, p: request(
+                reverse('async-courses-detail', args=[ds.course.id])), role='owner'),
+            Scenario('async lessons list', 'get', lambda i, p: request(reverse('async-lessons-list')), role='owner'),
+            Scenario('async lessons retrieve', 'get', lambda i, p: request(
+                reverse('async-lessons-detail', args=[ds.lesson.id])), role='owner'),
+            Scenario('async subscription toggle', 'post', lambda i, p: request(
+                reverse('async-subscription'), {'course_id': ds.course.id}), role='member', status=(200, 201)),
+
+            # users/urls.py
+            Scenario('payments list', 'get', lambda i, p: request(reverse('payment-list')), role='admin'),
+            Scenario('payments list filtered', 'get', lambda i, p: request(
+                reverse('payment-list') + f'?course={ds.course.id}&payment_method=stripe'), role='admin'),
+            Scenario('payments export', 'get', lambda i, p: request(
+                reverse('payment-export') + f'?course={ds.course.id}'), role='admin'),
+            Scenario('payments create', 'post', lambda i, p: request(reverse('payment-list'), {
+                'user': ds.owner.id, 'paid_course': ds.course.id, 'amount': 1000, 'payment_method': 'cash',
+            }), role='admin', status=(201,)),
+            Scenario('payments retrieve', 'get', lambda i, p: request(payment_url), role='admin'),
+            Scenario('payments update', 'patch', lambda i, p: request(
+                payment_url, {'amount': 1000 + i}), role='admin'),
+            Scenario('payments delete', 'delete', lambda i, payment: request(
+                reverse('payment-detail', args=[payment.id])), role='admin', status=(204,),
+                prepare=lambda i: Payment.objects.create(user=ds.owner, amount=100, payment_method='cash')),
+            Scenario('stripe checkout', 'post', lambda i, p: request(
+                reverse('create-stripe-payment', args=[ds.course.id])), role='owner', status=(201,)),
+            Scenario('stripe checkout async', 'post', lambda i, p: request(
+                reverse('create-stripe-payment', args=[ds.course.id]) + '?async=true'), role='owner', status=(202,)),
+            Scenario('payment status', 'get', lambda i, p: request(
+                reverse('payment-status', args=[self.payment.id])), role='owner'),
+            Scenario('payment success', 'get', lambda i, p: request(
+                reverse('payment-success') + f'?session_id={self.unpaid_sessions[0]}'), role='owner'),
+            Scenario('payment cancel', 'get', lambda i, p: request(reverse('payment-cancel')), role='owner'),
+            Scenario('payment webhook', 'post', webhook),
+            Scenario('users list', 'get', lambda i, p: request(reverse('customuser-list')), role='admin'),
+            Scenario('users create', 'post', lambda i, p: request(reverse('customuser-list'), {
+                'email': f'created{i}@bench.test', 'password': factory.PASSWORD,
+            }), role='admin', status=(201,), rounds=5),
+            Scenario('users retrieve', 'get', lambda i, p: request(
+                reverse('customuser-detail', args=[ds.owner.id])), role='owner'),
+            Scenario('users update', 'patch', lambda i, p: request(
+                reverse('customuser-detail', args=[ds.owner.id]), {'city': f'Город {i}'}), role='owner'),
+            Scenario('users delete', 'delete', lambda i, user: request(
+                reverse('customuser-detail', args=[user.id])), role='admin', status=(204,),
+                prepare=lambda i: CustomUser.objects.create(email=f'deleted{i}@bench.test', username=f'deleted{i}')),
+            Scenario('register', 'post', lambda i, p: request(reverse('register'), {
+                'email': f'registered{i}@bench.test', 'password': factory.PASSWORD,
+            }), status=(201,), rounds=5),
+            Scenario('token obtain', 'post', lambda i, p: request(reverse('token_obtain_pair'), {
+                'email': ds.owner.email, 'password': factory.PASSWORD,
+            }), rounds=5),
+            Scenario('token refresh', 'post', lambda i, refresh: request(reverse('token_refresh'), {
+                'refresh': refresh,
+            }), prepare=lambda i: str(CustomTokenObtainPairSerializer.get_token(ds.owner))),
+        ]
+
+    def call(self, client, scenario, i):
+        prepared = scenario.prepare(i) if scenario.prepare else None
+        kwargs = scenario.build(i, prepared)
+        cache.clear()
+        response = getattr(client, scenario.method)(**kwargs)
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        self.assertIn(response.status_code, scenario.status, f'{scenario.name}: {content[:300]}')
+        return response
+
+    def measure(self, scenario):
+        client = APIClient()
+        if scenario.role:
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.tokens[scenario.role]}')
+        rounds = scenario.rounds or ROUNDS
+
+        # Прогрев: импорты, кэши Django и DRF, первый запрос к Stripe
+        self.call(client, scenario, 0)
+
+        tracemalloc.start()
+        try:
+            self.call(client, scenario, 1)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        timings, queries = [], []
+        for i in range(2, rounds + 2):
+            with count_queries() as counter, timer(timings):
+                self.call(client, scenario, i)
+            queries.append(counter.count)
+
+        summary = summarize(timings)
+        return {
+            'queries': max(queries),
+            'p50_ms': summary['p50_ms'],
+            'p95_ms': summary['p95_ms'],
+            'peak_kb': round(peak / 1024),
+        }
+
+    def compare(self, name, result, baseline, compare_timings):
+        """Список регрессий сценария относительно baseline"""
+        if baseline is None:
+            return []
+        problems = []
+        if result['queries'] > baseline['queries']:
+            problems.append(f"запросов {baseline['queries']} -> {result['queries']}")
+        if compare_timings:
+            if result['p50_ms'] > baseline['p50_ms'] * LATENCY_TOLERANCE + LATENCY_SLACK_MS:
+                problems.append(f"p50 {baseline['p50_ms']} -> {result['p50_ms']} мс")
+            if result['peak_kb'] > baseline['peak_kb'] * MEMORY_TOLERANCE + MEMORY_SLACK_KB:
+                problems.append(f"память {baseline['peak_kb']} -> {result['peak_kb']} КБ")
+        return [f'{name}: {problem}' for problem in problems]
+
+    def test_api(self):
+        vendor = connection.vendor
+        stored = load_baseline().get(vendor, {})
+        baseline = stored.get('scenarios', {})
+        compare_timings = stored.get('scale') == SCALE
+
+        results, rows, regressions = {}, [], []
+        for scenario in self.get_scenarios():
+            result = results[scenario.name] = self.measure(scenario)
+            problems = self.compare(scenario.name, result, baseline.get(scenario.name), compare_timings)
+            regressions += problems
+            base = baseline.get(scenario.name, {})
+            rows.append({
+                'scenario': scenario.name,
+                **result,
+                'base_queries': base.get('queries', '-'),
+                'base_p50_ms': base.get('p50_ms', '-'),
+                'status': 'REGRESSION' if problems else ('ok' if base else 'new'),
+            })
+
+        print_table(f'API ({vendor}, scale={SCALE}, {ROUNDS} запросов на сценарий)', rows)
+        if not compare_timings and baseline:
+            print(f'baseline записан с другим BENCH_SCALE: сравнивается только число запросов')
+
+        if UPDATE_BASELINE:
+            data = load_baseline()
+            data[vendor] = {'scale': SCALE, 'rounds': ROUNDS, 'scenarios': results}
+            BASELINE_PATH.write_text(
+                json.dumps(data, indent=2, ensure_ascii=False, sort_keys=True) + '\n', encoding='utf-8'
+            )
+            print(f'baseline обновлен: {BASELINE_PATH}')
+        elif regressions:
+            self.fail('Регрессии производительности:\n' + '\n'.join(regressions))
@@ -0,0 +1,172 @@
+"""
+Синхронные и async view под uvicorn при медленной БД.
+
+Запуск (используется временная тестовая БД, нужен uvicorn):
+    pip install uvicorn
+    python manage.py test benchmarks.bench_async --pattern="bench_*.py"
+
+Приложение (config.asgi) запускается uvicorn в отдельном потоке, каждый
+SQL-запрос сервера задерживается на BENCH_ASYNC_DB_LATENCY мс. Нагрузка -
+BENCH_ASYNC_REQUESTS запросов на каждый уровень параллельности
+BENCH_ASYNC_CONCURRENCY через keep-alive соединения (клиент на asyncio).
+
+Async ORM Django 5.2 выполняет запросы в потоке запроса (sync_to_async), а
+uvicorn не ограничивает число таких потоков, поэтому при одной задержке БД
+пропускная способность sync и async view близка: ее ограничивает
+процессорное время (GIL). Выигрыша async view этот бенчмарк не показывает:
+на SQLite разница на всех уровнях параллельности - до 20% в любую сторону
+и меняется от прогона к прогону.
+"""
+import asyncio
+import os
+import socket
+import threading
+import time
+import unittest
+
+from django.db.backends.signals import connection_created
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from benchmarks.utils import print_table, summarize
+from materials.models import Course, Lesson
+from users.models import CustomUser
+from users.serializers import CustomTokenObtainPairSerializer
+
+try:
+    import uvicorn
+except ImportError:
+    uvicorn = None
+
+REQUESTS = int(os.getenv('BENCH_ASYNC_REQUESTS', '200'))
+CONCURRENCY = [int(value) for value in os.getenv('BENCH_ASYNC_CONCURRENCY', '1,10,50').split(',')]
+DB_LATENCY = float(os.getenv('BENCH_ASYNC_DB_LATENCY', '20')) / 1000
+COURSES = 30
+
+ENDPOINTS = [
+    ('courses-list', {'page_size': 10}),
+    ('lessons-detail', {}),
+]
+
+
+def slow_query(execute, sql, params, many, context):
+    time.sleep(DB_LATENCY)
+    return execute(sql, params, many, context)
+
+
+def add_latency(sender, connection, **kwargs):
+    connection.execute_wrappers.append(slow_query)
+
+
+class Server:
+    """uvicorn в фоновом потоке на свободном порту"""
+
+    def __init__(self):
+        from config.asgi import application
+
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            self.port = sock.getsockname()[1]
+        self.server = uvicorn.Server(uvicorn.Config(application, port=self.port, log_level='warning', lifespan='off'))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+async def fetch(reader, writer, request):
+    writer.write(request)
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Сервер закрыл соединение')
+    status = int(status_line.split()[1])
+    length = 0
+    while (line := await reader.readline()) not in (b'\r\n', b''):
+        name, _, value = line.decode().partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def run_load(port, paths, token, concurrency):
+    """Запросы к paths через concurrency соединений; длительности и число ошибок"""
+    queue = asyncio.Queue()
+    for path in paths:
+        queue.put_nowait(path)
+    timings, errors = [], []
+
+    async def worker():
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            while not queue.empty():
+                path = queue.get_nowait()
+                request = (
+                    # testserver - в ALLOWED_HOSTS тестового окружения
+                    f'GET {path} HTTP/1.1\r\nHost: testserver\r\n'
+                    f'Authorization: Bearer {token}\r\n\r\n'
+                ).encode()
+                start = time.perf_counter()
+                status = await fetch(reader, writer, request)
+                timings.append(time.perf_counter() - start)
+                if status != 200:
+                    errors.append(status)
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return timings, errors, time.perf_counter() - start
+
+
+@unittest.skipIf(uvicorn is None, 'uvicorn не установлен')
+class AsyncViewsBenchmark(TransactionTestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='bench@test.com', password='benchpass123', username='bench'
+        )
+        for i in range(COURSES):
+            course = Course.objects.create(name=f'Course {i}', owner=self.user)
+            Lesson.objects.create(name=f'Lesson {i}', course=course, owner=self.user)
+        self.lesson = Lesson.objects.first()
+        self.token = str(CustomTokenObtainPairSerializer.get_token(self.user).access_token)
+        connection_created.connect(add_latency)
+        self.addCleanup(connection_created.disconnect, add_latency)
+
+    def get_paths(self, name, params, run):
+        args = [self.lesson.pk] if name.endswith('detail') else None
+        query = '&'.join(f'{key}={value}' for key, value in params.items())
+        # rnd - в обход кэша ответов синхронных view, уникален для каждого прогона
+        return [f'{reverse(name, args=args)}?{query}&rnd={run}-{i}' for i in range(REQUESTS)]
+
+    def test_async_views(self):
+        rows = []
+        with Server() as server:
+            for name, params in ENDPOINTS:
+                for concurrency in CONCURRENCY:
+                    for mode, url_name in (('sync', name), ('async', f'async-{name}')):
+                        paths = self.get_paths(url_name, params, run=len(rows))
+                        timings, errors, elapsed = asyncio.run(
+                            run_load(server.port, paths, self.token, concurrency)
+                        )
+                        self.assertEqual(errors, [])
+                        rows.append({
+                            'endpoint': name,
+                            'mode': mode,
+                            'concurrency': concurrency,
+                            'rps': round(len(timings) / elapsed, 1),
+                            **summarize(timings),
+                        })
+        print_table(
+            f'uvicorn, задержка БД {DB_LATENCY * 1000:.0f} мс на запрос, {REQUESTS} запросов на уровень',
+            rows
+        )
@@ -0,0 +1,89 @@
+"""
+Сравнение синхронного и асинхронного создания оплаты Stripe.
+
+Запуск (используется временная тестовая БД):
+    python manage.py test benchmarks.bench_checkout --pattern="bench_*.py"
+
+Stripe заменяется локальным сервером с задержкой FAKE_STRIPE_LATENCY секунд.
+"""
+import io
+import os
+import time
+
+import stripe
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from benchmarks.fake_stripe import FakeStripeServer
+from benchmarks.utils import print_table, summarize, timer
+from materials.models import Course
+from users.models import CheckoutJob, CustomUser, Payment
+
+REQUESTS = int(os.getenv('BENCH_CHECKOUT_REQUESTS', '30'))
+COURSES = int(os.getenv('BENCH_CHECKOUT_COURSES', '5'))
+LATENCY = float(os.getenv('FAKE_STRIPE_LATENCY', '0.1'))
+
+
+class CheckoutBenchmark(TransactionTestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='bench@test.com', password='benchpass123', username='bench'
+        )
+        self.courses = [
+            Course.objects.create(name=f'Course {i}', owner=self.user, price=1000 + i)
+            for i in range(COURSES)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.fake_stripe = FakeStripeServer(latency=LATENCY).__enter__()
+        self.addCleanup(self.fake_stripe.__exit__, None, None, None)
+        original_api_base = stripe.api_base
+        stripe.api_base = self.fake_stripe.url
+        self.addCleanup(setattr, stripe, 'api_base', original_api_base)
+
+    def checkout(self, query=''):
+        timings = []
+        for i in range(REQUESTS):
+            course = self.courses[i % COURSES]
+            with timer(timings):
+                response = self.client.post(
+                    reverse('create-stripe-payment', args=[course.id]) + query
+                )
+            self.assertIn(response.status_code, (201, 202), response.content)
+        return timings
+
+    def test_sync_vs_async_checkout(self):
+        rows = []
+
+        sync_timings = self.checkout()
+        rows.append({'mode': 'sync', 'stripe_calls': len(self.fake_stripe.calls), **summarize(sync_timings)})
+
+        calls_before = len(self.fake_stripe.calls)
+        async_timings = self.checkout('?async=true')
+        self.assertEqual(len(self.fake_stripe.calls), calls_before)
+
+        # SQLite не поддерживает конкурентную запись из нескольких потоков
+        workers = 1 if connection.vendor == 'sqlite' else 4
+        start = time.perf_counter()
+        call_command('run_checkout_worker', workers=workers, once=True, poll_interval=0, stdout=io.StringIO())
+        drain = time.perf_counter() - start
+        self.assertEqual(
+            CheckoutJob.objects.filter(status=CheckoutJob.STATUS_DONE).count(), REQUESTS
+        )
+        self.assertFalse(Payment.objects.filter(stripe_payment_link__isnull=True).exists())
+
+        rows.append({
+            'mode': 'async',
+            'stripe_calls': len(self.fake_stripe.calls) - calls_before,
+            **summarize(async_timings),
+        })
+        print_table(
+            f'Создание оплаты: {REQUESTS} запросов, задержка Stripe {LATENCY * 1000:.0f} мс',
+            rows
+        )
+        print(f'Обработка очереди ({workers} воркер(а)): {drain * 1000:.0f} мс')
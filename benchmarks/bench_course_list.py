@@ -0,0 +1,71 @@
+"""
+Компактный список курсов против полного (с уроками и описанием).
+
+Запуск (используется временная тестовая БД):
+    python manage.py test benchmarks.bench_course_list --pattern="bench_*.py"
+"""
+import os
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from benchmarks.utils import count_queries, print_table, summarize, timer
+from materials.models import Course, Lesson
+from users.models import CustomUser
+
+COURSES = int(os.getenv('BENCH_COURSE_LIST_COURSES', '100'))
+LESSONS_PER_COURSE = int(os.getenv('BENCH_COURSE_LIST_LESSONS', '20'))
+ROUNDS = int(os.getenv('BENCH_COURSE_LIST_ROUNDS', '30'))
+
+DESCRIPTION = 'Подробное описание материала. ' * 20
+
+FULL_FIELDS = ','.join([
+    'id', 'name', 'preview', 'preview_variants', 'description', 'owner', 'materials_link', 'price',
+    'lessons_count', 'subscribers_count', 'is_subscribed', 'lessons',
+])
+
+
+class CourseListBenchmark(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email='bench@test.com', password='benchpass123', username='bench'
+        )
+        courses = Course.objects.bulk_create([
+            Course(name=f'Course {i}', description=DESCRIPTION, owner=cls.user, lessons_count=LESSONS_PER_COURSE)
+            for i in range(COURSES)
+        ])
+        Lesson.objects.bulk_create([
+            Lesson(name=f'Lesson {i}', description=DESCRIPTION, course=course, owner=cls.user)
+            for course in courses
+            for i in range(LESSONS_PER_COURSE)
+        ], batch_size=5000)
+
+    def measure(self, params):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        timings = []
+        with count_queries() as counter:
+            for i in range(ROUNDS):
+                # rnd - в обход кэша ответов
+                with timer(timings):
+                    response = client.get(reverse('courses-list'), {'page_size': 50, 'rnd': i, **params})
+                self.assertEqual(response.status_code, 200)
+        return {
+            **summarize(timings),
+            'bytes': len(response.content),
+            'queries': round(counter.count / ROUNDS, 1),
+        }
+
+    def test_course_list(self):
+        rows = [
+            {'mode': 'full', **self.measure({'fields': FULL_FIELDS, 'expand': 'lessons'})},
+            {'mode': 'compact', **self.measure({})},
+            {'mode': 'fields=id,name', **self.measure({'fields': 'id,name'})},
+        ]
+        print_table(
+            f'Список курсов: {COURSES} курсов по {LESSONS_PER_COURSE} уроков, страница 50, {ROUNDS} запросов',
+            rows
+        )
@@ -0,0 +1,122 @@
+"""
+Импорт курса одним запросом против курса и уроков по одному POST, выгрузка курса.
+
+Запуск (используется временная тестовая БД):
+    python manage.py test benchmarks.bench_import --pattern="bench_*.py"
+
+Поштучный импорт (POST courses/ и POST lessons/ на каждый урок) выполняется
+для BENCH_IMPORT_SINGLE уроков, время на BENCH_IMPORT_LESSONS уроков
+пересчитывается пропорционально (столбец total_ms).
+"""
+import json
+import os
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from benchmarks.utils import count_queries, print_table, summarize, timer
+from config.renderers import dumps
+from materials.models import Course
+from users.models import CustomUser
+
+LESSONS = int(os.getenv('BENCH_IMPORT_LESSONS', '10000'))
+SINGLE = int(os.getenv('BENCH_IMPORT_SINGLE', '500'))
+ROUNDS = int(os.getenv('BENCH_IMPORT_ROUNDS', '3'))
+
+
+def make_payload(lessons):
+    return {
+        'name': 'Курс',
+        'description': 'Описание курса',
+        'materials_link': 'https://www.youtube.com/playlist?list=bench',
+        'price': 1000,
+        'lessons': [
+            {
+                'name': f'Урок {i}',
+                'description': ' '.join([f'Описание урока {i}'] * 10),
+                'video_link': f'https://www.youtube.com/watch?v={i}',
+                'materials_link': None,
+            }
+            for i in range(lessons)
+        ]
+    }
+
+
+class ImportBenchmark(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email='bench@test.com', password='benchpass123', username='bench'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.payload = make_payload(LESSONS)
+
+    def row(self, mode, lessons, queries, timings):
+        stats = summarize(timings)
+        return {
+            'mode': mode,
+            'lessons': lessons,
+            'queries': queries,
+            **stats,
+            'total_ms': round(stats['mean_ms'] * LESSONS / lessons, 1),
+        }
+
+    def import_single(self, timings):
+        lessons = self.payload['lessons'][:SINGLE]
+        course_data = {key: value for key, value in self.payload.items() if key != 'lessons'}
+        with count_queries() as counter, timer(timings):
+            response = self.client.post(reverse('courses-list'), course_data, format='json')
+            self.assertEqual(response.status_code, 201)
+            course_id = response.json()['id']
+            for lesson in lessons:
+                response = self.client.post(reverse('lessons-list'), {**lesson, 'course': course_id}, format='json')
+                self.assertEqual(response.status_code, 201)
+        return counter.count
+
+    def import_bulk(self, content, content_type, timings):
+        with count_queries() as counter, timer(timings):
+            response = self.client.post(reverse('courses-import'), content, content_type=content_type)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['lessons_count'], LESSONS)
+        return counter.count
+
+    def export(self, course_id, export_format, timings):
+        with count_queries() as counter, timer(timings):
+            response = self.client.get(reverse('courses-export', args=[course_id]), {'export_format': export_format})
+            content = b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        return counter.count, content
+
+    def test_import_export(self):
+        rows = []
+
+        timings, queries = [], 0
+        for _ in range(ROUNDS):
+            queries = self.import_single(timings)
+        rows.append(self.row('POST course + lessons', SINGLE, queries, timings))
+
+        timings = []
+        for _ in range(ROUNDS):
+            queries = self.import_bulk(dumps(self.payload), 'application/json', timings)
+        rows.append(self.row('import json', LESSONS, queries, timings))
+        course_id = Course.objects.latest('pk').pk
+
+        exported = {}
+        for export_format in ('json', 'ndjson'):
+            timings = []
+            for _ in range(ROUNDS):
+                queries, exported[export_format] = self.export(course_id, export_format, timings)
+            rows.append(self.row(f'export {export_format}', LESSONS, queries, timings))
+        self.assertEqual(json.loads(exported['json']), self.payload)
+
+        timings = []
+        for _ in range(ROUNDS):
+            queries = self.import_bulk(exported['ndjson'], 'application/x-ndjson', timings)
+        rows.append(self.row('import ndjson', LESSONS, queries, timings))
+
+        print_table(f'Импорт и выгрузка курса, {LESSONS} уроков, {ROUNDS} повторов', rows)
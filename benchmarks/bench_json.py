@@ -0,0 +1,84 @@
+"""
+JSON-рендеринг: orjson против стандартного json на эндпоинтах API.
+
+Запуск (используется временная тестовая БД):
+    python manage.py test benchmarks.bench_json --pattern="bench_*.py"
+"""
+import os
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from benchmarks.utils import print_table, summarize, timer
+from config.renderers import ORJSONRenderer
+from materials.models import Course, Lesson
+from users.models import CustomUser, Payment
+
+ROWS = int(os.getenv('BENCH_JSON_ROWS', '5000'))
+ROUNDS = int(os.getenv('BENCH_JSON_ROUNDS', '20'))
+
+DESCRIPTION = 'Подробное описание материала. ' * 10
+
+ENDPOINTS = [
+    ('courses ?expand=lessons', 'courses-list', {'page_size': 20, 'expand': 'lessons'}),
+    ('lessons', 'lessons-list', {'page_size': 50}),
+    ('payments', 'payment-list', {'page_size': 100}),
+    ('payments export', 'payment-export', {}),
+]
+
+
+class JSONRendererBenchmark(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_superuser(
+            email='bench@test.com', password='benchpass123', username='bench'
+        )
+        courses = Course.objects.bulk_create([
+            Course(name=f'Course {i}', description=DESCRIPTION, owner=cls.user) for i in range(20)
+        ])
+        Lesson.objects.bulk_create([
+            Lesson(name=f'Lesson {i}', description=DESCRIPTION, course=courses[i % 20], owner=cls.user)
+            for i in range(1000)
+        ])
+        Payment.objects.bulk_create([
+            Payment(user=cls.user, paid_course=courses[i % 20], amount=1000 + i, payment_method='transfer')
+            for i in range(ROWS)
+        ], batch_size=5000)
+
+    def measure(self, mode, url_name, params):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        render_timings, request_timings = [], []
+        for i in range(ROUNDS):
+            # rnd - в обход кэша ответов
+            with timer(request_timings):
+                response = client.get(reverse(url_name), {**params, 'rnd': f'{mode}{i}'})
+                content = b''.join(response.streaming_content) if response.streaming else response.content
+            self.assertEqual(response.status_code, 200)
+            if not response.streaming:
+                with timer(render_timings):
+                    ORJSONRenderer().render(response.data)
+        return {
+            'request': summarize(request_timings)['p50_ms'],
+            'render': summarize(render_timings)['p50_ms'] if render_timings else '-',
+            'kb': round(len(content) / 1024),
+        }
+
+    def test_json(self):
+        rows = []
+        for name, url_name, params in ENDPOINTS:
+            fast = self.measure('orjson', url_name, params)
+            with mock.patch('config.renderers.orjson', None):
+                stdlib = self.measure('json', url_name, params)
+            rows.append({
+                'endpoint': name,
+                'kb': fast['kb'],
+                'json_p50_ms': stdlib['request'],
+                'orjson_p50_ms': fast['request'],
+                'json_render_ms': stdlib['render'],
+                'orjson_render_ms': fast['render'],
+            })
+        print_table(f'JSON: {ROUNDS} запросов на эндпоинт, {ROWS} платежей', rows)
@@ -0,0 +1,87 @@
+"""
+Полнотекстовый поиск уроков против поиска подстроки (icontains).
+
+Запуск (используется временная тестовая БД):
+    python manage.py test benchmarks.bench_search --pattern="bench_*.py"
+"""
+import os
+import random
+
+from django.db.models import Q
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from benchmarks.utils import count_queries, print_table, summarize, timer
+from materials.models import Course, Lesson
+from materials.search import search
+from users.models import CustomUser
+
+LESSONS = int(os.getenv('BENCH_SEARCH_LESSONS', '100000'))
+ROUNDS = int(os.getenv('BENCH_SEARCH_ROUNDS', '20'))
+
+SYLLABLES = ['ка', 'ро', 'ми', 'ны', 'те', 'ла', 'во', 'зу', 'пе', 'ди', 'ша', 'гу', 'фе', 'хо', 'бю', 'жа']
+# Словарь из 4096 псевдослов: каждое слово встречается в малой доле уроков
+WORDS = [a + b + c for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES]
+QUERIES = [WORDS[7], f'{WORDS[100]} {WORDS[2000]}', WORDS[4000], 'python']
+
+
+class SearchBenchmark(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email='bench@test.com', password='benchpass123', username='bench'
+        )
+        courses = Course.objects.bulk_create([Course(name=f'Course {i}', owner=cls.user) for i in range(100)])
+        # Фиксированное зерно: одинаковые данные при каждом запуске
+        rng = random.Random(42)
+        Lesson.objects.bulk_create(
+            [
+                Lesson(
+                    name=' '.join(rng.sample(WORDS, 3)) + (' python' if i % 100 == 0 else ''),
+                    description=' '.join(rng.choices(WORDS, k=30)),
+                    course=courses[i % len(courses)],
+                    owner=cls.user
+                )
+                for i in range(LESSONS)
+            ],
+            batch_size=5000
+        )
+
+    def measure(self, make_queryset):
+        timings = []
+        for i in range(ROUNDS):
+            query = QUERIES[i % len(QUERIES)]
+            with timer(timings):
+                queryset = make_queryset(query)
+                list(queryset[:10])
+                queryset.count()
+        return timings
+
+    def test_search(self):
+        rows = [
+            {
+                'mode': 'fts',
+                **summarize(self.measure(lambda query: search(Lesson.objects.all(), query).order_by('-search_rank'))),
+            },
+            {
+                'mode': 'icontains',
+                **summarize(self.measure(lambda query: Lesson.objects.filter(
+                    *[Q(name__icontains=word) | Q(description__icontains=word) for word in query.split()]
+                ).order_by('id'))),
+            },
+        ]
+
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        timings = []
+        with count_queries() as counter:
+            for i in range(ROUNDS):
+                with timer(timings):
+                    response = client.get(reverse('lessons-list'), {'search': QUERIES[i % len(QUERIES)], 'rnd': i})
+                self.assertEqual(response.status_code, 200)
+        rows.append({'mode': 'api ?search=', **summarize(timings)})
+
+        print_table(f'Поиск по {LESSONS} урокам, {ROUNDS} запросов (первые 10 + count)', rows)
+        print(f'SQL-запросов на API-запрос: {counter.count / ROUNDS:.1f}')
@@ -0,0 +1,76 @@
+"""
+Сериализация списков: ModelSerializer против values() и compile_fields.
+
+Запуск (используется временная тестовая БД):
+    python manage.py test benchmarks.bench_serialization --pattern="bench_*.py"
+"""
+import os
+
+from django.test import RequestFactory, TestCase
+from rest_framework.renderers import JSONRenderer
+
+from benchmarks.utils import print_table, summarize, timer
+from config.fast_serialization import compile_fields, represent_rows
+from materials.models import Course, Lesson
+from materials.serializers import LessonSerializer
+from users.models import CustomUser, Payment
+from users.serializers import PaymentSerializer
+
+ROWS = int(os.getenv('BENCH_SERIALIZATION_ROWS', '10000'))
+ROUNDS = int(os.getenv('BENCH_SERIALIZATION_ROUNDS', '5'))
+
+
+class SerializationBenchmark(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email='bench@test.com', password='benchpass123', username='bench'
+        )
+        courses = Course.objects.bulk_create([Course(name=f'Course {i}', owner=cls.user) for i in range(100)])
+        Lesson.objects.bulk_create([
+            Lesson(
+                name=f'Lesson {i}',
+                description='Описание урока. ' * 10,
+                preview=f'images/lesson_previews/{i}.png' if i % 2 else '',
+                video_link='https://youtube.com/watch?v=x',
+                course=courses[i % len(courses)],
+                owner=cls.user
+            )
+            for i in range(ROWS)
+        ], batch_size=5000)
+        Payment.objects.bulk_create([
+            Payment(
+                user=cls.user,
+                paid_course=courses[i % len(courses)] if i % 3 else None,
+                amount=1000 + i,
+                payment_method='transfer',
+                is_paid=bool(i % 2)
+            )
+            for i in range(ROWS)
+        ], batch_size=5000)
+
+    def measure(self, serializer_class, queryset):
+        request = RequestFactory().get('/')
+        renderer = JSONRenderer()
+        serializer_timings, fast_timings = [], []
+        for _ in range(ROUNDS):
+            with timer(serializer_timings):
+                expected = renderer.render(serializer_class(queryset.all(), many=True, context={'request': request}).data)
+            with timer(fast_timings):
+                compiled = compile_fields(serializer_class(context={'request': request}))
+                rows = queryset.values(*{column for _, column, _ in compiled})
+                actual = renderer.render(represent_rows(rows, compiled))
+            self.assertEqual(actual, expected)
+        return summarize(serializer_timings), summarize(fast_timings)
+
+    def test_serialization(self):
+        rows = []
+        for name, serializer_class, queryset in [
+            ('lessons', LessonSerializer, Lesson.objects.order_by('id')),
+            ('payments', PaymentSerializer, Payment.objects.order_by('-payment_date', '-id')),
+        ]:
+            serializer_summary, fast_summary = self.measure(serializer_class, queryset)
+            rows.append({'list': name, 'mode': 'ModelSerializer', **serializer_summary})
+            rows.append({'list': name, 'mode': 'values()', **fast_summary})
+        print_table(f'Сериализация {ROWS} строк с рендерингом JSON, {ROUNDS} повторов', rows)
@@ -0,0 +1,68 @@
+"""
+Массовая подписка против поштучного переключения подписок.
+
+Запуск (используется временная тестовая БД):
+    python manage.py test benchmarks.bench_subscriptions --pattern="bench_*.py"
+"""
+import os
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from benchmarks.utils import count_queries, print_table, summarize, timer
+from materials.models import Course, Subscription
+from users.models import CustomUser
+
+IDS = int(os.getenv('BENCH_SUBSCRIPTION_IDS', '1000'))
+ROUNDS = int(os.getenv('BENCH_SUBSCRIPTION_ROUNDS', '5'))
+
+
+class SubscriptionBenchmark(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email='bench@test.com', password='benchpass123', username='bench'
+        )
+        Course.objects.bulk_create([Course(name=f'Course {i}', owner=cls.user) for i in range(IDS)])
+        cls.course_ids = list(Course.objects.values_list('id', flat=True))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def bulk(self, payload, timings):
+        with count_queries() as counter, timer(timings):
+            response = self.client.post(reverse('subscription-bulk'), payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        return counter.count
+
+    def toggle(self, timings):
+        with count_queries() as counter, timer(timings):
+            for course_id in self.course_ids:
+                response = self.client.post(reverse('subscription'), {'course_id': course_id}, format='json')
+                self.assertIn(response.status_code, (200, 201))
+        return counter.count
+
+    def test_bulk_vs_toggle(self):
+        rows = []
+
+        timings, queries = [], 0
+        for _ in range(ROUNDS):
+            queries = self.toggle(timings)
+            self.assertEqual(Subscription.objects.count(), IDS)
+            self.toggle([])
+            self.assertEqual(Subscription.objects.count(), 0)
+        rows.append({'mode': f'toggle x{IDS}', 'queries': queries, **summarize(timings)})
+
+        subscribe_timings, unsubscribe_timings = [], []
+        for _ in range(ROUNDS):
+            subscribe_queries = self.bulk({'subscribe': self.course_ids}, subscribe_timings)
+            self.assertEqual(Subscription.objects.count(), IDS)
+            unsubscribe_queries = self.bulk({'unsubscribe': self.course_ids}, unsubscribe_timings)
+            self.assertEqual(Subscription.objects.count(), 0)
+        rows.append({'mode': 'bulk subscribe', 'queries': subscribe_queries, **summarize(subscribe_timings)})
+        rows.append({'mode': 'bulk unsubscribe', 'queries': unsubscribe_queries, **summarize(unsubscribe_timings)})
+
+        print_table(f'Подписка на {IDS} курсов, {ROUNDS} повторов', rows)
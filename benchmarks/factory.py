@@ -0,0 +1,120 @@
+"""
+Детерминированное заполнение БД для бенчмарков.
+
+Одинаковые scale и seed дают одинаковые данные, поэтому число запросов
+и размер ответов сравнимы между запусками. Объекты создаются через
+bulk_create, счетчики курсов пересчитываются reconcile().
+"""
+import random
+from dataclasses import dataclass, field
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+
+from materials import counters
+from materials.models import Course, Lesson, Subscription
+from users.models import CustomUser, Payment
+from users.roles import MODERATORS_GROUP
+
+PASSWORD = 'benchpass123'
+
+# Количество объектов при scale=1
+SIZES = {
+    'users': 2000,
+    'courses': 500,
+    'lessons': 5000,
+    'subscriptions': 10000,
+    'payments': 10000,
+}
+# Курсы принадлежат первым OWNERS пользователям
+OWNERS = 100
+
+CITIES = ['Москва', 'Санкт-Петербург', 'Казань', 'Новосибирск', 'Екатеринбург']
+WORDS = ['python', 'django', 'основы', 'практикум', 'алгоритмы', 'базы', 'данных', 'веб', 'тестирование', 'api']
+
+
+@dataclass
+class Dataset:
+    admin: CustomUser
+    moderator: CustomUser
+    owner: CustomUser  # владелец курсов, обычный пользователь
+    member: CustomUser  # пользователь без своих курсов
+    course: Course  # курс owner
+    lesson: Lesson  # урок owner
+    sizes: dict = field(default_factory=dict)
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def seed(scale=1.0, seed=42):
+    """Заполнение пустой БД, возвращает Dataset с объектами для сценариев"""
+    rng = random.Random(seed)
+    sizes = {name: max(OWNERS, int(size * scale)) for name, size in SIZES.items()}
+    # Один хэш на всех: PBKDF2 для тысяч пользователей занял бы минуты
+    password = make_password(PASSWORD)
+
+    admin = CustomUser.objects.create(
+        email='admin@bench.test', username='admin', password=password, is_staff=True, is_superuser=True
+    )
+    moderator = CustomUser.objects.create(email='moderator@bench.test', username='moderator', password=password)
+    moderator.groups.add(Group.objects.get_or_create(name=MODERATORS_GROUP)[0])
+
+    users = CustomUser.objects.bulk_create([
+        CustomUser(email=f'user{i}@bench.test', username=f'user{i}', password=password, city=rng.choice(CITIES))
+        for i in range(sizes['users'])
+    ], batch_size=1000)
+
+    courses = Course.objects.bulk_create([
+        Course(
+            name=f'{_text(rng, 2).capitalize()} {i}',
+            description=_text(rng, 30),
+            owner=users[i % OWNERS],
+            price=rng.randrange(1000, 50000, 500)
+        )
+        for i in range(sizes['courses'])
+    ], batch_size=1000)
+
+    lessons = []
+    for i in range(sizes['lessons']):
+        course = courses[rng.randrange(len(courses))] if i >= len(courses) else courses[i]
+        lessons.append(Lesson(
+            name=f'{_text(rng, 3).capitalize()} {i}',
+            description=_text(rng, 50),
+            video_link='https://www.youtube.com/watch?v=bench',
+            course=course,
+            owner=course.owner
+        ))
+    Lesson.objects.bulk_create(lessons, batch_size=1000)
+
+    pairs = rng.sample(range(len(users) * len(courses)), sizes['subscriptions'])
+    Subscription.objects.bulk_create([
+        Subscription(user=users[pair // len(courses)], course=courses[pair % len(courses)])
+        for pair in pairs
+    ], batch_size=1000)
+
+    payments = []
+    for i in range(sizes['payments']):
+        course = courses[rng.randrange(len(courses))]
+        method = rng.choice(['cash', 'transfer', 'stripe'])
+        payments.append(Payment(
+            user=users[rng.randrange(len(users))],
+            paid_course=course,
+            amount=course.price,
+            payment_method=method,
+            stripe_session_id=f'cs_bench_{i}' if method == 'stripe' else None,
+            is_paid=rng.random() < 0.8
+        ))
+    Payment.objects.bulk_create(payments, batch_size=1000)
+
+    counters.reconcile()
+    return Dataset(
+        admin=admin,
+        moderator=moderator,
+        owner=users[0],
+        member=users[-1],
+        course=courses[0],
+        lesson=Lesson.objects.filter(owner=users[0]).order_by('id').first(),
+        sizes=sizes
+    )
@@ -0,0 +1,92 @@
+"""
+Локальный HTTP-сервер, имитирующий нужную проекту часть API Stripe.
+
+Используется в бенчмарках вместо api.stripe.com: задержка каждого ответа
+задается параметром latency, счетчик calls показывает число обращений.
+"""
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+OBJECTS = {
+    '/v1/products': ('product', 'prod'),
+    '/v1/prices': ('price', 'price'),
+    '/v1/checkout/sessions': ('checkout.session', 'cs_test'),
+}
+
+
+class FakeStripeServer:
+    def __init__(self, latency=0.1):
+        self.latency = latency
+        self.calls = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self, path):
+        return sum(call == path for call in self.calls)
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                params = parse_qs(self.rfile.read(length).decode())
+                time.sleep(fake.latency)
+                if self.path not in OBJECTS:
+                    return self._reply(404, {'error': {'message': 'Not found'}})
+
+                with fake._lock:
+                    fake.calls.append(self.path)
+                    object_id = f'{OBJECTS[self.path][1]}_{next(fake._ids)}'
+                body = {'id': object_id, 'object': OBJECTS[self.path][0]}
+                body.update({key: values[0] for key, values in params.items() if '[' not in key})
+                if self.path == '/v1/checkout/sessions':
+                    body['url'] = f'https://checkout.stripe.test/{object_id}'
+                self._reply(200, body)
+
+            def do_GET(self):
+                # Получение сессии оплаты: сессия всегда не оплачена
+                time.sleep(fake.latency)
+                prefix = '/v1/checkout/sessions/'
+                if not self.path.startswith(prefix):
+                    return self._reply(404, {'error': {'message': 'Not found'}})
+                with fake._lock:
+                    fake.calls.append(prefix)
+                self._reply(200, {
+                    'id': self.path[len(prefix):].split('?')[0],
+                    'object': 'checkout.session',
+                    'payment_status': 'unpaid',
+                })
+
+            def _reply(self, code, body):
+                payload = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,68 @@
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(timings):
+    """Сводка по списку длительностей в секундах (результат в миллисекундах)"""
+    return {
+        'n': len(timings),
+        'mean_ms': round(statistics.fmean(timings) * 1000, 2) if timings else 0.0,
+        'p50_ms': round(percentile(timings, 50) * 1000, 2),
+        'p95_ms': round(percentile(timings, 95) * 1000, 2),
+    }
+
+
+@contextmanager
+def timer(timings):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.append(time.perf_counter() - start)
+
+
+class QueryCounter:
+    """
+    Счетчик SQL-запросов через execute_wrapper.
+
+    В отличие от CaptureQueriesContext не сбрасывается сигналом
+    request_started, поэтому подходит для серии запросов тестового клиента.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def count_queries():
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        yield counter
+
+
+def print_table(title, rows):
+    """Печать результатов: rows - список словарей с одинаковыми ключами"""
+    print(f'\n{title}')
+    if not rows:
+        return
+    columns = list(rows[0])
+    widths = [max(len(str(column)), *(len(str(row[column])) for row in rows)) for column in columns]
+    print('  '.join(str(column).ljust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print('  '.join(str(row[column]).ljust(width) for column, width in zip(columns, widths)))
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class ProjectConfig(AppConfig):
+    name = 'config'
+    verbose_name = 'Настройки проекта'
+
+    def ready(self):
+        import config.db  # noqa: F401
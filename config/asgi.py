@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Under ASGI each request runs in its own thread, so persistent connections
+(CONN_MAX_AGE) are not reused between requests. Set DB_POOL=True to use the
+psycopg3 connection pool instead; it is opened here when the worker starts.
 """
 
 import os
@@ -14,3 +18,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_asgi_application()
+
+from config.db import open_connection_pools  # noqa: E402
+
+open_connection_pools()
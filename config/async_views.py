@@ -0,0 +1,180 @@
+"""
+Асинхронные view для ASGI.
+
+DRF 3.16 не поддерживает async-обработчики: APIView.dispatch синхронный, и под
+ASGI каждый запрос к нему выполняется в отдельном потоке. AsyncAPIView - это
+Django async view, который повторяет основные этапы APIView: Request с
+парсерами, аутентификацию, проверку прав и обработку APIException. Отличия:
+
+- аутентификация (aauthenticate) и права (ahas_permission, см.
+  users.permissions.AsyncPermissionMixin) ожидаются через await;
+- ответ всегда JSON (config.renderers.dumps), без content negotiation;
+- view не попадают в схему OpenAPI.
+
+Все middleware проекта поддерживают async, поэтому под ASGI такие view
+выполняются в цикле событий, а в потоки уходят только запросы к БД
+(выигрыша в пропускной способности это не дает, см. benchmarks/bench_async.py).
+"""
+import math
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from django_filters.utils import translate_validation
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework.views import exception_handler
+
+from config.renderers import dumps
+from users.permissions import IsAuthenticated
+
+
+def json_response(data, status=200, headers=None):
+    return HttpResponse(dumps(data), status=status, headers=headers, content_type='application/json')
+
+
+class AsyncAPIView(View):
+    """
+    Базовый async view с аутентификацией и правами DRF.
+
+    Обработчики (async def get/post) возвращают json_response.
+    """
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    parser_classes = api_settings.DEFAULT_PARSER_CLASSES
+    permission_classes = [IsAuthenticated]
+    filterset_class = None
+    pagination_class = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Аутентификация по JWT без сессий: CSRF не нужен, как и в APIView
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    def get_permissions(self):
+        return [permission() for permission in self.permission_classes]
+
+    def get_serializer_context(self):
+        return {'request': self.request, 'view': self, 'format': None}
+
+    async def perform_authentication(self, request):
+        for authenticator in request.authenticators:
+            if hasattr(authenticator, 'aauthenticate'):
+                result = await authenticator.aauthenticate(request)
+            else:
+                result = await sync_to_async(authenticator.authenticate)(request)
+            if result is not None:
+                request.user, request.auth = result
+                return
+        request.user, request.auth = AnonymousUser(), None
+
+    def permission_denied(self, request, permission):
+        if not request.user.is_authenticated:
+            raise exceptions.NotAuthenticated()
+        raise exceptions.PermissionDenied(getattr(permission, 'message', None))
+
+    async def check_permissions(self, request):
+        for permission in self.get_permissions():
+            if not await permission.ahas_permission(request, self):
+                self.permission_denied(request, permission)
+
+    async def check_object_permissions(self, request, obj):
+        for permission in self.get_permissions():
+            if not await permission.ahas_object_permission(request, self, obj):
+                self.permission_denied(request, permission)
+
+    def filter_queryset(self, queryset):
+        """Фильтры django-filter, как у DjangoFilterBackend (queryset не выполняется)"""
+        if self.filterset_class is None:
+            return queryset
+        filterset = self.filterset_class(self.request.query_params, queryset=queryset, request=self.request)
+        if not filterset.is_valid():
+            raise translate_validation(filterset.errors)
+        return filterset.qs
+
+    async def paginate_queryset(self, queryset):
+        """
+        Страница в формате PageNumberPagination: count, next, previous, results.
+
+        Режимы ?pagination=cursor и ?count=approx синхронного API не поддерживаются.
+        """
+        paginator = self.pagination_class()
+        page_size = paginator.get_page_size(self.request)
+        count = await queryset.acount()
+        num_pages = max(1, math.ceil(count / page_size))
+
+        page_number = self.request.query_params.get(paginator.page_query_param) or 1
+        if page_number in paginator.last_page_strings:
+            page_number = num_pages
+        try:
+            page_number = int(page_number)
+        except ValueError:
+            page_number = 0
+        if not 1 <= page_number <= num_pages:
+            raise exceptions.NotFound(
+                paginator.invalid_page_message.format(page_number=page_number, message='Неверная страница')
+            )
+
+        offset = (page_number - 1) * page_size
+        url = self.request.build_absolute_uri()
+        if page_number == 1:
+            previous_url = None
+        elif page_number == 2:
+            previous_url = remove_query_param(url, paginator.page_query_param)
+        else:
+            previous_url = replace_query_param(url, paginator.page_query_param, page_number - 1)
+        return {
+            'count': count,
+            'next': (
+                replace_query_param(url, paginator.page_query_param, page_number + 1)
+                if page_number < num_pages else None
+            ),
+            'previous': previous_url,
+            'results': [obj async for obj in queryset[offset:offset + page_size]],
+        }
+
+    async def get_object(self, queryset, **lookup):
+        try:
+            obj = await queryset.aget(**lookup)
+        except queryset.model.DoesNotExist:
+            raise exceptions.NotFound()
+        await self.check_object_permissions(self.request, obj)
+        return obj
+
+    def handle_exception(self, exc):
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            authenticators = self.request.authenticators
+            header = authenticators[0].authenticate_header(self.request) if authenticators else None
+            if header:
+                exc.auth_header = header
+            else:
+                exc.status_code = 403
+
+        response = exception_handler(exc, {'view': self, 'request': self.request})
+        if response is None:
+            raise exc
+        headers = {name: value for name, value in response.items() if name != 'Content-Type'}
+        return json_response(response.data, status=response.status_code, headers=headers)
+
+    async def dispatch(self, request, *args, **kwargs):
+        method = request.method.lower()
+        handler = getattr(self, method, None) if method in self.http_method_names else None
+        if handler is None:
+            return await self.http_method_not_allowed(request, *args, **kwargs)
+        if method == 'options':
+            return await handler(request, *args, **kwargs)
+
+        self.request = request = Request(
+            request,
+            parsers=[parser() for parser in self.parser_classes],
+            authenticators=[authenticator() for authenticator in self.authentication_classes],
+        )
+        try:
+            await self.perform_authentication(request)
+            await self.check_permissions(request)
+            return await handler(request, *args, **kwargs)
+        except Exception as exc:
+            return self.handle_exception(exc)
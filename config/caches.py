@@ -0,0 +1,28 @@
+"""
+Проверка бэкендов кэша.
+
+LocMemCache хранит данные в памяти процесса, DummyCache не хранит их
+вовсе, поэтому запись, сделанная одним воркером, не видна остальным.
+Состояние, которое должно быть общим для процессов (версия кэша ответов,
+отзыв токенов), можно хранить только в общем бэкенде: Redis, Memcached,
+база данных, файлы. База данных и файлы общие, но обращение к ним стоит
+как запрос к БД, поэтому ради экономии запросов нужен кэш в памяти.
+"""
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+
+LOCAL_BACKENDS = (LocMemCache, DummyCache)
+SLOW_BACKENDS = (DatabaseCache, FileBasedCache)
+
+
+def is_shared(alias=DEFAULT_CACHE_ALIAS):
+    """Общий ли для процессов кэш с псевдонимом alias из CACHES"""
+    return not isinstance(caches[alias], LOCAL_BACKENDS)
+
+
+def is_shared_memory(alias=DEFAULT_CACHE_ALIAS):
+    """Общий для процессов кэш в памяти (Redis, Memcached)"""
+    return is_shared(alias) and not isinstance(caches[alias], SLOW_BACKENDS)
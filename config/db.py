@@ -0,0 +1,105 @@
+"""
+Метрики соединений с БД.
+
+В режиме пула (DB_POOL=True) берется статистика psycopg_pool, в остальных
+режимах - количество физических подключений, открытых процессом.
+
+observe_queries подключает execute_wrapper ко всем запросам текущего
+HTTP-запроса, в том числе выполненным async view через sync_to_async
+в другом потоке (со своими соединениями).
+"""
+import contextvars
+import functools
+import threading
+from contextlib import contextmanager
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_lock = threading.Lock()
+_connections_created = {}
+
+
+_query_observers = contextvars.ContextVar('query_observers', default=())
+
+
+def _observe(execute, sql, params, many, context):
+    for observer in reversed(_query_observers.get()):
+        execute = functools.partial(observer, execute)
+    return execute(sql, params, many, context)
+
+
+def _install_observer(connection):
+    if _observe not in connection.execute_wrappers:
+        # В начало списка: connection.execute_wrapper() снимает последнюю обертку
+        connection.execute_wrappers.insert(0, _observe)
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    with _lock:
+        _connections_created[connection.alias] = _connections_created.get(connection.alias, 0) + 1
+    _install_observer(connection)
+
+
+@contextmanager
+def observe_queries(observer):
+    """
+    execute_wrapper для запросов текущего контекста (contextvars).
+
+    Контекст копируется в потоки sync_to_async, поэтому учитываются и запросы
+    async view, выполненные на соединениях других потоков.
+    """
+    for alias in connections:
+        _install_observer(connections[alias])
+    token = _query_observers.set((*_query_observers.get(), observer))
+    try:
+        yield observer
+    finally:
+        _query_observers.reset(token)
+
+
+def get_pool(alias='default'):
+    # Атрибут pool есть только у бэкенда PostgreSQL
+    return getattr(connections[alias], 'pool', None)
+
+
+def open_connection_pools():
+    """Открытие пулов при старте процесса, чтобы первые запросы не ждали подключений"""
+    for alias in connections:
+        pool = get_pool(alias)
+        if pool is not None:
+            pool.open(wait=False)
+
+
+def get_pool_stats(alias='default'):
+    """Статистика соединений: размер пула, выдачи, ожидания"""
+    settings_dict = connections.settings[alias]
+    stats = {
+        'alias': alias,
+        'vendor': connections[alias].vendor,
+        'connections_created': _connections_created.get(alias, 0),
+    }
+    pool = get_pool(alias)
+    if pool is None:
+        stats['mode'] = 'persistent' if settings_dict.get('CONN_MAX_AGE') else 'per-request'
+        stats['conn_max_age'] = settings_dict.get('CONN_MAX_AGE')
+        return stats
+
+    pool_stats = pool.get_stats()
+    stats.update({
+        'mode': 'pool',
+        'size': pool_stats.get('pool_size', 0),
+        'available': pool_stats.get('pool_available', 0),
+        'min_size': pool_stats.get('pool_min', 0),
+        'max_size': pool_stats.get('pool_max', 0),
+        'checkouts': pool_stats.get('requests_num', 0),
+        'waits': pool_stats.get('requests_queued', 0),
+        'waiting': pool_stats.get('requests_waiting', 0),
+        'wait_ms': pool_stats.get('requests_wait_ms', 0),
+        'errors': pool_stats.get('requests_errors', 0),
+        'timeouts': pool_stats.get('requests_timeouts', 0),
+        'connections_created': pool_stats.get('connections_num', stats['connections_created']),
+    })
+    return stats
@@ -0,0 +1,92 @@
+"""
+Быстрая сериализация списков без создания объектов модели.
+
+Поля сериализатора заранее сопоставляются колонкам БД и функциям
+представления (to_representation поля), строки читаются через values(),
+поэтому результат совпадает с обычным сериализатором. Сериализаторы с
+полями, которые не вычисляются по одной колонке (SerializerMethodField,
+вложенные сериализаторы, source='*' и составные source), обрабатываются
+обычным путем.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import FileField
+from rest_framework import serializers
+from rest_framework.relations import PrimaryKeyRelatedField, RelatedField
+from rest_framework.response import Response
+
+
+def _file_represent(field, model_field):
+    # Поле сериализатора ожидает FieldFile (url, storage), а values() возвращает имя файла
+    def represent(value):
+        return field.to_representation(model_field.attr_class(None, model_field, value))
+    return represent
+
+
+def compile_fields(serializer):
+    """
+    Список (имя поля, колонка, функция представления) для полей serializer.
+
+    Связи выводятся первичным ключом без преобразования (функция None).
+    Возвращает None, если какое-то поле нельзя вычислить по колонке.
+    """
+    opts = serializer.Meta.model._meta
+    compiled = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if len(field.source_attrs) != 1 or isinstance(
+            field, (serializers.SerializerMethodField, serializers.BaseSerializer)
+        ):
+            return None
+        try:
+            model_field = opts.get_field(field.source_attrs[0])
+        except FieldDoesNotExist:
+            return None
+        if not model_field.concrete:
+            return None
+
+        if isinstance(field, RelatedField):
+            if not isinstance(field, PrimaryKeyRelatedField) or field.pk_field is not None:
+                return None
+            compiled.append((name, model_field.attname, None))
+        elif isinstance(model_field, FileField):
+            compiled.append((name, model_field.attname, _file_represent(field, model_field)))
+        else:
+            compiled.append((name, model_field.attname, field.to_representation))
+    return compiled
+
+
+def represent_rows(rows, compiled):
+    """Словари ответа из строк values(); None выводится без преобразования, как в DRF"""
+    return [
+        {
+            name: value if (value := row[column]) is None or represent is None else represent(value)
+            for name, column, represent in compiled
+        }
+        for row in rows
+    ]
+
+
+class FastListMixin:
+    """
+    Действие list через values() и compile_fields.
+
+    Подключается во ViewSet явно. Если сериализатор не поддерживается
+    (см. compile_fields), используется стандартный list.
+    """
+
+    def list(self, request, *args, **kwargs):
+        compiled = compile_fields(self.get_serializer())
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        columns = {column for _, column, _ in compiled}
+        # Keyset-пагинация читает позицию из строки, поэтому колонки сортировки нужны всегда
+        columns.update(field.lstrip('-') for field in getattr(self.paginator, 'cursor_ordering', ()))
+        rows = queryset.values(*columns)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(represent_rows(page, compiled))
+        return Response(represent_rows(rows, compiled))
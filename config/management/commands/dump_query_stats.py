@@ -0,0 +1,41 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from config.query_stats import get_report
+
+SORT_KEYS = ('sql_ms', 'avg_sql_ms', 'queries', 'avg_queries', 'max_queries', 'requests')
+
+
+class Command(BaseCommand):
+    help = 'Вывод статистики SQL-запросов по view из QUERY_STATS_DIR'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sort', choices=SORT_KEYS, default='sql_ms', help='Поле сортировки (по убыванию)')
+        parser.add_argument('--limit', type=int, default=20, help='Количество view в отчете')
+        parser.add_argument('--json', action='store_true', help='Полный отчет в JSON')
+
+    def handle(self, *args, **options):
+        if not settings.QUERY_STATS_DIR:
+            self.stderr.write('QUERY_STATS_DIR не задан: статистика процессов сервера недоступна')
+            return
+
+        report = sorted(get_report(), key=lambda item: -item[options['sort']])[:options['limit']]
+        if options['json']:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+            return
+
+        for item in report:
+            self.stdout.write(
+                f"{item['view']}: запросов {item['requests']}, SQL в среднем {item['avg_queries']} "
+                f"(макс. {item['max_queries']}), {item['avg_sql_ms']} мс"
+            )
+            for duplicate in item['duplicates'][:3]:
+                self.stdout.write(
+                    f"  повтор x{duplicate['max_count']} в {duplicate['requests']} запросах: {duplicate['sql'][:200]}"
+                )
+            for slow in item['slowest'][:3]:
+                self.stdout.write(f"  {slow['ms']} мс: {slow['sql'][:200]}")
+        if not report:
+            self.stdout.write('Статистики нет: проверьте QUERY_STATS_SAMPLE_RATE')
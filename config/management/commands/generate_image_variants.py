@@ -0,0 +1,67 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from config.services.image_service import generate_variants, is_variant
+
+
+def _setup_worker(settings_module, media_root):
+    """
+    Настройка Django в дочернем процессе. Процессы запускаются через spawn
+    и не наследуют состояние родителя, как при fork.
+    """
+    os.environ['DJANGO_SETTINGS_MODULE'] = settings_module
+    django.setup()
+    settings.MEDIA_ROOT = media_root
+
+
+def _generate(name, overwrite):
+    return generate_variants(name, overwrite=overwrite)
+
+
+class Command(BaseCommand):
+    help = 'Создание уменьшенных копий для уже загруженных изображений в MEDIA_ROOT'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Количество параллельных задач')
+        parser.add_argument('--processes', action='store_true', help='Пул процессов вместо пула потоков')
+        parser.add_argument('--overwrite', action='store_true', help='Пересоздать существующие варианты')
+
+    def find_images(self):
+        root = Path(settings.MEDIA_ROOT)
+        extensions = set(Image.registered_extensions())
+        for path in sorted(root.rglob('*')):
+            if path.is_file() and path.suffix.lower() in extensions:
+                name = path.relative_to(root).as_posix()
+                if not is_variant(name):
+                    yield name
+
+    def handle(self, *args, **options):
+        names = list(self.find_images())
+        if options['processes']:
+            executor = ProcessPoolExecutor(
+                max_workers=options['workers'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_setup_worker,
+                initargs=(os.environ['DJANGO_SETTINGS_MODULE'], str(settings.MEDIA_ROOT)),
+            )
+        else:
+            executor = ThreadPoolExecutor(max_workers=options['workers'])
+        created = failed = 0
+        with executor:
+            futures = {executor.submit(_generate, name, options['overwrite']): name for name in names}
+            for future in as_completed(futures):
+                try:
+                    created += len(future.result())
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f'{futures[future]}: {e}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Изображений: {len(names)}, создано вариантов: {created}, ошибок: {failed}'
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from config.schema import generate_schema_artifacts, get_artifact_dir
+
+
+class Command(BaseCommand):
+    help = 'Генерация OpenAPI-схемы в SCHEMA_ARTIFACT_DIR (запускать при деплое)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', help='Каталог для файлов схемы (по умолчанию SCHEMA_ARTIFACT_DIR)')
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or get_artifact_dir()
+        manifest = generate_schema_artifacts(directory)
+        for filename in manifest['files'].values():
+            self.stdout.write(f'{directory}/{filename}')
+        self.stdout.write(self.style.SUCCESS(
+            f"Схема версии {manifest['version']} ({manifest['digest']}) сгенерирована"
+        ))
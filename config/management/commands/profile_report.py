@@ -0,0 +1,47 @@
+import io
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from config.profiling import layer_samples, layer_times, load_reports
+
+
+class Command(BaseCommand):
+    help = 'Сводка профилей запросов по view из PROFILING_DIR'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--view', help='Только view с таким именем (например, CourseViewSet.list)')
+        parser.add_argument('--limit', type=int, default=15, help='Количество функций в профиле cProfile')
+        parser.add_argument('--sort', default='cumulative', help='Сортировка pstats (cumulative, tottime, calls)')
+
+    def handle(self, *args, **options):
+        if not settings.PROFILING_DIR:
+            self.stderr.write('PROFILING_DIR не задан: профилирование выключено')
+            return
+
+        reports = load_reports(settings.PROFILING_DIR)
+        if options['view']:
+            reports = {view: report for view, report in reports.items() if view == options['view']}
+        if not reports:
+            self.stdout.write('Профилей нет')
+            return
+
+        for view, report in sorted(reports.items()):
+            self.stdout.write(self.style.MIGRATE_HEADING(view))
+            stats = report['stats']
+            if stats is not None:
+                layers = layer_times(stats)
+                total = sum(layers.values()) or 1
+                self.stdout.write('  Слои (cProfile): ' + ', '.join(
+                    f'{layer} {seconds * 1000:.1f} мс ({seconds / total:.0%})' for layer, seconds in layers.most_common()
+                ))
+                output = io.StringIO()
+                stats.stream = output
+                stats.sort_stats(options['sort']).print_stats(options['limit'])
+                self.stdout.write(output.getvalue())
+            if report['folded']:
+                layers = layer_samples(report['folded'])
+                total = sum(layers.values())
+                self.stdout.write(f'  Слои (снимков {total}): ' + ', '.join(
+                    f'{layer} {count / total:.0%}' for layer, count in layers.most_common()
+                ))
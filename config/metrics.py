@@ -0,0 +1,350 @@
+"""
+Метрики в текстовом формате Prometheus.
+
+Реестр процесса содержит счетчики и гистограммы:
+
+- http_request_duration_seconds - время ответа по view и action DRF;
+- db_queries_total, db_query_seconds_total - запросы к БД по view;
+- stripe_request_duration_seconds, stripe_requests_total - вызовы Stripe
+  (config.services.stripe_service) с результатом: ok или класс ошибки.
+
+Показатели, которые считываются в момент сбора (пулы соединений, кэш
+ответов), добавляют коллекторы. Отдача - MetricsView (/metrics) с токеном METRICS_TOKEN.
+
+При нескольких воркерах gunicorn задается METRICS_DIR: каждый процесс
+сохраняет свои значения в <pid>.json (см. config.process_state), ответ
+/metrics суммирует счетчики и гистограммы всех процессов, а показатели
+процессов выводятся с меткой pid. Показатели процесса пропускаются, если
+он завершился или не обновлял файл дольше STALE_FLUSH_INTERVALS интервалов
+METRICS_FLUSH_INTERVAL; его счетчики по-прежнему входят в сумму. Каталог
+нужно очищать при деплое.
+"""
+import bisect
+import functools
+import threading
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+from config.db import get_pool_stats, observe_queries
+from config.process_state import load_process_states, save_process_state
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STALE_FLUSH_INTERVALS = 5
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def snapshot(self):
+        with self.lock:
+            return [[list(key), self._copy(value)] for key, value in self.values.items()]
+
+    def _copy(self, value):
+        return value
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                # Счетчики корзин без накопления, последняя - +Inf
+                state = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _copy(self, value):
+        return [list(value[0]), value[1], value[2]]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+        self.last_flush = time.monotonic()
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def register_collector(self, collector, per_process=True):
+        """
+        collector() возвращает [(имя, тип, описание, [(метки, значение)])].
+
+        per_process=False - значения общие для всех процессов (например, из
+        кэша) и собираются только процессом, отвечающим на /metrics.
+        """
+        self.collectors.append((collector, per_process))
+
+    def snapshot(self, per_process_only=False):
+        families = {
+            name: {
+                'type': metric.type,
+                'help': metric.documentation,
+                'labelnames': list(metric.labelnames),
+                'buckets': list(getattr(metric, 'buckets', [])),
+                'values': metric.snapshot(),
+            }
+            for name, metric in self.metrics.items()
+        }
+        samples = []
+        for collector, per_process in self.collectors:
+            if per_process_only and not per_process:
+                continue
+            for name, metric_type, documentation, values in collector():
+                labels = [list(item) for item in values]
+                samples.append([name, metric_type, documentation, per_process, labels])
+        return {'families': families, 'collected': samples}
+
+    def flush(self, force=False):
+        directory = settings.METRICS_DIR
+        if not directory:
+            return
+        now = time.monotonic()
+        if not force and now - self.last_flush < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self.last_flush = now
+        save_process_state(directory, self.snapshot(per_process_only=True))
+
+    def render(self):
+        """Текст в формате Prometheus по всем процессам"""
+        own = self.snapshot()
+        states = [{'pid': None, 'alive': True, **own}]
+        if settings.METRICS_DIR:
+            self.flush(force=True)
+            states += load_process_states(
+                settings.METRICS_DIR, max_age=settings.METRICS_FLUSH_INTERVAL * STALE_FLUSH_INTERVALS
+            )
+
+        families = {}
+        for state in states:
+            for name, family in state['families'].items():
+                merged = families.setdefault(name, {**family, 'values': {}})
+                for key, value in family['values']:
+                    key = tuple(key)
+                    if key not in merged['values']:
+                        merged['values'][key] = value if family['type'] == 'counter' else [
+                            list(value[0]), value[1], value[2]
+                        ]
+                    elif family['type'] == 'counter':
+                        merged['values'][key] += value
+                    else:
+                        current = merged['values'][key]
+                        current[0] = [a + b for a, b in zip(current[0], value[0])]
+                        current[1] += value[1]
+                        current[2] += value[2]
+
+        lines = []
+        for name, family in sorted(families.items()):
+            lines += [f'# HELP {name} {family["help"]}', f'# TYPE {name} {family["type"]}']
+            for key, value in sorted(family['values'].items()):
+                labels = list(zip(family['labelnames'], key))
+                if family['type'] == 'counter':
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip([*family['buckets'], float('inf')], value[0]):
+                    cumulative += count
+                    bucket_labels = labels + [('le', _format_value(float(bound)))]
+                    lines.append(f'{name}_bucket{_format_labels(bucket_labels)} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(float(value[1]))}')
+                lines.append(f'{name}_count{_format_labels(labels)} {value[2]}')
+
+        collected = {}
+        multiprocess = bool(settings.METRICS_DIR)
+        for state in states:
+            for name, metric_type, documentation, per_process, values in state['collected']:
+                if per_process and not state['alive']:
+                    continue
+                family = collected.setdefault(name, (metric_type, documentation, []))
+                for labels, value in values:
+                    if multiprocess and per_process:
+                        labels = [*labels, ['pid', state['pid'] or 'self']]
+                    family[2].append((labels, value))
+        for name, (metric_type, documentation, values) in sorted(collected.items()):
+            lines += [f'# HELP {name} {documentation}', f'# TYPE {name} {metric_type}']
+            for labels, value in values:
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_DURATION = registry.register(Histogram(
+    'http_request_duration_seconds', 'Время ответа по view и action', ('view', 'action', 'method', 'status')
+))
+DB_QUERIES = registry.register(Counter(
+    'db_queries_total', 'Количество запросов к БД по view', ('view', 'action')
+))
+DB_QUERY_SECONDS = registry.register(Counter(
+    'db_query_seconds_total', 'Суммарное время запросов к БД по view', ('view', 'action')
+))
+STRIPE_DURATION = registry.register(Histogram(
+    'stripe_request_duration_seconds', 'Время вызовов Stripe', ('operation',)
+))
+STRIPE_REQUESTS = registry.register(Counter(
+    'stripe_requests_total', 'Вызовы Stripe по результату (ok или класс ошибки)', ('operation', 'outcome')
+))
+
+
+def observe_stripe(operation):
+    """Декоратор функций, обращающихся к Stripe"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = 'ok'
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                outcome = type(e).__name__
+                raise
+            finally:
+                STRIPE_DURATION.observe(time.perf_counter() - start, operation=operation)
+                STRIPE_REQUESTS.inc(operation=operation, outcome=outcome)
+        return wrapper
+    return decorator
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+def get_view_labels(request):
+    """view - класс view (или путь к функции), action - действие ViewSet или метод"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>', request.method.lower()
+    view_class = getattr(match.func, 'cls', None) or getattr(match.func, 'view_class', None)
+    view = view_class.__name__ if view_class else match._func_path
+    actions = getattr(match.func, 'actions', None) or {}
+    return view, actions.get(request.method.lower(), request.method.lower())
+
+
+class MetricsMiddleware:
+    """Время ответа и запросы к БД для каждого запроса (при METRICS_ENABLED)"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        with observe_queries(QueryCounter()) as counter:
+            response = self.get_response(request)
+        return self.process_response(request, response, counter, start)
+
+    async def __acall__(self, request):
+        if not settings.METRICS_ENABLED:
+            return await self.get_response(request)
+
+        start = time.perf_counter()
+        with observe_queries(QueryCounter()) as counter:
+            response = await self.get_response(request)
+        return self.process_response(request, response, counter, start)
+
+    def process_response(self, request, response, counter, start):
+        duration = time.perf_counter() - start
+        view, action = get_view_labels(request)
+        REQUEST_DURATION.observe(
+            duration, view=view, action=action, method=request.method, status=f'{response.status_code // 100}xx'
+        )
+        DB_QUERIES.inc(counter.count, view=view, action=action)
+        DB_QUERY_SECONDS.inc(counter.duration, view=view, action=action)
+        registry.flush()
+        return response
+
+
+def _database_collector():
+    families = {}
+    for alias in connections:
+        stats = get_pool_stats(alias)
+        for key in ('size', 'available', 'waiting', 'connections_created', 'checkouts', 'waits', 'errors'):
+            if key in stats:
+                families.setdefault(key, []).append(([('alias', alias)], stats[key]))
+    return [
+        (f'db_pool_{key}', 'gauge', f'Пул соединений: {key}', values)
+        for key, values in families.items()
+    ]
+
+
+def _response_cache_collector():
+    from materials.cache import get_stats
+
+    stats = get_stats()
+    return [
+        (f'response_cache_{key}_total', 'counter', f'Кэш ответов курсов и уроков: {key}', [([], stats[key])])
+        for key in ('hits', 'misses') if key in stats
+    ]
+
+
+registry.register_collector(_database_collector)
+registry.register_collector(_response_cache_collector, per_process=False)
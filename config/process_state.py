@@ -0,0 +1,64 @@
+"""
+Обмен состоянием между процессами сервера через каталог.
+
+Каждый процесс пишет свое состояние в <каталог>/<pid>.json, читатель
+объединяет файлы всех процессов. Используется статистикой SQL и метриками
+при нескольких воркерах gunicorn.
+
+Файлы завершившихся процессов остаются в каталоге: их накопленные значения
+по-прежнему нужны читателю, а поле alive состояния показывает, жив ли
+процесс-автор, чтобы не выводить его текущие показатели.
+"""
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+
+def save_process_state(directory, data):
+    """Атомарная запись состояния текущего процесса"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    # Запись через временный файл: читатель не увидит частично записанный JSON
+    with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False) as file:
+        json.dump({'pid': os.getpid(), **data}, file)
+    os.replace(file.name, directory / f'{os.getpid()}.json')
+
+
+def pid_alive(pid):
+    """Существует ли процесс с таким pid на этой машине"""
+    if not isinstance(pid, int) or pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Процесс есть, но принадлежит другому пользователю
+        return True
+    return True
+
+
+def load_process_states(directory, exclude_current=True, max_age=None):
+    """
+    Состояния процессов из каталога; состояние текущего процесса по умолчанию пропускается.
+
+    alive в каждом состоянии - процесс жив и (если задан max_age) файл
+    обновлялся не раньше max_age секунд назад.
+    """
+    states = []
+    if not directory:
+        return states
+    now = time.time()
+    for path in sorted(Path(directory).glob('*.json')):
+        try:
+            mtime = path.stat().st_mtime
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        if exclude_current and data.get('pid') == os.getpid():
+            continue
+        data['alive'] = pid_alive(data.get('pid')) and (max_age is None or now - mtime <= max_age)
+        states.append(data)
+    return states
@@ -0,0 +1,329 @@
+"""
+Профилирование живых запросов.
+
+ProfilingMiddleware профилирует долю PROFILING_SAMPLE_RATE запросов или
+отдельный запрос с заголовком X-Profile, подписанным TimestampSigner
+(токен выдает администраторам internal/profiling/token/). Без PROFILING_DIR
+профилирование выключено.
+
+Режимы (PROFILING_MODE):
+
+- cprofile - детерминированный профиль, <view>.<pid>.pstats (snakeviz,
+  gprof2dot, flameprof);
+- sampling - статистический: отдельный поток раз в PROFILING_INTERVAL мс
+  снимает стек потока запроса, <view>.<pid>.folded (flamegraph.pl, speedscope).
+
+Под ASGI async view профилируется в потоке цикла событий (см.
+ProfilingMiddleware.aprofile), синхронные view - в потоке sync_to_async.
+
+Результаты накапливаются по view в файлах каждого процесса; команда
+profile_report объединяет их и показывает время по слоям: view,
+serializer, permission, db. Одновременно профилируется один запрос
+на процесс, остальные выполняются без профилирования.
+"""
+import cProfile
+import functools
+import os
+import pstats
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.urls import Resolver404, resolve
+
+from config.metrics import get_view_labels
+
+HEADER = 'X-Profile'
+SIGNER_SALT = 'config.profiling'
+
+# Слои по модулю или пути к файлу, проверяются по порядку
+LAYERS = (
+    ('db', re.compile(r'/django/db/|/(psycopg|psycopg2|sqlite3)(/|$)')),
+    ('permission', re.compile(r'/permissions(/|$)')),
+    ('serializer', re.compile(r'/(serializers?|fields|fast_serialization)(/|$)')),
+    ('view', re.compile(r'/(views?|viewsets|mixins|generics)(/|$)')),
+)
+# Только для пакетов проекта: иначе под view попал бы и django/core/cache
+PROJECT_LAYERS = (
+    ('view', re.compile(r'/cache(/|$)')),
+)
+
+_lock = threading.Lock()
+
+
+def _normalize(name):
+    return '/' + re.sub(r'\.py$', '', name).replace('\\', '/').replace('.', '/')
+
+
+@functools.cache
+def _project_pattern():
+    """Модули пакетов проекта: по имени (materials.cache) или пути в BASE_DIR"""
+    base = Path(settings.BASE_DIR)
+    packages = sorted(path.parent.name for path in base.glob('*/__init__.py'))
+    root = re.escape(_normalize(str(base)).lstrip('/'))
+    return re.compile(rf'^(/+{root})?/({"|".join(map(re.escape, packages))})/')
+
+
+def classify(name):
+    """Слой кода по имени модуля (django.db.models) или пути к файлу"""
+    name = _normalize(name)
+    for layer, pattern in LAYERS:
+        if pattern.search(name):
+            return layer
+    if _project_pattern().search(name):
+        for layer, pattern in PROJECT_LAYERS:
+            if pattern.search(name):
+                return layer
+    return 'other'
+
+
+def make_token():
+    return signing.TimestampSigner(salt=SIGNER_SALT).sign('profile')
+
+
+def check_token(token):
+    try:
+        signing.TimestampSigner(salt=SIGNER_SALT).unsign(token, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def get_profile_name(request):
+    view, action = get_view_labels(request)
+    return re.sub(r'[^\w.-]', '_', f'{view}.{action}')
+
+
+def is_async_view(request):
+    try:
+        match = resolve(request.path_info, getattr(request, 'urlconf', None))
+    except Resolver404:
+        return False
+    return iscoroutinefunction(match.func)
+
+
+def frame_label(frame):
+    module = frame.f_globals.get('__name__', '?')
+    return f'{module}:{frame.f_code.co_qualname}'.replace(';', ',')
+
+
+class StackSampler:
+    """
+    Снимки стека одного потока с заданным интервалом.
+
+    Учитываются только снимки, в которых есть корневой кадр: в потоке цикла
+    событий остальные снимки относятся к другим задачам или ожиданию.
+    """
+
+    def __init__(self, interval, root_frame):
+        self.interval = interval
+        self.root = root_frame
+        self.thread_id = threading.get_ident()
+        self.stacks = Counter()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            # Кадры выше middleware (сервер, WSGI) не нужны
+            while frame is not None and frame is not self.root:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            if stack and frame is not None:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop_event.set()
+        self.thread.join()
+
+
+class ProfileStore:
+    """Накопленные профили view текущего процесса"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.profiles = {}
+        self.folded = {}
+
+    def add_profile(self, name, profiler):
+        directory = Path(settings.PROFILING_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            stats = self.profiles.get(name)
+            if stats is None:
+                stats = self.profiles[name] = pstats.Stats(profiler)
+            else:
+                stats.add(profiler)
+            self._replace(directory / f'{name}.{os.getpid()}.pstats', stats.dump_stats)
+
+    def add_stacks(self, name, stacks):
+        directory = Path(settings.PROFILING_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            folded = self.folded.setdefault(name, Counter())
+            folded.update({f'{name};{stack}': count for stack, count in stacks.items()})
+            text = ''.join(f'{stack} {count}\n' for stack, count in folded.most_common())
+            self._replace(directory / f'{name}.{os.getpid()}.folded', lambda path: Path(path).write_text(text))
+
+    def reset(self):
+        with self.lock:
+            self.profiles = {}
+            self.folded = {}
+
+    @staticmethod
+    def _replace(path, write):
+        # Запись через временный файл: profile_report не увидит частичный файл
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        os.close(fd)
+        write(temp_path)
+        os.replace(temp_path, path)
+
+
+store = ProfileStore()
+
+
+class ProfilingMiddleware:
+    """Профилирование доли запросов или запроса с подписанным заголовком X-Profile"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def should_profile(self, request):
+        if not settings.PROFILING_DIR:
+            return False
+        token = request.headers.get(HEADER)
+        if token:
+            return check_token(token)
+        rate = settings.PROFILING_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.should_profile(request) or not _lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self.profile(request, self.get_response)
+        finally:
+            _lock.release()
+
+    async def __acall__(self, request):
+        if not self.should_profile(request) or not _lock.acquire(blocking=False):
+            return await self.get_response(request)
+        try:
+            if is_async_view(request):
+                return await self.aprofile(request)
+            # Синхронная view: цепочка выполняется через async_to_sync в потоке
+            # sync_to_async, туда же (thread_sensitive) возвращается view и ORM
+            return await sync_to_async(self.profile)(request, async_to_sync(self.get_response))
+        finally:
+            _lock.release()
+
+    def profile(self, request, get_response):
+        start = time.perf_counter()
+        if settings.PROFILING_MODE == 'sampling':
+            with StackSampler(settings.PROFILING_INTERVAL / 1000, sys._getframe()) as sampler:
+                response = get_response(request)
+            store.add_stacks(get_profile_name(request), sampler.stacks)
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                response = get_response(request)
+            finally:
+                profiler.disable()
+            store.add_profile(get_profile_name(request), profiler)
+        response['X-Profile-Duration'] = f'{(time.perf_counter() - start) * 1000:.1f}'
+        return response
+
+    async def aprofile(self, request):
+        """
+        Профиль async view в потоке цикла событий.
+
+        В профиль cProfile попадают и другие задачи цикла, выполнявшиеся
+        одновременно; sampling учитывает только стек этого запроса. Запросы
+        async ORM выполняются в потоках sync_to_async и видны как ожидание.
+        """
+        start = time.perf_counter()
+        if settings.PROFILING_MODE == 'sampling':
+            with StackSampler(settings.PROFILING_INTERVAL / 1000, sys._getframe()) as sampler:
+                response = await self.get_response(request)
+            await sync_to_async(store.add_stacks)(get_profile_name(request), sampler.stacks)
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                response = await self.get_response(request)
+            finally:
+                profiler.disable()
+            await sync_to_async(store.add_profile)(get_profile_name(request), profiler)
+        response['X-Profile-Duration'] = f'{(time.perf_counter() - start) * 1000:.1f}'
+        return response
+
+
+def load_reports(directory):
+    """
+    Профили всех процессов по view: {view: {'stats': pstats.Stats, 'folded': Counter}}
+    """
+    reports = {}
+    for path in sorted(Path(directory).glob('*.pstats')):
+        view = path.name.rsplit('.', 2)[0]
+        report = reports.setdefault(view, {'stats': None, 'folded': Counter()})
+        try:
+            if report['stats'] is None:
+                report['stats'] = pstats.Stats(str(path))
+            else:
+                report['stats'].add(str(path))
+        except (OSError, EOFError, TypeError, ValueError):
+            continue
+    for path in sorted(Path(directory).glob('*.folded')):
+        view = path.name.rsplit('.', 2)[0]
+        report = reports.setdefault(view, {'stats': None, 'folded': Counter()})
+        for line in path.read_text().splitlines():
+            stack, _, count = line.rpartition(' ')
+            if count.isdigit():
+                report['folded'][stack] += int(count)
+    return reports
+
+
+def layer_times(stats):
+    """Собственное время функций профиля cProfile (с) по слоям"""
+    layers = Counter()
+    for (filename, _, _), (_, _, tottime, _, _) in stats.stats.items():
+        layers[classify(filename)] += tottime
+    return layers
+
+
+def layer_samples(folded):
+    """
+    Доля снимков по слоям: снимок относится к самому глубокому кадру
+    известного слоя (запрос к БД из сериализатора - db).
+    """
+    layers = Counter()
+    for stack, count in folded.items():
+        layer = 'other'
+        for label in reversed(stack.split(';')):
+            layer = classify(label.partition(':')[0])
+            if layer != 'other':
+                break
+        layers[layer] += count
+    return layers
@@ -0,0 +1,244 @@
+"""
+Статистика SQL-запросов по view.
+
+QueryStatsMiddleware замеряет долю QUERY_STATS_SAMPLE_RATE запросов
+(0 - выключено): через execute_wrapper (config.db.observe_queries) считаются число запросов, время SQL,
+повторяющиеся запросы (одинаковый отпечаток в одном запросе - признак N+1)
+и самые медленные запросы. В ответ добавляется заголовок Server-Timing.
+
+Агрегаты хранятся по окнам QUERY_STATS_WINDOW секунд, последние
+QUERY_STATS_WINDOWS окон. Если задан QUERY_STATS_DIR, каждый процесс
+периодически сохраняет их в <pid>.json, и отчет (эндпоинт
+internal/query-stats/, команда dump_query_stats) объединяет все процессы.
+Параметры запросов не сохраняются.
+"""
+import heapq
+import json
+import logging
+import random
+import re
+import threading
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from config.db import observe_queries
+from config.process_state import load_process_states, save_process_state
+
+logger = logging.getLogger(__name__)
+
+# Повторяющиеся отпечатки, сохраняемые на view
+MAX_DUPLICATES = 20
+MAX_SQL_LENGTH = 1000
+
+IN_LIST_RE = re.compile(r'\(\s*%s(?:\s*,\s*%s)+\s*\)')
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+
+
+def fingerprint(sql):
+    """SQL без значений: списки IN и литералы заменяются заполнителями"""
+    sql = IN_LIST_RE.sub('(%s, ...)', sql)
+    sql = STRING_RE.sub('?', sql)
+    return NUMBER_RE.sub('?', sql)[:MAX_SQL_LENGTH]
+
+
+class QueryRecorder:
+    """execute_wrapper, собирающий запросы одного HTTP-запроса"""
+
+    def __init__(self, top):
+        self.top = top
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = {}
+        self.slowest = []  # куча (мс, SQL)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            self.count += 1
+            self.duration += duration
+            key = fingerprint(sql)
+            self.fingerprints[key] = self.fingerprints.get(key, 0) + 1
+            item = (round(duration, 3), key)
+            if len(self.slowest) < self.top:
+                heapq.heappush(self.slowest, item)
+            elif item > self.slowest[0]:
+                heapq.heapreplace(self.slowest, item)
+            if duration >= settings.QUERY_STATS_SLOW_MS:
+                logger.warning('Slow query (%.1f ms): %s', duration, key)
+
+    @property
+    def duplicates(self):
+        return {key: count for key, count in self.fingerprints.items() if count > 1}
+
+
+def empty_view_stats():
+    return {'requests': 0, 'queries': 0, 'max_queries': 0, 'sql_ms': 0.0, 'max_sql_ms': 0.0,
+            'duplicates': {}, 'slowest': []}
+
+
+def merge_view_stats(target, source, top):
+    """Добавление статистики view source к target"""
+    for key in ('requests', 'queries', 'sql_ms'):
+        target[key] += source[key]
+    for key in ('max_queries', 'max_sql_ms'):
+        target[key] = max(target[key], source[key])
+    for key, duplicate in source['duplicates'].items():
+        current = target['duplicates'].get(key)
+        if current is None:
+            if len(target['duplicates']) >= MAX_DUPLICATES:
+                continue
+            current = target['duplicates'][key] = {'requests': 0, 'max_count': 0}
+        current['requests'] += duplicate['requests']
+        current['max_count'] = max(current['max_count'], duplicate['max_count'])
+    target['slowest'] = heapq.nlargest(top, [tuple(item) for item in target['slowest'] + source['slowest']])
+    target['sql_ms'] = round(target['sql_ms'], 3)
+    return target
+
+
+class QueryStats:
+    """Агрегаты процесса по окнам времени"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.windows = []  # [(начало окна, {view: статистика})]
+        self.last_flush = time.monotonic()
+
+    def add(self, view, recorder):
+        window_size = settings.QUERY_STATS_WINDOW
+        start = int(time.time() // window_size * window_size)
+        stats = {
+            'requests': 1,
+            'queries': recorder.count,
+            'max_queries': recorder.count,
+            'sql_ms': recorder.duration,
+            'max_sql_ms': round(recorder.duration, 3),
+            'duplicates': {
+                key: {'requests': 1, 'max_count': count} for key, count in recorder.duplicates.items()
+            },
+            'slowest': recorder.slowest,
+        }
+        with self.lock:
+            if not self.windows or self.windows[-1][0] != start:
+                self.windows.append((start, {}))
+                del self.windows[:-settings.QUERY_STATS_WINDOWS]
+            views = self.windows[-1][1]
+            merge_view_stats(views.setdefault(view, empty_view_stats()), stats, recorder.top)
+
+    def snapshot(self):
+        with self.lock:
+            return [[start, json.loads(json.dumps(views))] for start, views in self.windows]
+
+    def reset(self):
+        with self.lock:
+            self.windows = []
+
+    def flush(self, force=False):
+        """Сохранение окон процесса в QUERY_STATS_DIR/<pid>.json"""
+        directory = settings.QUERY_STATS_DIR
+        if not directory:
+            return
+        now = time.monotonic()
+        if not force and now - self.last_flush < settings.QUERY_STATS_FLUSH_INTERVAL:
+            return
+        self.last_flush = now
+        save_process_state(directory, {'windows': self.snapshot()})
+
+
+stats = QueryStats()
+
+
+def get_report(include_files=True):
+    """
+    Объединенная статистика по view за последние окна.
+
+    Учитываются окна текущего процесса и, если задан QUERY_STATS_DIR,
+    файлы остальных процессов. Результат отсортирован по суммарному времени SQL.
+    """
+    horizon = time.time() - settings.QUERY_STATS_WINDOW * settings.QUERY_STATS_WINDOWS
+    # Данные текущего процесса в памяти свежее его файла
+    sources = [stats.snapshot()]
+    if include_files:
+        sources += [state['windows'] for state in load_process_states(settings.QUERY_STATS_DIR)]
+
+    views = {}
+    for windows in sources:
+        for start, window_views in windows:
+            if start + settings.QUERY_STATS_WINDOW < horizon:
+                continue
+            for view, view_stats in window_views.items():
+                merge_view_stats(views.setdefault(view, empty_view_stats()), view_stats, settings.QUERY_STATS_TOP)
+
+    report = []
+    for view, view_stats in views.items():
+        requests = view_stats['requests']
+        report.append({
+            'view': view,
+            **view_stats,
+            'avg_queries': round(view_stats['queries'] / requests, 2),
+            'avg_sql_ms': round(view_stats['sql_ms'] / requests, 3),
+            'duplicates': sorted(
+                ({'sql': key, **duplicate} for key, duplicate in view_stats['duplicates'].items()),
+                key=lambda item: (-item['requests'], -item['max_count'])
+            ),
+            'slowest': [{'ms': ms, 'sql': sql} for ms, sql in view_stats['slowest']],
+        })
+    report.sort(key=lambda item: -item['sql_ms'])
+    return report
+
+
+def get_view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return f'{request.method} <unresolved>'
+    return f'{request.method} {match.view_name or match._func_path}'
+
+
+class QueryStatsMiddleware:
+    """Замер SQL для доли запросов QUERY_STATS_SAMPLE_RATE"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def is_sampled():
+        rate = settings.QUERY_STATS_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.is_sampled():
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        with observe_queries(QueryRecorder(settings.QUERY_STATS_TOP)) as recorder:
+            response = self.get_response(request)
+        return self.process_response(request, response, recorder, start)
+
+    async def __acall__(self, request):
+        if not self.is_sampled():
+            return await self.get_response(request)
+
+        start = time.perf_counter()
+        with observe_queries(QueryRecorder(settings.QUERY_STATS_TOP)) as recorder:
+            response = await self.get_response(request)
+        return self.process_response(request, response, recorder, start)
+
+    def process_response(self, request, response, recorder, start):
+        total = (time.perf_counter() - start) * 1000
+        stats.add(get_view_name(request), recorder)
+        stats.flush()
+        response['Server-Timing'] = (
+            f'db;dur={recorder.duration:.1f};desc="{recorder.count} queries", app;dur={total:.1f}'
+        )
+        return response
@@ -0,0 +1,107 @@
+"""
+JSON-рендерер и парсер на orjson (pip install orjson).
+
+Без orjson используются стандартные JSONRenderer и JSONParser DRF.
+Типы, которые orjson не сериализует так же, как DRF (datetime, Decimal,
+ленивые строки перевода и т.п.), передаются в JSONEncoder DRF, поэтому
+ответ совпадает с ответом стандартного рендерера. Ответы с отступами
+(indent в Accept, Browsable API) формируются стандартным рендерером:
+orjson поддерживает только отступ в два пробела.
+
+NDJSONParser разбирает построчный JSON (импорт курсов, materials.transfer).
+"""
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_encoder = JSONEncoder()
+
+if orjson is not None:
+    # datetime/date/time форматирует DRF (миллисекунды, Z вместо +00:00)
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+# JSONRenderer DRF экранирует разделители строк для встраивания в JavaScript
+LINE_SEPARATORS = (('\u2028'.encode(), b'\\u2028'), ('\u2029'.encode(), b'\\u2029'))
+
+
+def _escape_separators(content):
+    for separator, escaped in LINE_SEPARATORS:
+        if separator in content:
+            content = content.replace(separator, escaped)
+    return content
+
+
+def dumps(data):
+    """Компактный JSON в UTF-8 (bytes) в формате JSONRenderer DRF"""
+    if orjson is not None and settings.FAST_JSON:
+        try:
+            return _escape_separators(orjson.dumps(data, default=_encoder.default, option=ORJSON_OPTIONS))
+        except orjson.JSONEncodeError:
+            # Например, целые больше 64 бит: их сериализует только json
+            pass
+    content = json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+    return _escape_separators(content.encode())
+
+
+def loads(content):
+    """Разбор JSON из bytes или str; ошибка разбора - ValueError"""
+    if orjson is not None and settings.FAST_JSON:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer с кодированием через dumps()"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            data is None
+            or orjson is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type or '', renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class ORJSONParser(JSONParser):
+    """JSONParser с разбором через orjson"""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            content = stream.read()
+            if encoding.lower().replace('-', '') != 'utf8':
+                content = content.decode(encoding)
+            return orjson.loads(content)
+        except (orjson.JSONDecodeError, UnicodeDecodeError) as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+class NDJSONParser(BaseParser):
+    """Построчный JSON (application/x-ndjson): список объектов, пустые строки пропускаются"""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        rows = []
+        for number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                rows.append(loads(line.decode(encoding)))
+            except (ValueError, UnicodeDecodeError) as exc:
+                raise ParseError(f'NDJSON parse error - строка {number}: {exc}')
+        return rows
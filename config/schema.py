@@ -0,0 +1,184 @@
+"""
+Предварительно сгенерированная OpenAPI-схема.
+
+Схема собирается один раз (командой generate_schema при деплое или при
+первом запросе) и сохраняется в SCHEMA_ARTIFACT_DIR в JSON и YAML вместе
+со сжатыми gzip-копиями, файлы прошлых версий удаляются. Эндпоинт отдает
+готовые файлы с ETag.
+
+Манифест хранит отпечаток кода приложений проекта, настроек DRF и
+drf-spectacular и версий библиотек: если код изменился после генерации,
+схема генерируется заново при первом запросе.
+"""
+import functools
+import gzip
+import hashlib
+import json
+import os
+import threading
+from importlib import metadata
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SCHEMA_KWARGS, SpectacularAPIView
+
+MANIFEST_NAME = 'manifest.json'
+
+RENDERERS = {
+    'json': OpenApiJsonRenderer,
+    'yaml': OpenApiYamlRenderer,
+}
+
+_lock = threading.Lock()
+_loaded = {}
+
+
+def get_artifact_dir():
+    return Path(settings.SCHEMA_ARTIFACT_DIR)
+
+
+PACKAGES = ('django', 'djangorestframework', 'drf-spectacular', 'djangorestframework-simplejwt')
+
+
+@functools.cache
+def get_fingerprint():
+    """Отпечаток всего, от чего зависит схема: код приложений проекта, настройки, версии библиотек"""
+    digest = hashlib.sha256()
+    options = {
+        name: getattr(settings, name, None)
+        for name in ('SPECTACULAR_SETTINGS', 'REST_FRAMEWORK', 'SIMPLE_JWT', 'INSTALLED_APPS', 'ROOT_URLCONF')
+    }
+    digest.update(json.dumps(options, sort_keys=True, default=str).encode())
+    for package in PACKAGES:
+        try:
+            digest.update(f'{package}=={metadata.version(package)}'.encode())
+        except metadata.PackageNotFoundError:
+            continue
+    base_dir = Path(settings.BASE_DIR).resolve()
+    for app_config in apps.get_app_configs():
+        path = Path(app_config.path).resolve()
+        if not path.is_relative_to(base_dir):
+            continue
+        for source in sorted(path.rglob('*.py')):
+            digest.update(str(source.relative_to(base_dir)).encode())
+            digest.update(source.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def _write_atomic(path, content):
+    tmp_path = path.with_name(f'.{path.name}.tmp')
+    tmp_path.write_bytes(content)
+    os.replace(tmp_path, path)
+
+
+def generate_schema_artifacts(directory=None):
+    """Генерация схемы и запись версионированных файлов, возвращает манифест"""
+    directory = Path(directory or get_artifact_dir())
+    directory.mkdir(parents=True, exist_ok=True)
+
+    generator = SpectacularAPIView.generator_class()
+    schema = generator.get_schema(request=None, public=True)
+
+    rendered = {name: renderer().render(schema, renderer_context={}) for name, renderer in RENDERERS.items()}
+    digest = hashlib.sha256(rendered['json']).hexdigest()[:16]
+    version = settings.SPECTACULAR_SETTINGS['VERSION']
+
+    files = {}
+    for name, content in rendered.items():
+        filename = f'schema-{version}-{digest}.{name}'
+        _write_atomic(directory / filename, content)
+        _write_atomic(directory / f'{filename}.gz', gzip.compress(content, mtime=0))
+        files[name] = filename
+
+    manifest = {'version': version, 'digest': digest, 'fingerprint': get_fingerprint(), 'files': files}
+    # Манифест пишется последним: читатели видят только полностью записанные файлы
+    _write_atomic(directory / MANIFEST_NAME, json.dumps(manifest, indent=2).encode())
+
+    # Файлы прошлых версий схемы больше не нужны
+    current = {*files.values(), *(f'{filename}.gz' for filename in files.values())}
+    for path in directory.glob('schema-*'):
+        if path.name not in current:
+            path.unlink(missing_ok=True)
+    return manifest
+
+
+def accepts_gzip(header):
+    """Разрешен ли gzip заголовком Accept-Encoding с учетом q (gzip;q=0 - запрет)"""
+    qualities = {}
+    for item in header.split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    return qualities.get('gzip', qualities.get('*', 0.0)) > 0
+
+
+def load_schema_artifact(name):
+    """
+    Содержимое схемы в формате name: (bytes, gzip bytes, ETag).
+
+    Файлы читаются один раз на процесс и перечитываются при смене манифеста.
+    Если артефакта нет или он собран другим кодом (отпечаток в манифесте
+    не совпадает), схема генерируется заново.
+    """
+    directory = get_artifact_dir()
+    manifest_path = directory / MANIFEST_NAME
+    with _lock:
+        try:
+            mtime = manifest_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+
+        cached = _loaded.get((directory, name))
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        manifest = json.loads(manifest_path.read_text()) if mtime is not None else {}
+        if manifest.get('fingerprint') != get_fingerprint():
+            manifest = generate_schema_artifacts(directory)
+            mtime = manifest_path.stat().st_mtime_ns
+        filename = manifest['files'][name]
+        artifact = (
+            (directory / filename).read_bytes(),
+            (directory / f'{filename}.gz').read_bytes(),
+            quote_etag(f"{manifest['digest']}-{name}"),
+        )
+        _loaded[(directory, name)] = (mtime, artifact)
+        return artifact
+
+
+class CachedSpectacularAPIView(SpectacularAPIView):
+    """Отдача заранее сгенерированной схемы с ETag и gzip"""
+
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        name = 'json' if isinstance(renderer, OpenApiJsonRenderer) else 'yaml'
+        content, compressed, etag = load_schema_artifact(name)
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        elif accepts_gzip(request.headers.get('Accept-Encoding', '')):
+            response = HttpResponse(compressed, content_type=content_type)
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(content, content_type=content_type)
+
+        response['ETag'] = etag
+        patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+        return response
@@ -0,0 +1,112 @@
+from django.core.files.storage import default_storage
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+from config.services.image_service import get_variant_names, inspect_image
+
+
+@extend_schema_field(OpenApiTypes.OBJECT)
+class ImageVariantsField(serializers.Field):
+    """
+    Ссылки на уменьшенные копии изображения: {размер: {формат: url}}.
+
+    Наличие файлов не проверяется, чтобы не обращаться к хранилищу
+    для каждого объекта списка: пока варианты создаются в фоне,
+    клиент может использовать оригинал.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        # Пустое изображение тоже передается в to_representation
+        value = super().get_attribute(instance)
+        return value if value else None
+
+    def to_representation(self, value):
+        name = getattr(value, 'name', value)
+        if not name:
+            return None
+        storage = getattr(value, 'storage', default_storage)
+        request = self.context.get('request')
+        urls = {}
+        for size, formats in get_variant_names(name).items():
+            urls[str(size)] = {}
+            for image_format, variant in formats.items():
+                url = storage.url(variant)
+                urls[str(size)][image_format] = request.build_absolute_uri(url) if request else url
+        return urls
+
+
+class LazyImageField(serializers.ImageField):
+    """
+    ImageField с проверкой только заголовка изображения (inspect_image).
+
+    Стандартный ImageField проверяет файл через Pillow verify(); здесь
+    формат и размеры читаются из заголовка без разбора данных изображения.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('required', False)
+        kwargs.setdefault('allow_null', True)
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        file = serializers.FileField.to_internal_value(self, data)
+        try:
+            inspect_image(file)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e), code='invalid_image')
+        return file
+
+
+def parse_field_list(value):
+    return {name.strip() for name in value.split(',') if name.strip()} if value else set()
+
+
+class SparseFieldsetsMixin:
+    """
+    Выбор полей ответа параметрами запроса.
+
+    ?fields=id,name - только перечисленные поля; без него используются
+    Meta.default_fields (если заданы) или все поля. ?expand=lessons добавляет
+    поля из Meta.expandable_fields, которые иначе не выводятся.
+    Действует на корневой сериализатор в GET-запросах.
+    """
+
+    def _is_root(self):
+        parent = getattr(self, 'parent', None)
+        return parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS or not self._is_root():
+            return fields
+
+        params = getattr(request, 'query_params', request.GET)
+        expandable = set(getattr(self.Meta, 'expandable_fields', ()))
+        requested = parse_field_list(params.get('fields'))
+        if not requested:
+            requested = set(getattr(self.Meta, 'default_fields', fields))
+        allowed = (requested - expandable) | (parse_field_list(params.get('expand')) & expandable)
+        return {name: field for name, field in fields.items() if name in allowed}
+
+
+def only_serialized_fields(queryset, serializer):
+    """
+    Ограничение выбираемых колонок полями модели, которые выводит serializer.
+
+    Поля с source='*' (SerializerMethodField) колонок не добавляют и должны
+    опираться на аннотации или первичный ключ.
+    """
+    model = queryset.model
+    concrete = {field.name for field in model._meta.concrete_fields}
+    columns = {model._meta.pk.name}
+    for field in serializer.fields.values():
+        if field.source_attrs and field.source_attrs[0] in concrete:
+            columns.add(field.source_attrs[0])
+    return queryset.only(*columns)
@@ -0,0 +1,224 @@
+"""
+Уменьшенные копии изображений (превью курсов и уроков, аватарки).
+
+Для каждого загруженного изображения создаются варианты фиксированных
+размеров (IMAGE_VARIANT_SIZES, по большей стороне) в форматах
+IMAGE_VARIANT_FORMATS. Варианты лежат рядом с оригиналом:
+images/avatars/photo.png -> images/avatars/photo.png__160.webp. Расширение
+оригинала входит в имя, поэтому у photo.png и photo.jpg разные варианты.
+
+Обработка выполняется в пуле потоков после коммита транзакции, поэтому
+запрос на загрузку не ждет Pillow. Для уже загруженных файлов есть
+команда generate_image_variants.
+"""
+import io
+import logging
+import posixpath
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import post_save
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {
+    'webp': 'webp',
+    'jpeg': 'jpg',
+}
+
+VARIANT_RE = re.compile(r'__\d+$')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variant_name(name, size, image_format):
+    """Имя варианта в хранилище: <имя оригинала>__<size>.<ext> в каталоге оригинала"""
+    return f'{name}__{size}.{EXTENSIONS[image_format]}'
+
+
+def is_variant(name):
+    return bool(VARIANT_RE.search(posixpath.splitext(name)[0]))
+
+
+def get_variant_names(name):
+    """{размер: {формат: имя}} для всех вариантов изображения"""
+    return {
+        size: {image_format: variant_name(name, size, image_format) for image_format in settings.IMAGE_VARIANT_FORMATS}
+        for size in settings.IMAGE_VARIANT_SIZES
+    }
+
+
+def inspect_image(file):
+    """
+    Проверка изображения по заголовку без декодирования пикселей.
+
+    Image.open читает только заголовок, поэтому проверка формата и размеров
+    не зависит от объема файла. Возвращает (формат, ширина, высота),
+    при ошибке - ValueError с описанием.
+    """
+    position = file.tell() if hasattr(file, 'tell') else None
+    try:
+        with Image.open(file) as image:
+            image_format, (width, height) = image.format, image.size
+    except Image.DecompressionBombError:
+        raise ValueError('Слишком большое изображение')
+    except (OSError, SyntaxError):
+        raise ValueError('Файл не является изображением')
+    finally:
+        if position is not None:
+            file.seek(position)
+
+    if image_format not in settings.IMAGE_ALLOWED_FORMATS:
+        raise ValueError(f'Формат {image_format} не поддерживается')
+    if max(width, height) > settings.IMAGE_MAX_DIMENSION:
+        raise ValueError(
+            f'Размер изображения {width}x{height} больше {settings.IMAGE_MAX_DIMENSION} пикселей'
+        )
+    return image_format, width, height
+
+
+def _prepare(image, image_format):
+    if image_format == 'jpeg' and image.mode != 'RGB':
+        # JPEG не поддерживает прозрачность: подкладываем белый фон
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    if image.mode not in ('RGB', 'RGBA'):
+        return image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+    return image
+
+
+def generate_variants(name, storage=None, overwrite=False):
+    """
+    Создание вариантов изображения name.
+
+    Возвращает список созданных файлов. Существующие варианты
+    пропускаются, если не указан overwrite.
+    """
+    storage = storage or default_storage
+    targets = [
+        (size, image_format, variant)
+        for size, formats in get_variant_names(name).items()
+        for image_format, variant in formats.items()
+        if overwrite or not storage.exists(variant)
+    ]
+    if not targets:
+        return []
+
+    max_size = max(size for size, _, _ in targets)
+    with storage.open(name, 'rb') as file:
+        with Image.open(file) as image:
+            # JPEG декодируется сразу в уменьшенном масштабе (draft)
+            image.draft('RGB', (max_size, max_size))
+            image = ImageOps.exif_transpose(image)
+            image.load()
+
+    created = []
+    for size in sorted({size for size, _, _ in targets}, reverse=True):
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+        for target_size, image_format, variant in targets:
+            if target_size != size:
+                continue
+            buffer = io.BytesIO()
+            _prepare(resized, image_format).save(
+                buffer, format=image_format.upper(), quality=settings.IMAGE_VARIANT_QUALITY, optimize=True
+            )
+            if storage.exists(variant):
+                storage.delete(variant)
+            created.append(storage.save(variant, ContentFile(buffer.getvalue())))
+        # Следующий размер меньше: уменьшаем уже уменьшенную копию
+        image = resized
+    return created
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_VARIANT_WORKERS, thread_name_prefix='image-variants'
+            )
+        return _executor
+
+
+def _generate_safe(name):
+    try:
+        return generate_variants(name, overwrite=True)
+    except Exception:
+        logger.exception('Failed to generate variants for %s', name)
+        return []
+
+
+def schedule_variants(name):
+    """Создание вариантов после коммита текущей транзакции"""
+    def run():
+        if settings.IMAGE_VARIANTS_ASYNC:
+            _get_executor().submit(_generate_safe, name)
+        else:
+            _generate_safe(name)
+
+    transaction.on_commit(run)
+
+
+def _tracking_descriptor(descriptor):
+    """
+    Дескриптор поля, запоминающий имя файла до первого присваивания.
+
+    Присваивание из Model.__init__ (поля еще нет в __dict__) пропускается,
+    поэтому загрузка объектов из БД не выполняет лишней работы.
+    """
+    class TrackingDescriptor(type(descriptor)):
+        def __set__(self, instance, value):
+            attname = self.field.attname
+            if attname in instance.__dict__:
+                names = instance.__dict__.setdefault('_image_names', {})
+                if attname not in names:
+                    previous = instance.__dict__[attname]
+                    # Незакоммиченный файл еще не лежит в хранилище: имени нет
+                    names[attname] = (
+                        getattr(previous, 'name', previous) if getattr(previous, '_committed', True) else None
+                    )
+            super().__set__(instance, value)
+
+    return TrackingDescriptor(descriptor.field)
+
+
+def track_image_fields(model, *field_names):
+    """
+    Создание вариантов при смене изображения в полях field_names модели.
+
+    Исходное имя файла запоминает дескриптор поля при присваивании нового
+    значения, поэтому ни загрузка объектов, ни проверка изменений не
+    требуют дополнительной работы и запросов к БД.
+    """
+    for field_name in field_names:
+        attname = model._meta.get_field(field_name).attname
+        setattr(model, attname, _tracking_descriptor(model.__dict__[attname]))
+
+    def changed(sender, instance, raw, **kwargs):
+        initial = instance.__dict__.pop('_image_names', None)
+        if raw or not initial:
+            return
+        for field_name in field_names:
+            if field_name not in initial or field_name not in instance.__dict__:
+                continue
+            name = getattr(instance, field_name).name
+            if name and name != initial[field_name]:
+                schedule_variants(name)
+
+    # Сохранение proxy-модели отправляет сигнал со своим sender
+    senders = [model] + [
+        proxy for proxy in apps.get_models() if proxy._meta.proxy and issubclass(proxy, model)
+    ]
+    for sender in senders:
+        post_save.connect(changed, sender=sender, weak=False, dispatch_uid=f'image_save_{sender._meta.label}')
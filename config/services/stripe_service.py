@@ -1,9 +1,15 @@
 import stripe
 from django.conf import settings
+from django.db import transaction
+
+from config.metrics import observe_stripe
+from materials.models import Course
+from users.models import StripeCoursePrice
 
 stripe.api_key = settings.STRIPE_API_KEY
 
 
+@observe_stripe('product.create')
 def create_stripe_product(name, description=None):
     """Создание продукта в Stripe"""
     return stripe.Product.create(
@@ -12,6 +18,7 @@ def create_stripe_product(name, description=None):
     )
 
 
+@observe_stripe('price.create')
 def create_stripe_price(product_id, amount, currency='rub'):
     """Создание цены в Stripe"""
     return stripe.Price.create(
@@ -21,8 +28,58 @@ def create_stripe_price(product_id, amount, currency='rub'):
     )
 
 
-def create_stripe_checkout_session(price_id, success_url, cancel_url):
-    """Создание сессии оплаты в Stripe"""
+def get_or_create_course_price(course, currency='rub'):
+    """
+    Продукт и цена Stripe для курса.
+
+    Идентификаторы хранятся в БД (StripeCoursePrice) и переиспользуются,
+    пока не изменились название или цена курса. При смене цены создается
+    только новая цена, при смене названия - новый продукт и цена.
+    """
+    product_name = f'Курс: {course.name}'
+    unit_amount = int(course.price * 100)
+
+    stripe_price = StripeCoursePrice.objects.filter(course=course).first()
+    if stripe_price and stripe_price.matches(product_name, unit_amount, currency):
+        return stripe_price
+
+    with transaction.atomic():
+        # Блокируем курс, чтобы параллельные оплаты не создали дубликаты в Stripe
+        Course.objects.select_for_update().filter(pk=course.pk).first()
+        stripe_price = StripeCoursePrice.objects.filter(course=course).first()
+        if stripe_price and stripe_price.matches(product_name, unit_amount, currency):
+            return stripe_price
+
+        if stripe_price and stripe_price.product_name == product_name:
+            product_id = stripe_price.stripe_product_id
+        else:
+            product_id = create_stripe_product(
+                name=product_name,
+                description=(course.description or '')[:500] or None
+            ).id
+        price = create_stripe_price(product_id=product_id, amount=course.price, currency=currency)
+
+        stripe_price, _ = StripeCoursePrice.objects.update_or_create(
+            course=course,
+            defaults={
+                'product_name': product_name,
+                'unit_amount': unit_amount,
+                'currency': currency,
+                'stripe_product_id': product_id,
+                'stripe_price_id': price.id,
+            }
+        )
+    return stripe_price
+
+
+@observe_stripe('checkout_session.create')
+def create_stripe_checkout_session(price_id, success_url, cancel_url, idempotency_key=None):
+    """
+    Создание сессии оплаты в Stripe.
+
+    Повторный запрос с тем же idempotency_key возвращает уже созданную сессию.
+    """
+    options = {'idempotency_key': idempotency_key} if idempotency_key else {}
     return stripe.checkout.Session.create(
         payment_method_types=['card'],
         line_items=[{
@@ -32,9 +89,16 @@ def create_stripe_checkout_session(price_id, success_url, cancel_url):
         mode='payment',
         success_url=success_url,
         cancel_url=cancel_url,
+        **options
     )
 
 
+@observe_stripe('checkout_session.retrieve')
 def retrieve_stripe_session(session_id):
     """Получение информации о сессии"""
     return stripe.checkout.Session.retrieve(session_id)
+
+
+def construct_webhook_event(payload, signature):
+    """Проверка подписи вебхука и разбор события"""
+    return stripe.Webhook.construct_event(payload, signature, settings.STRIPE_WEBHOOK_SECRET)
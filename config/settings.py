@@ -46,12 +46,16 @@ INSTALLED_APPS = [
     'rest_framework_simplejwt',
     'drf_spectacular',
 
+    'config',
     'users',
     'materials',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'config.query_stats.QueryStatsMiddleware',
+    'config.metrics.MetricsMiddleware',
+    'config.profiling.ProfilingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -82,17 +86,70 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
-        'NAME': os.getenv('NAME'),
-        'USER': os.getenv('USER'),
-        'PASSWORD': os.getenv('PASSWORD'),
-        'HOST': os.getenv('HOST'),
-        'PORT': os.getenv('PORT', default='5432'),
+DB_ENGINE = os.getenv('DB_ENGINE', default='postgresql')
+
+# Пул соединений psycopg3 (pip install "psycopg[pool]"), рекомендуется для ASGI.
+# Без пула соединения переиспользуются в пределах CONN_MAX_AGE секунд.
+DB_POOL = os.getenv('DB_POOL') == 'True'
+
+if DB_ENGINE == 'sqlite':
+    # Локальная разработка и тесты без PostgreSQL
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        }
     }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('NAME'),
+            'USER': os.getenv('USER'),
+            'PASSWORD': os.getenv('PASSWORD'),
+            'HOST': os.getenv('HOST'),
+            'PORT': os.getenv('PORT', default='5432'),
+            'CONN_MAX_AGE': int(os.getenv('CONN_MAX_AGE', default='60')),
+            'CONN_HEALTH_CHECKS': os.getenv('CONN_HEALTH_CHECKS', default='True') == 'True',
+        }
+    }
+    if DB_POOL:
+        # Пул сам управляет соединениями, persistent connections с ним несовместимы
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'min_size': int(os.getenv('DB_POOL_MIN_SIZE', default='2')),
+                'max_size': int(os.getenv('DB_POOL_MAX_SIZE', default='10')),
+                'timeout': float(os.getenv('DB_POOL_TIMEOUT', default='10')),
+            },
+        }
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='online-school'),
+    },
+    # Отзыв токенов (users.authentication): общий для процессов кэш в памяти
+    # без вытеснения - Redis (отдельная БД с maxmemory-policy noeviction) или
+    # Memcached. С другими бэкендами (в том числе DatabaseCache) claims токенов
+    # не используются и пользователь читается из БД на каждый запрос
+    'auth': {
+        'BACKEND': os.getenv('AUTH_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('AUTH_CACHE_LOCATION', default='online-school-auth'),
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('AUTH_CACHE_MAX_ENTRIES', default='1000000'))},
+    },
 }
 
+# Время жизни закэшированных ответов курсов и уроков (секунды), см. materials.cache
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', default='300'))
+# Кэш ответов с LocMemCache при DEBUG=False: только для одного процесса
+RESPONSE_CACHE_ALLOW_LOCAL = os.getenv('RESPONSE_CACHE_ALLOW_LOCAL', default='False') == 'True'
+# Claims токенов с LocMemCache в CACHES['auth']: только для одного процесса
+AUTH_CACHE_ALLOW_LOCAL = os.getenv('AUTH_CACHE_ALLOW_LOCAL', default='False') == 'True'
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -135,18 +192,57 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/images/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'images')
 
+# Уменьшенные копии изображений (config.services.image_service): размеры
+# по большей стороне в пикселях, форматы, качество и число потоков обработки
+IMAGE_VARIANT_SIZES = [int(size) for size in os.getenv('IMAGE_VARIANT_SIZES', default='160,480,1024').split(',')]
+IMAGE_VARIANT_FORMATS = os.getenv('IMAGE_VARIANT_FORMATS', default='webp,jpeg').split(',')
+IMAGE_VARIANT_QUALITY = int(os.getenv('IMAGE_VARIANT_QUALITY', default='80'))
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', default='2'))
+IMAGE_VARIANTS_ASYNC = os.getenv('IMAGE_VARIANTS_ASYNC', default='True') == 'True'
+
+# Лимиты загрузки (config.uploads) в байтах и проверка изображений по заголовку
+UPLOAD_MAX_REQUEST_SIZE = int(os.getenv('UPLOAD_MAX_REQUEST_SIZE', default=str(6 * 1024 * 1024)))
+UPLOAD_MAX_FILE_SIZE = int(os.getenv('UPLOAD_MAX_FILE_SIZE', default=str(5 * 1024 * 1024)))
+IMAGE_MAX_DIMENSION = int(os.getenv('IMAGE_MAX_DIMENSION', default='6000'))
+IMAGE_ALLOWED_FORMATS = os.getenv('IMAGE_ALLOWED_FORMATS', default='JPEG,PNG,WEBP,GIF').split(',')
+
 AUTH_USER_MODEL = "users.CustomUser"
 
+# Время жизни кэша групп пользователя (секунды), см. users.roles
+ROLE_CACHE_TTL = int(os.getenv('ROLE_CACHE_TTL', default='60'))
+
+# Максимум id курсов в одном запросе subscription/bulk/
+SUBSCRIPTION_BULK_MAX_IDS = int(os.getenv('SUBSCRIPTION_BULK_MAX_IDS', default='1000'))
+
+# Импорт курса (materials.transfer): максимум уроков и размер пачки bulk_create
+COURSE_IMPORT_MAX_LESSONS = int(os.getenv('COURSE_IMPORT_MAX_LESSONS', default='10000'))
+COURSE_IMPORT_BATCH_SIZE = int(os.getenv('COURSE_IMPORT_BATCH_SIZE', default='1000'))
+
+# JSON через orjson (pip install orjson); без пакета или при FAST_JSON=False - стандартный json
+FAST_JSON = os.getenv('FAST_JSON', default='True') == 'True'
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.ClaimsJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_RENDERER_CLASSES': [
+        'config.renderers.ORJSONRenderer' if FAST_JSON else 'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'config.renderers.ORJSONParser' if FAST_JSON else 'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# Начиная с какой оценки планировщика ?count=approx не выполняет точный COUNT(*)
+APPROXIMATE_COUNT_THRESHOLD = int(os.getenv('APPROXIMATE_COUNT_THRESHOLD', default='10000'))
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
@@ -177,8 +273,46 @@ SPECTACULAR_SETTINGS = {
     ],
 }
 
+# Статистика SQL-запросов по view (config.query_stats): доля замеряемых запросов, 0 - выключено
+QUERY_STATS_SAMPLE_RATE = float(os.getenv('QUERY_STATS_SAMPLE_RATE', default='0'))
+# Запросы дольше порога (мс) пишутся в лог
+QUERY_STATS_SLOW_MS = float(os.getenv('QUERY_STATS_SLOW_MS', default='100'))
+# Сколько самых медленных запросов хранить на view
+QUERY_STATS_TOP = int(os.getenv('QUERY_STATS_TOP', default='5'))
+# Агрегаты хранятся окнами по QUERY_STATS_WINDOW секунд, последние QUERY_STATS_WINDOWS окон
+QUERY_STATS_WINDOW = int(os.getenv('QUERY_STATS_WINDOW', default='300'))
+QUERY_STATS_WINDOWS = int(os.getenv('QUERY_STATS_WINDOWS', default='12'))
+# Каталог для агрегатов процессов (нужен при нескольких воркерах и для dump_query_stats)
+QUERY_STATS_DIR = os.getenv('QUERY_STATS_DIR', default='')
+QUERY_STATS_FLUSH_INTERVAL = float(os.getenv('QUERY_STATS_FLUSH_INTERVAL', default='30'))
+# Метрики Prometheus (config.metrics): сбор в middleware и токен доступа к /metrics (без токена эндпоинт отключен)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', default='True') == 'True'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', default='')
+# Каталог для метрик процессов при нескольких воркерах gunicorn; очищается при деплое
+METRICS_DIR = os.getenv('METRICS_DIR', default='')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', default='10'))
+# Профилирование запросов (config.profiling): каталог профилей, без него профилирование выключено
+PROFILING_DIR = os.getenv('PROFILING_DIR', default='')
+# Доля профилируемых запросов, 0 - только запросы с подписанным заголовком X-Profile
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', default='0'))
+# cprofile или sampling (статистический, интервал снимков стека в мс)
+PROFILING_MODE = os.getenv('PROFILING_MODE', default='cprofile')
+PROFILING_INTERVAL = float(os.getenv('PROFILING_INTERVAL', default='5'))
+# Срок действия токена X-Profile (с)
+PROFILING_TOKEN_MAX_AGE = int(os.getenv('PROFILING_TOKEN_MAX_AGE', default='600'))
+
+# Каталог с заранее сгенерированной схемой OpenAPI (команда generate_schema)
+SCHEMA_ARTIFACT_DIR = os.getenv('SCHEMA_ARTIFACT_DIR', default=os.path.join(BASE_DIR, 'schema'))
+
 STRIPE_API_KEY = os.getenv('STRIPE_API_KEY')
 if not STRIPE_API_KEY:
     raise ValueError("STRIPE_API_KEY не найден в переменных окружения")
 STRIPE_PUBLIC_KEY = os.getenv('STRIPE_PUBLIC_KEY')
 STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET')
+
+# Асинхронное создание сессий оплаты через очередь в БД (users.checkout_queue)
+STRIPE_CHECKOUT_ASYNC = os.getenv('STRIPE_CHECKOUT_ASYNC') == 'True'
+CHECKOUT_JOB_MAX_ATTEMPTS = int(os.getenv('CHECKOUT_JOB_MAX_ATTEMPTS', default='5'))
+CHECKOUT_RETRY_BASE_DELAY = float(os.getenv('CHECKOUT_RETRY_BASE_DELAY', default='2'))
+CHECKOUT_RETRY_MAX_DELAY = float(os.getenv('CHECKOUT_RETRY_MAX_DELAY', default='300'))
+CHECKOUT_JOB_TIMEOUT = int(os.getenv('CHECKOUT_JOB_TIMEOUT', default='120'))
@@ -0,0 +1,671 @@
+import datetime
+import gzip
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models.signals import post_init
+from django.test import AsyncClient, override_settings
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from PIL import Image
+
+from config import metrics, profiling, query_stats
+from config.fast_serialization import compile_fields
+from config.process_state import save_process_state
+from config.renderers import ORJSONRenderer
+from config.schema import MANIFEST_NAME, generate_schema_artifacts
+from config.services.image_service import generate_variants, is_variant
+from config.services.stripe_service import create_stripe_product
+from materials.models import Course, Lesson
+from materials.serializers import CourseListSerializer, CourseSerializer, LessonSerializer
+from users.models import ClaimsUser, CustomUser as User, Payment
+from users.serializers import CustomTokenObtainPairSerializer, PaymentSerializer
+
+
+class SchemaArtifactTestCase(APITestCase):
+    """Тесты отдачи заранее сгенерированной схемы OpenAPI"""
+
+    def setUp(self):
+        artifact_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(artifact_dir.cleanup)
+        settings_override = override_settings(SCHEMA_ARTIFACT_DIR=artifact_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_schema_served_with_etag(self):
+        """Схема генерируется один раз и отдается с ETag"""
+        response = self.client.get(reverse('schema'), {'format': 'json'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)['info']['title'], 'Online School API')
+
+        response = self.client.get(
+            reverse('schema'), {'format': 'json'}, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_schema_gzip(self):
+        response = self.client.get(reverse('schema'), HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(b'openapi:', gzip.decompress(response.content))
+
+        for header in ('gzip;q=0, deflate', 'x-gzip', 'identity'):
+            response = self.client.get(reverse('schema'), HTTP_ACCEPT_ENCODING=header)
+            self.assertNotIn('Content-Encoding', response)
+        response = self.client.get(reverse('schema'), HTTP_ACCEPT_ENCODING='br;q=1, *;q=0.5')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_old_artifacts_removed(self):
+        directory = Path(settings.SCHEMA_ARTIFACT_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / 'schema-0.9.0-old.json').write_text('{}')
+        (directory / 'schema-0.9.0-old.json.gz').write_text('')
+        manifest = generate_schema_artifacts()
+        expected = {MANIFEST_NAME, *manifest['files'].values()}
+        expected |= {f'{filename}.gz' for filename in manifest['files'].values()}
+        self.assertEqual({path.name for path in directory.iterdir()}, expected)
+
+    def test_stale_artifact_regenerated(self):
+        """Схема, собранная другим кодом, генерируется заново"""
+        manifest = generate_schema_artifacts()
+        manifest_path = Path(settings.SCHEMA_ARTIFACT_DIR) / MANIFEST_NAME
+        stale = {**manifest, 'digest': 'stale', 'fingerprint': 'old-code'}
+        manifest_path.write_text(json.dumps(stale))
+
+        response = self.client.get(reverse('schema'), {'format': 'json'})
+        self.assertEqual(response['ETag'], f'"{manifest["digest"]}-json"')
+        self.assertEqual(json.loads(manifest_path.read_text()), manifest)
+
+    def test_stripe_payment_documented(self):
+        response = self.client.get(reverse('schema'), {'format': 'json'})
+        operation = json.loads(response.content)['paths']['/users/payments/stripe/{course_id}/']['post']
+        self.assertEqual(operation['summary'], 'Создать платеж Stripe')
+        self.assertIn('async', [parameter['name'] for parameter in operation['parameters']])
+        self.assertIn('202', operation['responses'])
+
+
+class DatabasePoolStatsTestCase(APITestCase):
+    """Тесты статистики соединений с БД"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            username='testuser'
+        )
+        self.admin = User.objects.create_user(
+            email='admin@test.com',
+            password='testpass123',
+            username='admin',
+            is_staff=True
+        )
+
+    def test_stats_for_staff_only(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('db-pool-stats'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(reverse('db-pool-stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stats = response.json()[0]
+        self.assertEqual(stats['alias'], 'default')
+        self.assertIn(stats['mode'], ('pool', 'persistent', 'per-request'))
+        self.assertIn('connections_created', stats)
+
+
+def make_image(size=(100, 50), image_format='PNG', mode='RGBA'):
+    buffer = io.BytesIO()
+    Image.new(mode, size, (255, 0, 0, 128) if mode == 'RGBA' else (255, 0, 0)).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+@override_settings(IMAGE_VARIANT_SIZES=[32, 8], IMAGE_VARIANT_FORMATS=['webp', 'jpeg'], IMAGE_VARIANTS_ASYNC=False)
+class ImageVariantsTestCase(APITestCase):
+    """Тесты уменьшенных копий изображений"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.media_root = Path(media_root.name)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            username='testuser'
+        )
+        self.course = Course.objects.create(name='Test Course', owner=self.user)
+
+    def assertVariant(self, name, size):
+        with Image.open(self.media_root / name) as image:
+            self.assertEqual(image.size, size)
+
+    def test_variants_created_after_upload(self):
+        """После загрузки превью создаются варианты, сериализатор отдает ссылки"""
+        self.client.force_authenticate(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                reverse('courses-detail', args=[self.course.id]),
+                {'preview': SimpleUploadedFile('cover.png', make_image(), content_type='image/png')},
+                format='multipart'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        original = Path(response.json()['preview']).name
+        directory = self.media_root / 'images' / 'course_previews'
+        self.assertVariant(directory / f'{original}__32.webp', (32, 16))
+        self.assertVariant(directory / f'{original}__32.jpg', (32, 16))
+        self.assertVariant(directory / f'{original}__8.webp', (8, 4))
+        variants = response.json()['preview_variants']
+        self.assertTrue(variants['32']['webp'].endswith(f'{original}__32.webp'))
+        self.assertTrue(variants['8']['jpeg'].endswith(f'{original}__8.jpg'))
+
+    def test_same_stem_different_extension(self):
+        """У photo.png и photo.jpg в одном каталоге свои варианты"""
+        png = default_storage.save('images/avatars/photo.png', io.BytesIO(make_image((40, 80))))
+        jpg = default_storage.save('images/avatars/photo.jpg', io.BytesIO(make_image((80, 40), 'JPEG', 'RGB')))
+        generate_variants(png)
+        generate_variants(jpg)
+        self.assertVariant(f'{png}__32.webp', (16, 32))
+        self.assertVariant(f'{jpg}__32.webp', (32, 16))
+        self.assertFalse(is_variant(png))
+        self.assertTrue(is_variant(f'{jpg}__32.webp'))
+
+    def test_no_variants_without_image(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('courses-detail', args=[self.course.id]))
+        self.assertIsNone(response.json()['preview_variants'])
+
+    def test_backfill_command(self):
+        """Команда создает недостающие варианты для уже загруженных файлов"""
+        name = default_storage.save('images/avatars/photo.jpg', io.BytesIO(make_image((40, 80), 'JPEG', 'RGB')))
+        output = io.StringIO()
+        call_command('generate_image_variants', workers=2, stdout=output)
+        self.assertIn('создано вариантов: 4', output.getvalue())
+        self.assertVariant('images/avatars/photo.jpg__32.webp', (16, 32))
+
+        output = io.StringIO()
+        call_command('generate_image_variants', workers=2, stdout=output)
+        self.assertIn('Изображений: 1, создано вариантов: 0', output.getvalue())
+
+    def test_backfill_command_processes(self):
+        """Пул процессов работает и без fork: дочерние процессы настраивают Django сами"""
+        default_storage.save('images/avatars/photo.jpg', io.BytesIO(make_image((40, 80), 'JPEG', 'RGB')))
+        output = io.StringIO()
+        call_command('generate_image_variants', workers=1, processes=True, stdout=output)
+        self.assertIn('Изображений: 1', output.getvalue())
+        self.assertIn('ошибок: 0', output.getvalue())
+        self.assertNotIn('создано вариантов: 0', output.getvalue())
+
+    def test_loading_not_tracked(self):
+        """Загрузка объектов не запускает обработчиков и ничего не запоминает"""
+        self.assertFalse(post_init.has_listeners(Course))
+        self.assertFalse(post_init.has_listeners(User))
+        course = Course.objects.get(pk=self.course.pk)
+        self.assertNotIn('_image_names', course.__dict__)
+        with mock.patch('config.services.image_service.schedule_variants') as schedule:
+            course.save()
+        schedule.assert_not_called()
+
+    def test_variants_after_assignment(self):
+        """Присваивание имени уже загруженного файла создает варианты один раз"""
+        name = default_storage.save('images/avatars/photo.jpg', io.BytesIO(make_image((40, 80), 'JPEG', 'RGB')))
+        user = ClaimsUser.objects.get(pk=self.user.pk)
+        user.avatar = name
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.assertVariant(f'{name}__32.webp', (16, 32))
+
+        with mock.patch('config.services.image_service.schedule_variants') as schedule:
+            user.avatar = name
+            user.save()
+        schedule.assert_not_called()
+
+
+@override_settings(UPLOAD_MAX_REQUEST_SIZE=64 * 1024, UPLOAD_MAX_FILE_SIZE=32 * 1024, IMAGE_MAX_DIMENSION=500)
+class ImageUploadTestCase(APITestCase):
+    """Тесты ограничений загрузки изображений"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name, IMAGE_VARIANTS_ASYNC=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            username='testuser'
+        )
+        self.course = Course.objects.create(name='Test Course', owner=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def upload(self, content, name='cover.png'):
+        return self.client.patch(
+            reverse('courses-detail', args=[self.course.id]),
+            {'preview': SimpleUploadedFile(name, content, content_type='image/png')},
+            format='multipart'
+        )
+
+    def test_valid_image_accepted(self):
+        response = self.upload(make_image())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.json()['preview'].endswith('.png'))
+
+    def test_request_too_large(self):
+        """Запрос больше лимита отклоняется по Content-Length"""
+        response = self.upload(b'0' * 100 * 1024)
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    def test_file_too_large(self):
+        """Файл больше лимита прерывается во время загрузки"""
+        response = self.upload(make_image() + b'0' * 40 * 1024)
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    def test_not_an_image(self):
+        response = self.upload(b'<?php echo 1; ?>')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('preview', response.json())
+
+    def test_dimensions_checked_by_header(self):
+        """Размеры берутся из заголовка: усеченный файл с большими размерами отклоняется"""
+        header = make_image((1000, 10), mode='RGB')[:64]
+        response = self.upload(header)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('1000x10', response.json()['preview'][0])
+
+
+class FastSerializationTestCase(APITestCase):
+    """Списки через values() совпадают с выводом обычных сериализаторов"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(
+            email='admin@test.com',
+            password='testpass123',
+            username='admin'
+        )
+        course = Course.objects.create(name='Курс', owner=self.user)
+        Lesson.objects.create(
+            name='С превью', course=course, owner=self.user, preview='images/lesson_previews/a.png'
+        )
+        Lesson.objects.create(name='Без превью', description='Описание', course=course, owner=self.user)
+        Payment.objects.create(user=self.user, paid_course=course, amount=1000, payment_method='cash')
+        Payment.objects.create(user=self.user, amount=500, payment_method='transfer', stripe_session_id='cs_1')
+        self.client.force_authenticate(user=self.user)
+
+    def assertSameOutput(self, url, serializer_class, queryset, params=None):
+        response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        expected = serializer_class(queryset, many=True, context={'request': response.wsgi_request}).data
+        self.assertEqual(
+            JSONRenderer().render(response.data['results']),
+            JSONRenderer().render(expected)
+        )
+
+    def test_lessons(self):
+        self.assertSameOutput(reverse('lessons-list'), LessonSerializer, Lesson.objects.order_by('id'))
+
+    def test_payments(self):
+        self.assertSameOutput(reverse('payment-list'), PaymentSerializer, Payment.objects.all())
+
+    def test_payments_cursor(self):
+        """Колонки keyset-пагинации читаются, даже если их нет среди полей"""
+        response = self.client.get(reverse('payment-list'), {'pagination': 'cursor', 'page_size': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(response.json()['next'])
+        self.assertEqual(len(response.json()['results']), 1)
+
+    def test_unsupported_serializer(self):
+        """SerializerMethodField и вложенные сериализаторы не поддерживаются"""
+        self.assertIsNone(compile_fields(CourseSerializer()))
+        self.assertIsNotNone(compile_fields(LessonSerializer()))
+
+
+class ORJSONRendererTestCase(APITestCase):
+    """Рендерер на orjson совпадает со стандартным JSONRenderer"""
+
+    data = {
+        'decimal': Decimal('10.50'),
+        'datetime': datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+        'date': datetime.date(2024, 5, 1),
+        'time': datetime.time(8, 15),
+        'lazy': gettext_lazy('Курс'),
+        'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'int_keys': {1: 'a', 2: ['b', None, True, 1.5]},
+        'separator': 'строка\u2028строка',
+    }
+
+    def test_same_output(self):
+        self.assertEqual(ORJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+        with mock.patch('config.renderers.orjson', None):
+            self.assertEqual(ORJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+
+    def test_unsupported_by_orjson(self):
+        """Целые больше 64 бит кодируются стандартным json"""
+        self.assertEqual(ORJSONRenderer().render({'big': 2 ** 70}), b'{"big":1180591620717411303424}')
+
+    def test_indent_uses_stdlib(self):
+        content = ORJSONRenderer().render(self.data, 'application/json; indent=4')
+        self.assertEqual(content, JSONRenderer().render(self.data, 'application/json; indent=4'))
+
+    def test_api(self):
+        """Разбор и рендеринг через API, ошибки разбора и согласование формата"""
+        user = User.objects.create_user(email='user@test.com', password='testpass123', username='testuser')
+        self.client.force_authenticate(user=user)
+        response = self.client.post(
+            reverse('courses-list'), data=json.dumps({'name': 'Курс'}), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(json.loads(response.content)['name'], 'Курс')
+
+        response = self.client.post(reverse('courses-list'), data='{"name":', content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(reverse('courses-list'), HTTP_ACCEPT='text/html')
+        self.assertEqual(response['Content-Type'], 'text/html; charset=utf-8')
+        response = self.client.get(reverse('courses-list'))
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+
+@override_settings(QUERY_STATS_SAMPLE_RATE=1)
+class QueryStatsTestCase(APITestCase):
+    """Тесты статистики SQL-запросов по view"""
+
+    def setUp(self):
+        query_stats.stats.reset()
+        self.addCleanup(query_stats.stats.reset)
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            username='testuser'
+        )
+        self.admin = User.objects.create_user(
+            email='admin@test.com',
+            password='testpass123',
+            username='admin',
+            is_staff=True
+        )
+        for i in range(3):
+            Course.objects.create(name=f'Курс {i}', owner=self.user)
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            query_stats.fingerprint("SELECT * FROM t WHERE a IN (%s, %s, %s) AND b = 'x' LIMIT 21"),
+            'SELECT * FROM t WHERE a IN (%s, ...) AND b = ? LIMIT ?'
+        )
+
+    def test_duplicates(self):
+        """Одинаковые запросы с разными параметрами - повтор"""
+        recorder = query_stats.QueryRecorder(top=2)
+        with connection.execute_wrapper(recorder):
+            for course in Course.objects.all():
+                list(User.objects.filter(pk=course.owner_id))
+        self.assertEqual(recorder.count, 4)
+        self.assertEqual(list(recorder.duplicates.values()), [3])
+        self.assertEqual(len(recorder.slowest), 2)
+
+    def test_report(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('courses-list'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", app;dur=[\d.]+$')
+
+        response = self.client.get(reverse('query-stats'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.admin)
+        report = {item['view']: item for item in self.client.get(reverse('query-stats')).json()}
+        courses = report['GET courses-list']
+        self.assertEqual(courses['requests'], 1)
+        self.assertGreater(courses['queries'], 0)
+        self.assertTrue(courses['slowest'])
+
+    @override_settings(QUERY_STATS_SAMPLE_RATE=0)
+    def test_disabled(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('courses-list'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(query_stats.get_report(), [])
+
+    def test_dump_command(self):
+        """Команда читает агрегаты, сохраненные процессами в QUERY_STATS_DIR"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with override_settings(QUERY_STATS_DIR=directory.name):
+            self.client.force_authenticate(user=self.user)
+            self.client.get(reverse('courses-list'))
+            query_stats.stats.flush(force=True)
+            query_stats.stats.reset()
+            output = io.StringIO()
+            # Команда выполняется в отдельном процессе
+            with mock.patch('config.process_state.os.getpid', return_value=-1):
+                call_command('dump_query_stats', stdout=output)
+        self.assertIn('GET courses-list: запросов 1', output.getvalue())
+
+
+@override_settings(METRICS_TOKEN='secret', METRICS_DIR='')
+class MetricsTestCase(APITestCase):
+    """Тесты метрик Prometheus"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            username='testuser'
+        )
+        Course.objects.create(name='Курс', owner=self.user)
+        self.token = CustomTokenObtainPairSerializer.get_token(self.user).access_token
+
+    def get_metrics(self, token='secret'):
+        return self.client.get(reverse('metrics'), HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_access(self):
+        self.assertEqual(self.get_metrics(token='wrong').status_code, status.HTTP_401_UNAUTHORIZED)
+        with override_settings(METRICS_TOKEN=''):
+            self.assertEqual(self.get_metrics().status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_view_metrics(self):
+        self.client.force_authenticate(user=self.user)
+        self.client.get(reverse('courses-list'))
+        response = self.get_metrics()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        text = response.content.decode()
+        labels = 'view="CourseViewSet",action="list",method="GET",status="2xx"'
+        self.assertIn(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}}', text)
+        self.assertIn(f'http_request_duration_seconds_count{{{labels}}}', text)
+        self.assertRegex(text, r'db_queries_total\{view="CourseViewSet",action="list"\} [1-9]')
+        self.assertIn('# TYPE db_pool_connections_created gauge', text)
+
+    async def test_async_view(self):
+        """Запросы async ORM учитываются и при async-цепочке middleware"""
+        key = ('AsyncCourseListAPIView', 'get')
+        before = metrics.DB_QUERIES.values.get(key, 0)
+        response = await AsyncClient().get(
+            reverse('async-courses-list'), headers={'Authorization': f'Bearer {self.token}'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreaterEqual(metrics.DB_QUERIES.values[key] - before, 2)
+
+    def test_stripe_metrics(self):
+        stripe = mock.Mock()
+        stripe.Product.create.side_effect = ValueError('timeout')
+        with mock.patch('config.services.stripe_service.stripe', stripe):
+            with self.assertRaises(ValueError):
+                create_stripe_product('Курс')
+        text = self.get_metrics().content.decode()
+        self.assertRegex(text, r'stripe_requests_total\{operation="product.create",outcome="ValueError"\} [1-9]')
+        self.assertIn('stripe_request_duration_seconds_count{operation="product.create"}', text)
+
+    def test_multiprocess(self):
+        """Счетчики и гистограммы других процессов суммируются, показатели получают метку pid"""
+        registry = metrics.Registry()
+        counter = registry.register(metrics.Counter('jobs_total', 'Задачи', ('kind',)))
+        histogram = registry.register(metrics.Histogram('job_seconds', 'Время задач', buckets=(0.1, 1)))
+        registry.register_collector(lambda: [('queue_size', 'gauge', 'Очередь', [([('queue', 'a"b')], 3)])])
+        counter.inc(kind='mail')
+        histogram.observe(0.5)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with override_settings(METRICS_DIR=directory.name):
+            # Другой живой процесс - родитель тестового
+            with mock.patch('config.process_state.os.getpid', return_value=os.getppid()):
+                save_process_state(directory.name, registry.snapshot(per_process_only=True))
+            text = registry.render()
+
+        self.assertIn('jobs_total{kind="mail"} 2', text)
+        self.assertIn('job_seconds_bucket{le="0.1"} 0', text)
+        self.assertIn('job_seconds_bucket{le="1.0"} 2', text)
+        self.assertIn('job_seconds_bucket{le="+Inf"} 2', text)
+        self.assertIn('job_seconds_sum 1.0', text)
+        self.assertIn(f'queue_size{{queue="a\\"b",pid="{os.getppid()}"}} 3', text)
+
+    def test_multiprocess_stale_gauges(self):
+        """Показатели завершившихся и давно не обновлявшихся процессов не выводятся, счетчики суммируются"""
+        registry = metrics.Registry()
+        counter = registry.register(metrics.Counter('jobs_total', 'Задачи'))
+        registry.register_collector(lambda: [('queue_size', 'gauge', 'Очередь', [([], 3)])])
+        counter.inc()
+
+        process = subprocess.Popen([sys.executable, '-c', 'pass'])
+        process.wait()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with override_settings(METRICS_DIR=directory.name, METRICS_FLUSH_INTERVAL=10):
+            for pid in (process.pid, os.getppid()):
+                with mock.patch('config.process_state.os.getpid', return_value=pid):
+                    save_process_state(directory.name, registry.snapshot(per_process_only=True))
+            text = registry.render()
+            self.assertIn('jobs_total 3', text)
+            self.assertNotIn(f'pid="{process.pid}"', text)
+            self.assertIn(f'queue_size{{pid="{os.getppid()}"}} 3', text)
+
+            stale = time.time() - 10 * metrics.STALE_FLUSH_INTERVALS - 1
+            os.utime(Path(directory.name) / f'{os.getppid()}.json', (stale, stale))
+            text = registry.render()
+            self.assertIn('jobs_total 3', text)
+            self.assertNotIn(f'pid="{os.getppid()}"', text)
+            self.assertIn('queue_size{pid="self"} 3', text)
+
+
+class ProfilingTestCase(APITestCase):
+    """Тесты профилирования запросов"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        settings_override = override_settings(PROFILING_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        profiling.store.reset()
+        self.addCleanup(profiling.store.reset)
+
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            username='testuser'
+        )
+        self.admin = User.objects.create_user(
+            email='admin@test.com',
+            password='testpass123',
+            username='admin',
+            is_staff=True
+        )
+        for i in range(3):
+            Course.objects.create(name=f'Курс {i}', owner=self.user)
+        self.token = CustomTokenObtainPairSerializer.get_token(self.user).access_token
+
+    def get_token(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.post(reverse('profiling-token'))
+        self.client.force_authenticate(user=self.user)
+        return response.json()['token']
+
+    def test_token_access(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(reverse('profiling-token'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_signed_header(self):
+        response = self.client.get(reverse('courses-list'), HTTP_X_PROFILE=self.get_token())
+        self.assertIn('X-Profile-Duration', response)
+        report = profiling.load_reports(self.directory)['CourseViewSet.list']
+        layers = profiling.layer_times(report['stats'])
+        for layer in ('db', 'serializer', 'permission', 'view'):
+            self.assertIn(layer, layers)
+
+        output = io.StringIO()
+        call_command('profile_report', stdout=output)
+        self.assertIn('CourseViewSet.list', output.getvalue())
+
+    def test_forged_header(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('courses-list'), HTTP_X_PROFILE='profile:forged')
+        self.assertNotIn('X-Profile-Duration', response)
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+    @override_settings(PROFILING_MODE='sampling', PROFILING_INTERVAL=0.2, PROFILING_SAMPLE_RATE=1)
+    def test_sampling(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('courses-list'))
+        self.assertIn('X-Profile-Duration', response)
+        self.assertEqual([path.suffix for path in self.directory.iterdir()], ['.folded'])
+
+    async def test_async_view(self):
+        """Кадры async view попадают в профиль под ASGI"""
+        headers = {'Authorization': f'Bearer {self.token}', profiling.HEADER: profiling.make_token()}
+        response = await AsyncClient().get(reverse('async-courses-list'), headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('X-Profile-Duration', response)
+        report = profiling.load_reports(self.directory)['AsyncCourseListAPIView.get']
+        functions = {(Path(filename).name, name) for filename, _, name in report['stats'].stats}
+        self.assertIn(('async_views.py', 'get'), functions)
+        self.assertIn(('async_views.py', 'perform_authentication'), functions)
+
+    @override_settings(PROFILING_MODE='sampling', PROFILING_INTERVAL=0.2)
+    async def test_async_view_sampling(self):
+        headers = {'Authorization': f'Bearer {self.token}', profiling.HEADER: profiling.make_token()}
+        # Сериализация выполняется в потоке цикла событий, замедляем ее для снимков
+        slow = mock.Mock(side_effect=lambda course: time.sleep(0.02) or {})
+        with mock.patch.object(CourseListSerializer, 'to_representation', slow):
+            response = await AsyncClient().get(reverse('async-courses-list'), headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        folded = profiling.load_reports(self.directory)['AsyncCourseListAPIView.get']['folded']
+        self.assertTrue(any('materials.async_views:AsyncCourseListAPIView.get' in stack for stack in folded))
+
+    def test_layer_samples(self):
+        folded = {
+            'V.list;rest_framework.views:APIView.dispatch;rest_framework.serializers:ListSerializer.to_representation;'
+            'django.db.models.query:QuerySet.__iter__': 3,
+            'V.list;rest_framework.views:APIView.dispatch;rest_framework.permissions:IsAuthenticated.has_permission': 1,
+            'V.list;rest_framework.views:APIView.dispatch': 1,
+        }
+        self.assertEqual(profiling.layer_samples(folded), {'db': 3, 'permission': 1, 'view': 1})
+
+    def test_classify_cache(self):
+        """Кэш ответов проекта относится к view, кэш Django - нет"""
+        self.assertEqual(profiling.classify('materials.cache'), 'view')
+        self.assertEqual(profiling.classify(str(settings.BASE_DIR / 'materials' / 'cache.py')), 'view')
+        self.assertEqual(profiling.classify('django.core.cache.backends.locmem'), 'other')
+        self.assertEqual(profiling.classify('/venv/lib/python3.12/site-packages/django/core/cache/__init__.py'), 'other')
@@ -0,0 +1,51 @@
+"""
+Загрузка файлов с ограничением размера.
+
+Файл пишется во временный файл по частям и не держится в памяти целиком.
+Слишком большой запрос отклоняется по Content-Length до чтения тела,
+слишком большой файл - на первом чанке, превысившем лимит.
+"""
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Размер загружаемых данных превышает допустимый'
+    default_code = 'upload_too_large'
+
+
+class SizeLimitedUploadHandler(TemporaryFileUploadHandler):
+    """Потоковая запись во временный файл с лимитами UPLOAD_MAX_REQUEST_SIZE и UPLOAD_MAX_FILE_SIZE"""
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > settings.UPLOAD_MAX_REQUEST_SIZE:
+            raise UploadTooLarge(
+                f'Размер запроса превышает {settings.UPLOAD_MAX_REQUEST_SIZE} байт'
+            )
+        return super().handle_raw_input(input_data, META, content_length, boundary, encoding)
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.UPLOAD_MAX_FILE_SIZE:
+            # Закрытие удаляет временный файл
+            self.file.close()
+            raise UploadTooLarge(
+                f'Размер файла {self.file_name} превышает {settings.UPLOAD_MAX_FILE_SIZE} байт'
+            )
+        return super().receive_data_chunk(raw_data, start)
+
+
+class LimitedUploadMixin:
+    """Подключение SizeLimitedUploadHandler для загрузок во ViewSet"""
+
+    def initialize_request(self, request, *args, **kwargs):
+        # Обработчики нужно заменить до первого обращения к request.data
+        request.upload_handlers = [SizeLimitedUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
@@ -18,16 +18,24 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
+from drf_spectacular.views import SpectacularSwaggerView, SpectacularRedocView
+
+from config.schema import CachedSpectacularAPIView
+from config.views import DatabasePoolStatsAPIView, MetricsView, ProfilingTokenAPIView, QueryStatsAPIView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('materials.urls')),
     path('users/', include('users.urls')),
 
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
+    path('api/schema/', CachedSpectacularAPIView.as_view(), name='schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     path('api/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
+
+    path('internal/db-pool/', DatabasePoolStatsAPIView.as_view(), name='db-pool-stats'),
+    path('internal/query-stats/', QueryStatsAPIView.as_view(), name='query-stats'),
+    path('internal/profiling/token/', ProfilingTokenAPIView.as_view(), name='profiling-token'),
+    path('metrics', MetricsView.as_view(), name='metrics'),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,70 @@
+import hmac
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.views import View
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from config.db import get_pool_stats
+from config.metrics import CONTENT_TYPE, registry
+from config.profiling import HEADER, make_token
+from config.query_stats import get_report
+
+from drf_spectacular.utils import extend_schema
+
+
+@extend_schema(exclude=True)
+class DatabasePoolStatsAPIView(APIView):
+    """Статистика соединений с БД текущего процесса (только для администраторов)"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response([get_pool_stats(alias) for alias in connections])
+
+
+@extend_schema(exclude=True)
+class QueryStatsAPIView(APIView):
+    """Статистика SQL-запросов по view (только для администраторов)"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        report = get_report()
+        limit = request.query_params.get('limit')
+        if limit and limit.isdigit():
+            report = report[:int(limit)]
+        return Response(report)
+
+
+@extend_schema(exclude=True)
+class ProfilingTokenAPIView(APIView):
+    """Токен для профилирования отдельного запроса (только для администраторов)"""
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        return Response({
+            'header': HEADER,
+            'token': make_token(),
+            'expires_in': settings.PROFILING_TOKEN_MAX_AGE,
+            'enabled': bool(settings.PROFILING_DIR),
+        })
+
+
+class MetricsView(View):
+    """
+    Метрики для Prometheus.
+
+    Доступ по заголовку Authorization: Bearer <METRICS_TOKEN>;
+    без METRICS_TOKEN эндпоинт отключен.
+    """
+
+    def get(self, request):
+        token = settings.METRICS_TOKEN
+        if not token:
+            raise Http404
+        header = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(header.encode(), f'Bearer {token}'.encode()):
+            return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+        return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,100 @@
+"""
+Async-варианты чтения курсов и уроков и подписки на курс для ASGI.
+
+Ответы совпадают с CourseViewSet/LessonViewSet (list, retrieve) и
+SubscriptionAPIView, запросы к БД выполняются через async ORM (acount,
+aget, async for). Кэш ответов и режимы пагинации cursor/approx не
+поддерживаются.
+
+Быстрее синхронных view они не работают: async ORM Django 5.2 все равно
+выполняет запросы в потоках, и в benchmarks/bench_async.py пропускная
+способность sync и async view одинакова в пределах разброса.
+"""
+from rest_framework import status
+
+from config.async_views import AsyncAPIView, json_response
+from config.serializers import only_serialized_fields
+from users.roles import ais_staff_or_moderator
+from .filters import CourseFilter, LessonFilter
+from .models import Course, Lesson, Subscription
+from .paginators import CoursePagination, LessonPagination
+from .querysets import get_course_queryset
+from .serializers import CourseListSerializer, CourseSerializer, LessonSerializer
+
+
+class AsyncCourseMixin:
+    async def get_queryset(self, serializer):
+        queryset = get_course_queryset(
+            self.request.user,
+            only_owned=not await ais_staff_or_moderator(self.request),
+            with_lessons='lessons' in serializer.fields
+        )
+        return only_serialized_fields(queryset, serializer)
+
+
+class AsyncCourseListAPIView(AsyncCourseMixin, AsyncAPIView):
+    filterset_class = CourseFilter
+    pagination_class = CoursePagination
+
+    async def get(self, request):
+        context = self.get_serializer_context()
+        queryset = self.filter_queryset(await self.get_queryset(CourseListSerializer(context=context)))
+        page = await self.paginate_queryset(queryset)
+        page['results'] = CourseListSerializer(page['results'], many=True, context=context).data
+        return json_response(page)
+
+
+class AsyncCourseRetrieveAPIView(AsyncCourseMixin, AsyncAPIView):
+
+    async def get(self, request, pk):
+        context = self.get_serializer_context()
+        course = await self.get_object(await self.get_queryset(CourseSerializer(context=context)), pk=pk)
+        return json_response(CourseSerializer(course, context=context).data)
+
+
+class AsyncLessonMixin:
+    async def get_queryset(self, serializer):
+        queryset = Lesson.objects.order_by('id')
+        if not await ais_staff_or_moderator(self.request):
+            queryset = queryset.filter(owner=self.request.user)
+        return only_serialized_fields(queryset, serializer)
+
+
+class AsyncLessonListAPIView(AsyncLessonMixin, AsyncAPIView):
+    filterset_class = LessonFilter
+    pagination_class = LessonPagination
+
+    async def get(self, request):
+        context = self.get_serializer_context()
+        queryset = self.filter_queryset(await self.get_queryset(LessonSerializer(context=context)))
+        page = await self.paginate_queryset(queryset)
+        page['results'] = LessonSerializer(page['results'], many=True, context=context).data
+        return json_response(page)
+
+
+class AsyncLessonRetrieveAPIView(AsyncLessonMixin, AsyncAPIView):
+
+    async def get(self, request, pk):
+        context = self.get_serializer_context()
+        lesson = await self.get_object(await self.get_queryset(LessonSerializer(context=context)), pk=pk)
+        return json_response(LessonSerializer(lesson, context=context).data)
+
+
+class AsyncSubscriptionAPIView(AsyncAPIView):
+    """Подписка/отписка от курса, как SubscriptionAPIView"""
+
+    async def post(self, request):
+        course_id = request.data.get('course_id')
+        if not course_id:
+            return json_response({"error": "course_id обязателен"}, status=status.HTTP_400_BAD_REQUEST)
+
+        course_item = await self.get_object(Course.objects.all(), id=course_id)
+        subscription, created = await Subscription.objects.aget_or_create(
+            user=request.user,
+            course=course_item
+        )
+
+        if not created:
+            await subscription.adelete()
+            return json_response({"message": 'Подписка удалена'}, status=status.HTTP_200_OK)
+        return json_response({"message": 'Подписка добавлена'}, status=status.HTTP_201_CREATED)
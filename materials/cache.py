@@ -0,0 +1,149 @@
+"""
+Кэширование ответов list/retrieve для курсов и уроков.
+
+Ключи содержат версию данных: сигналы post_save/post_delete на Course, Lesson
+и Subscription увеличивают версию, и все ранее закэшированные ответы
+перестают использоваться без перебора ключей.
+
+Версия должна быть общей для всех воркеров, поэтому кэш ответов работает
+только с общим бэкендом (Redis, Memcached, БД, файловый). С LocMemCache
+запись в одном процессе не сбрасывает ответы других, и кэш отключен, кроме
+DEBUG и RESPONSE_CACHE_ALLOW_LOCAL (один процесс, тесты).
+"""
+import hashlib
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from config.caches import is_shared
+from config.renderers import dumps
+from users.roles import is_staff_or_moderator
+
+VERSION_KEY = 'materials:version'
+STATS_KEYS = {
+    'hits': 'materials:cache:hits',
+    'misses': 'materials:cache:misses',
+}
+
+
+def is_enabled():
+    return is_shared() or settings.DEBUG or settings.RESPONSE_CACHE_ALLOW_LOCAL
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Начальное значение от времени: после вытеснения ключа версия
+        # не совпадет с версиями старых записей
+        cache.add(VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def bump_version():
+    """Инвалидация всех закэшированных ответов"""
+    _incr(VERSION_KEY)
+
+
+_bump_requests = ContextVar('materials_bump_requests', default=None)
+
+
+def bump_version_on_commit():
+    requests = _bump_requests.get()
+    if requests is not None:
+        requests.append(True)
+        return
+    # Сразу - чтобы изменения внутри транзакции не читались из кэша,
+    # и после коммита - чтобы не остался ответ, собранный параллельным
+    # запросом до коммита
+    bump_version()
+    transaction.on_commit(bump_version)
+
+
+@contextmanager
+def single_bump():
+    """Версия внутри блока не меняется и увеличивается один раз при выходе, если были изменения"""
+    requests = []
+    token = _bump_requests.set(requests)
+    try:
+        yield
+    finally:
+        _bump_requests.reset(token)
+    if requests:
+        bump_version_on_commit()
+
+
+def get_stats():
+    """Счетчики попаданий и промахов кэша ответов"""
+    return {name: cache.get(key, 0) for name, key in STATS_KEYS.items()}
+
+
+def compute_etag(data):
+    return quote_etag(hashlib.md5(dumps(data), usedforsecurity=False).hexdigest())
+
+
+class CachedResponseMixin:
+    """
+    Кэширование ответов list/retrieve с ETag и If-None-Match.
+
+    Ответы персональны (cache_per_user), если содержат данные пользователя,
+    иначе разделяются между администраторами и модераторами.
+    """
+    cache_per_user = False
+
+    def get_cache_scope(self):
+        if not self.cache_per_user and is_staff_or_moderator(self.request):
+            return 'staff'
+        return f'user:{self.request.user.pk}'
+
+    def get_response_cache_key(self, request):
+        path = hashlib.md5(request.get_full_path().encode(), usedforsecurity=False).hexdigest()
+        return f'response:{self.basename}:{self.action}:{self.get_cache_scope()}:{get_version()}:{path}'
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if not is_enabled():
+            return handler(request, *args, **kwargs)
+        key = self.get_response_cache_key(request)
+        entry = cache.get(key)
+        if entry is None:
+            _incr(STATS_KEYS['misses'])
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = (response.data, compute_etag(response.data))
+            cache.set(key, entry, settings.RESPONSE_CACHE_TIMEOUT)
+            cache_status = 'MISS'
+        else:
+            _incr(STATS_KEYS['hits'])
+            response = None
+            cache_status = 'HIT'
+
+        data, etag = entry
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        elif response is None:
+            response = Response(data)
+        response['ETag'] = etag
+        response['X-Cache'] = cache_status
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
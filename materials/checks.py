@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+from . import cache
+
+
+@register(Tags.caches, deploy=True)
+def check_response_cache(app_configs, **kwargs):
+    """Кэш ответов с локальным для процесса бэкендом отключен (см. materials.cache)"""
+    if cache.is_enabled() or settings.DEBUG:
+        return []
+    return [Warning(
+        'Кэш ответов курсов и уроков отключен: бэкенд кэша default локален для процесса',
+        hint='Укажите общий бэкенд в CACHE_BACKEND (Redis, Memcached, БД) '
+             'или RESPONSE_CACHE_ALLOW_LOCAL=True для одного процесса',
+        id='materials.W001',
+    )]
@@ -0,0 +1,125 @@
+"""
+Денормализованные счетчики курса: уроки, подписчики, выручка.
+
+Счетчики меняются атомарно через F() на стороне БД, поэтому параллельные
+изменения не теряются; уменьшение ограничено нулем, если счетчик уже
+разошелся с данными (его исправляет reconcile). Массовые операции (bulk_create, update) сигналы
+не вызывают и обновляют счетчики сами через apply_deltas; массовый delete()
+сигналы вызывает, поэтому выполняется внутри suspended().
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+
+from .cache import bump_version_on_commit
+from .models import Course, Lesson, Subscription
+
+
+_suspended = ContextVar('counters_suspended', default=False)
+
+
+@contextmanager
+def suspended():
+    """Сигналы не меняют счетчики: операция применит изменения через apply_deltas"""
+    token = _suspended.set(True)
+    try:
+        yield
+    finally:
+        _suspended.reset(token)
+
+
+def _add(field, delta):
+    """F(field) + delta, но не меньше нуля"""
+    output_field = Course._meta.get_field(field)
+    return Greatest(F(field) + delta, Value(0), output_field=output_field)
+
+
+def adjust(course_id, **deltas):
+    """Изменение счетчиков одного курса: adjust(1, lessons_count=1)"""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if course_id is None or not deltas or _suspended.get():
+        return
+    Course.objects.filter(pk=course_id).update(
+        **{field: _add(field, delta) for field, delta in deltas.items()}
+    )
+    # Счетчики входят в ответы API курсов
+    bump_version_on_commit()
+
+
+def apply_deltas(field, deltas):
+    """
+    Изменение одного счетчика у нескольких курсов.
+
+    deltas - {course_id: delta}. Выполняется один UPDATE с CASE по группам
+    курсов с одинаковым изменением.
+    """
+    by_delta = defaultdict(list)
+    for course_id, delta in deltas.items():
+        if course_id is not None and delta:
+            by_delta[delta].append(course_id)
+    if not by_delta:
+        return
+    increment = Case(
+        *[When(pk__in=course_ids, then=Value(delta)) for delta, course_ids in by_delta.items()],
+        default=Value(0),
+        output_field=IntegerField()
+    )
+    Course.objects.filter(pk__in=[pk for ids in by_delta.values() for pk in ids]).update(
+        **{field: _add(field, increment)}
+    )
+    bump_version_on_commit()
+
+
+def _count_subquery(queryset):
+    return Coalesce(
+        Subquery(
+            queryset.filter(course=OuterRef('pk')).order_by().values('course').annotate(
+                total=Count('pk')
+            ).values('total')
+        ),
+        Value(0),
+        output_field=IntegerField()
+    )
+
+
+def _revenue_subquery():
+    # Импорт здесь: users.models сам импортирует materials.models
+    from users.models import Payment
+
+    return Coalesce(
+        Subquery(
+            Payment.objects.filter(paid_course=OuterRef('pk'), is_paid=True).order_by().values(
+                'paid_course'
+            ).annotate(total=Sum('amount')).values('total')
+        ),
+        Value(0),
+        output_field=Course._meta.get_field('revenue')
+    )
+
+
+def reconcile(batch_size=1000):
+    """
+    Пересчет всех счетчиков по фактическим данным.
+
+    Курсы обрабатываются диапазонами id, на каждый диапазон выполняется
+    один UPDATE с подзапросами. Возвращает количество обработанных курсов.
+    """
+    processed = 0
+    last_id = 0
+    while True:
+        ids = list(
+            Course.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return processed
+        Course.objects.filter(pk__gte=ids[0], pk__lte=ids[-1]).update(
+            lessons_count=_count_subquery(Lesson.objects),
+            subscribers_count=_count_subquery(Subscription.objects),
+            revenue=_revenue_subquery()
+        )
+        processed += len(ids)
+        last_id = ids[-1]
+        bump_version_on_commit()
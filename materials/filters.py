@@ -0,0 +1,62 @@
+import django_filters
+from materials.models import Course, Lesson
+from materials.search import search as search_queryset
+
+
+class SearchFilterSet(django_filters.FilterSet):
+    """
+    Полнотекстовый поиск ?search= (см. materials.search).
+
+    Без явной сортировки результаты упорядочены по релевантности.
+    """
+    search = django_filters.CharFilter(method='filter_search', label='Поиск по названию и описанию')
+
+    def filter_search(self, queryset, name, value):
+        return search_queryset(queryset, value)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        ordering = self.form.cleaned_data.get('ordering')
+        if ordering:
+            # id - стабильный порядок при одинаковых значениях сортировки
+            queryset = queryset.order_by(*queryset.query.order_by, 'id')
+        elif self.form.cleaned_data.get('search'):
+            queryset = queryset.order_by('-search_rank', 'id')
+        return queryset
+
+
+class CourseFilter(SearchFilterSet):
+    min_lessons = django_filters.NumberFilter(
+        field_name='lessons_count',
+        lookup_expr='gte',
+        label='Минимальное количество уроков'
+    )
+    min_subscribers = django_filters.NumberFilter(
+        field_name='subscribers_count',
+        lookup_expr='gte',
+        label='Минимальное количество подписчиков'
+    )
+    ordering = django_filters.OrderingFilter(
+        fields=(
+            ('subscribers_count', 'popularity'),
+            ('revenue', 'revenue'),
+            ('lessons_count', 'lessons'),
+        ),
+        field_labels={
+            'subscribers_count': 'По количеству подписчиков',
+            'revenue': 'По выручке',
+            'lessons_count': 'По количеству уроков',
+        }
+    )
+
+    class Meta:
+        model = Course
+        fields = ['search', 'min_lessons', 'min_subscribers']
+
+
+class LessonFilter(SearchFilterSet):
+    course = django_filters.NumberFilter(field_name='course_id', label='ID курса')
+
+    class Meta:
+        model = Lesson
+        fields = ['search', 'course']
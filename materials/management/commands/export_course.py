@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from materials import transfer
+from materials.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Выгрузка курса с уроками в JSON или NDJSON (формат import_course)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_id', type=int)
+        parser.add_argument('--format', choices=transfer.FORMATS, default='ndjson')
+        parser.add_argument('--output', help='Файл выгрузки (по умолчанию - stdout)')
+
+    def handle(self, *args, **options):
+        course = Course.objects.filter(pk=options['course_id']).first()
+        if course is None:
+            raise CommandError(f'Курс {options["course_id"]} не найден')
+
+        chunks = transfer.export_course(course, options['format'])
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                output.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk.decode(), ending='')
@@ -0,0 +1,35 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from materials import transfer
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = 'Импорт курса с уроками из файла JSON или NDJSON (формат выгрузки export_course)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл курса')
+        parser.add_argument('--format', choices=transfer.FORMATS, help='Формат файла (по умолчанию - по расширению)')
+        parser.add_argument('--owner', help='Email владельца курса и уроков')
+        parser.add_argument('--batch-size', type=int, help='Уроков в одном INSERT')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        import_format = options['format'] or ('json' if path.suffix == '.json' else 'ndjson')
+        owner = None
+        if options['owner']:
+            owner = CustomUser.objects.filter(email=options['owner']).first()
+            if owner is None:
+                raise CommandError(f'Пользователь {options["owner"]} не найден')
+
+        try:
+            data = transfer.read(path.read_bytes(), import_format)
+            course = transfer.import_course(data, owner=owner, batch_size=options['batch_size'])
+        except ValidationError as exc:
+            raise CommandError(f'Курс не импортирован: {exc.detail}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортирован курс {course.pk} "{course.name}", уроков: {course.lessons_count}'
+        ))
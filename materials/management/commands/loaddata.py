@@ -0,0 +1,17 @@
+from django.core.management.commands import loaddata
+
+from materials.counters import reconcile
+from materials.models import Course, Lesson, Subscription
+from users.models import Payment
+
+# Модели, от которых зависят счетчики курса
+COUNTED_MODELS = {Course, Lesson, Subscription, Payment}
+
+
+class Command(loaddata.Command):
+    """loaddata с пересчетом счетчиков курсов: сигналы при загрузке фикстур их не меняют"""
+
+    def loaddata(self, fixture_labels):
+        super().loaddata(fixture_labels)
+        if self.models & COUNTED_MODELS:
+            reconcile()
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from materials.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Пересчет счетчиков курсов (уроки, подписчики, выручка) по фактическим данным'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Курсов в одном UPDATE')
+
+    def handle(self, *args, **options):
+        processed = reconcile(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано курсов: {processed}'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 04:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('materials', '0011_alter_subscription_course_alter_subscription_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='price',
+            field=models.PositiveIntegerField(default=0, help_text='Цена курса в рублях', verbose_name='Цена'),
+        ),
+    ]
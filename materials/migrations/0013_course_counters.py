@@ -0,0 +1,65 @@
+# Generated by Django 5.2 on 2026-10-18 04:21
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Course = apps.get_model('materials', 'Course')
+    Lesson = apps.get_model('materials', 'Lesson')
+    Subscription = apps.get_model('materials', 'Subscription')
+    Payment = apps.get_model('users', 'Payment')
+
+    def total(queryset, field, aggregate):
+        return Coalesce(
+            Subquery(
+                queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(
+                    total=aggregate
+                ).values('total')
+            ),
+            Value(0)
+        )
+
+    Course.objects.update(
+        lessons_count=total(Lesson.objects.all(), 'course', Count('pk')),
+        subscribers_count=total(Subscription.objects.all(), 'course', Count('pk')),
+        revenue=total(Payment.objects.filter(is_paid=True), 'paid_course', Sum('amount'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('materials', '0012_course_price'),
+        ('users', '0010_claimsuser'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='lessons_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество уроков'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='revenue',
+            field=models.PositiveBigIntegerField(default=0, editable=False, help_text='Сумма оплаченных платежей за курс в рублях', verbose_name='Выручка'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='subscribers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество подписчиков'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['subscribers_count'], name='course_subscribers_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['revenue'], name='course_revenue_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
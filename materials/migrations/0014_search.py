@@ -0,0 +1,93 @@
+from django.db import migrations
+
+SEARCH_TABLES = ('materials_course', 'materials_lesson')
+
+POSTGRESQL_FORWARD = [
+    """
+    ALTER TABLE {table} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    'CREATE INDEX {table}_search_idx ON {table} USING GIN (search_vector)',
+]
+
+POSTGRESQL_REVERSE = [
+    'DROP INDEX IF EXISTS {table}_search_idx',
+    'ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector',
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE {table}_fts USING fts5(
+        name, description, content='{table}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER {table}_fts_insert AFTER INSERT ON {table} BEGIN
+        INSERT INTO {table}_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER {table}_fts_delete AFTER DELETE ON {table} BEGIN
+        INSERT INTO {table}_fts({table}_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER {table}_fts_update AFTER UPDATE OF name, description ON {table} BEGIN
+        INSERT INTO {table}_fts({table}_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {table}_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    "INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS {table}_fts_insert',
+    'DROP TRIGGER IF EXISTS {table}_fts_delete',
+    'DROP TRIGGER IF EXISTS {table}_fts_update',
+    'DROP TABLE IF EXISTS {table}_fts',
+]
+
+STATEMENTS = {
+    'postgresql': (POSTGRESQL_FORWARD, POSTGRESQL_REVERSE),
+    'sqlite': (SQLITE_FORWARD, SQLITE_REVERSE),
+}
+
+
+def run(schema_editor, index):
+    """
+    SQL поиска для текущей СУБД (см. materials.search).
+
+    На прочих СУБД поиск работает через icontains без индекса.
+    В SQLite пересоздание таблицы при изменении ее полей удаляет триггеры:
+    такие миграции должны повторно выполнить SQLITE_FORWARD.
+    """
+    statements = STATEMENTS.get(schema_editor.connection.vendor)
+    if not statements:
+        return
+    for table in SEARCH_TABLES:
+        for statement in statements[index]:
+            schema_editor.execute(statement.format(table=table), params=None)
+
+
+def forward(apps, schema_editor):
+    run(schema_editor, 0)
+
+
+def reverse(apps, schema_editor):
+    run(schema_editor, 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('materials', '0013_course_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(forward, reverse),
+    ]
@@ -4,6 +4,9 @@ from DRY import NULLABLE
 from django.conf import settings
 
 
+COUNTER_FIELDS = ('lessons_count', 'subscribers_count', 'revenue')
+
+
 class Course(models.Model):
     name = models.CharField(
         max_length=255,
@@ -29,13 +32,52 @@ class Course(models.Model):
         **NULLABLE,
         verbose_name="Ссылка на материалы курса"
     )
+    price = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Цена',
+        help_text='Цена курса в рублях'
+    )
+
+    # Счетчики поддерживаются сигналами (см. materials.counters),
+    # сверка с фактическими данными - команда reconcile_course_counters
+    lessons_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество уроков'
+    )
+    subscribers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество подписчиков'
+    )
+    revenue = models.PositiveBigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Выручка',
+        help_text='Сумма оплаченных платежей за курс в рублях'
+    )
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Счетчики меняет только materials.counters через F(): сохранение
+        # существующего курса не перезаписывает их значениями, прочитанными раньше
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in COUNTER_FIELDS and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = 'Курс'
         verbose_name_plural = 'Курсы'
+        indexes = [
+            models.Index(fields=['subscribers_count'], name='course_subscribers_idx'),
+            models.Index(fields=['revenue'], name='course_revenue_idx'),
+        ]
 
 
 class Lesson(models.Model):
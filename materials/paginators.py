@@ -1,13 +1,142 @@
-from rest_framework.pagination import PageNumberPagination
+import json
 
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
-class LessonPagination(PageNumberPagination):
+
+def estimate_count(queryset):
+    """
+    Оценка количества строк по плану запроса PostgreSQL.
+
+    Возвращает None, если оценка недоступна (другая СУБД).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.get_compiler(using=queryset.db).as_sql()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class ApproximateCountPaginator(Paginator):
+    """Paginator, который считает строки по оценке планировщика вместо COUNT(*)"""
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        # На небольших выборках оценка неточна, а точный COUNT дешев
+        if estimate is None or estimate < settings.APPROXIMATE_COUNT_THRESHOLD:
+            return super().count
+        return estimate
+
+
+class KeysetPageNumberPagination(PageNumberPagination):
+    """
+    Постраничная пагинация с дополнительными режимами по запросу клиента:
+
+    - ?pagination=cursor (или наличие ?cursor=) - keyset-пагинация по cursor_ordering
+      без COUNT(*) и OFFSET;
+    - ?count=approx - приблизительное количество по оценке планировщика.
+
+    Курсор строится только по cursor_ordering, поэтому параметры, задающие
+    свой порядок (cursor_conflicting_params), в режиме cursor дают 400.
+
+    По умолчанию работает как обычный PageNumberPagination.
+    """
+    pagination_query_param = 'pagination'
+    count_query_param = 'count'
+    cursor_ordering = ('id',)
+    cursor_conflicting_params = ('search', 'ordering')
+
+    cursor_paginator = None
+
+    def get_cursor_paginator(self):
+        paginator = CursorPagination()
+        paginator.ordering = self.cursor_ordering
+        paginator.page_size = self.page_size
+        paginator.page_size_query_param = self.page_size_query_param
+        paginator.max_page_size = self.max_page_size
+        return paginator
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get(self.pagination_query_param) == 'cursor'
+            or CursorPagination.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(request):
+            conflicting = [param for param in self.cursor_conflicting_params if request.query_params.get(param)]
+            if conflicting:
+                raise ValidationError({
+                    param: [f'Не поддерживается вместе с {self.pagination_query_param}=cursor']
+                    for param in conflicting
+                })
+            self.cursor_paginator = self.get_cursor_paginator()
+            page = self.cursor_paginator.paginate_queryset(queryset, request, view)
+            self.display_page_controls = self.cursor_paginator.display_page_controls
+            return page
+
+        if request.query_params.get(self.count_query_param) == 'approx':
+            self.django_paginator_class = ApproximateCountPaginator
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.cursor_paginator:
+            return self.cursor_paginator.to_html()
+        return super().to_html()
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters += [
+            {
+                'name': self.pagination_query_param,
+                'required': False,
+                'in': 'query',
+                'description': (
+                    'Режим пагинации: cursor - keyset-пагинация без подсчета количества, '
+                    f'несовместим с {", ".join(self.cursor_conflicting_params)}'
+                ),
+                'schema': {'type': 'string', 'enum': ['page', 'cursor']},
+            },
+            {
+                'name': CursorPagination.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Курсор следующей/предыдущей страницы (режим cursor)',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.count_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'approx - приблизительное количество по оценке планировщика',
+                'schema': {'type': 'string', 'enum': ['exact', 'approx']},
+            },
+        ]
+        return parameters
+
+
+class LessonPagination(KeysetPageNumberPagination):
     page_size = 10  # Количество уроков на странице по умолчанию
     page_size_query_param = 'page_size'  # Параметр для изменения количества элементов на странице
     max_page_size = 50  # Максимальное количество элементов на странице
 
 
-class CoursePagination(PageNumberPagination):
+class CoursePagination(KeysetPageNumberPagination):
     page_size = 5  # Меньше курсов на странице, так как они более "тяжелые"
     page_size_query_param = 'page_size'
     max_page_size = 20
@@ -0,0 +1,28 @@
+from django.db.models import Exists, OuterRef, Prefetch
+
+from .models import Course, Lesson, Subscription
+
+
+def get_course_queryset(user, only_owned=True, with_lessons=True):
+    """
+    Единый queryset курсов для всех ролей.
+
+    Количество уроков хранится в самом курсе (см. materials.counters),
+    признак подписки считается в основном запросе, уроки подгружаются
+    одним дополнительным запросом, поэтому число запросов на страницу
+    не зависит от количества курсов на ней. Без with_lessons уроки
+    не загружаются (компактный список курсов).
+    """
+    queryset = Course.objects.annotate(
+        is_subscribed=Exists(
+            Subscription.objects.filter(course=OuterRef('pk'), user=user.pk)
+        ),
+    ).order_by('id')
+    if with_lessons:
+        queryset = queryset.prefetch_related(
+            Prefetch('lessons', queryset=Lesson.objects.order_by('id'))
+        )
+
+    if only_owned:
+        queryset = queryset.filter(owner=user)
+    return queryset
@@ -0,0 +1,85 @@
+"""
+Полнотекстовый поиск по названию и описанию курсов и уроков.
+
+PostgreSQL: генерируемая колонка search_vector (tsvector, название с весом A,
+описание - B) с GIN-индексом, запрос websearch_to_tsquery, ранжирование ts_rank.
+SQLite: внешняя FTS5-таблица <таблица>_fts, синхронизируемая триггерами,
+ранжирование по колонкам с совпадением. Обе структуры создаются миграцией 0014_search и не
+описаны в моделях.
+
+search() добавляет к queryset фильтр и аннотацию search_rank (больше - лучше).
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'russian'
+
+# Веса колонок для ранжирования в SQLite: название важнее описания
+FTS_WEIGHTS = {'name': 2.0, 'description': 1.0}
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fts5_query(query):
+    """
+    Безопасный запрос FTS5 из пользовательской строки.
+
+    Каждое слово берется в кавычки, поэтому операторы FTS5 (AND, NEAR, *,
+    двоеточие) трактуются как текст. Слова объединяются по И.
+    """
+    return ' '.join(f'"{token}"' for token in TOKEN_RE.findall(query))
+
+
+def _postgresql(queryset, query):
+    table = queryset.model._meta.db_table
+    tsquery = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+    return queryset.filter(
+        RawSQL(f'"{table}"."search_vector" @@ {tsquery}', [query], output_field=BooleanField())
+    ).annotate(
+        search_rank=RawSQL(f'ts_rank("{table}"."search_vector", {tsquery})', [query], output_field=FloatField())
+    )
+
+
+def _sqlite(queryset, query):
+    match = fts5_query(query)
+    if not match:
+        return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+    table = queryset.model._meta.db_table
+    fts_table = f'{table}_fts'
+    subquery = f'SELECT rowid FROM "{fts_table}" WHERE "{fts_table}" MATCH %s'
+    # Ранг - сумма весов колонок, в которых найдены все слова запроса.
+    # bm25 требует соединения с FTS5-таблицей, а такое соединение планировщик
+    # SQLite выполняет MATCH на каждую строку урока; некоррелированные
+    # подзапросы IN вычисляются один раз
+    rank = ' + '.join(
+        f'CASE WHEN "{table}"."id" IN ({subquery}) THEN {weight} ELSE 0 END'
+        for weight in FTS_WEIGHTS.values()
+    )
+    return queryset.filter(
+        pk__in=RawSQL(subquery, [match])
+    ).annotate(
+        search_rank=RawSQL(
+            rank,
+            [f'{column} : ({match})' for column in FTS_WEIGHTS],
+            output_field=FloatField()
+        )
+    )
+
+
+def search(queryset, query):
+    """Фильтрация queryset курсов или уроков по поисковой строке"""
+    query = query.strip()
+    if not query:
+        return queryset
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        return _postgresql(queryset, query)
+    if vendor == 'sqlite':
+        return _sqlite(queryset, query)
+    # Прочие СУБД: поиск подстроки без ранжирования
+    return queryset.filter(
+        Q(name__icontains=query) | Q(description__icontains=query)
+    ).annotate(search_rank=Value(0.0, output_field=FloatField()))
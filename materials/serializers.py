@@ -1,10 +1,16 @@
 
+from django.conf import settings
 from rest_framework import serializers
+
+from config.serializers import ImageVariantsField, LazyImageField, SparseFieldsetsMixin
 from .models import Course, Lesson
 from .validators import YouTubeLinkValidator
 
 
-class LessonSerializer(serializers.ModelSerializer):
+class LessonSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
+    preview = LazyImageField()
+    preview_variants = ImageVariantsField(source='preview')
+
     class Meta:
         model = Lesson
         fields = '__all__'
@@ -14,14 +20,16 @@ class LessonSerializer(serializers.ModelSerializer):
         ]
 
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     lessons = LessonSerializer(many=True, read_only=True)
-    lessons_count = serializers.IntegerField(read_only=True)
+    preview = LazyImageField()
+    preview_variants = ImageVariantsField(source='preview')
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
         model = Course
-        fields = '__all__'
+        # Выручка - служебный счетчик для сортировки, в API не выводится
+        exclude = ['revenue']
         extra_kwargs = {
             'name': {'help_text': 'Название курса'},
         }
@@ -29,11 +37,92 @@ class CourseSerializer(serializers.ModelSerializer):
             YouTubeLinkValidator(field='materials_link')
         ]
 
-    def get_lessons_count(self, obj):
-        return obj.lessons.count()
-
     def get_is_subscribed(self, obj):
+        # Значение уже посчитано в queryset (см. materials.querysets)
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.user_subscriptions.filter(user=request.user).exists()
+            return obj.course_subscriptions.filter(user=request.user).exists()
         return False
+
+
+class CourseListSerializer(CourseSerializer):
+    """Курс для списка: уроки выводятся только по запросу"""
+
+    class Meta(CourseSerializer.Meta):
+        expandable_fields = ['lessons']
+
+
+class LessonTransferSerializer(serializers.ModelSerializer):
+    """Урок в формате импорта и экспорта курса (materials.transfer)"""
+
+    class Meta:
+        model = Lesson
+        fields = ['name', 'description', 'video_link', 'materials_link']
+        validators = LessonSerializer.Meta.validators
+
+
+class CourseTransferSerializer(serializers.ModelSerializer):
+    """Курс в формате импорта и экспорта, без уроков"""
+
+    class Meta:
+        model = Course
+        fields = ['name', 'description', 'materials_link', 'price']
+        validators = CourseSerializer.Meta.validators
+
+
+class CourseImportSerializer(CourseTransferSerializer):
+    lessons = LessonTransferSerializer(
+        many=True,
+        required=False,
+        default=list,
+        max_length=settings.COURSE_IMPORT_MAX_LESSONS,
+        help_text='Уроки курса в порядке следования'
+    )
+
+    class Meta(CourseTransferSerializer.Meta):
+        fields = CourseTransferSerializer.Meta.fields + ['lessons']
+
+
+class CourseImportResultSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    lessons_count = serializers.IntegerField()
+
+
+class SubscriptionBulkSerializer(serializers.Serializer):
+    subscribe = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        default=list,
+        max_length=settings.SUBSCRIPTION_BULK_MAX_IDS,
+        help_text='ID курсов для подписки'
+    )
+    unsubscribe = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        default=list,
+        max_length=settings.SUBSCRIPTION_BULK_MAX_IDS,
+        help_text='ID курсов для отписки'
+    )
+
+    def validate(self, attrs):
+        if not attrs['subscribe'] and not attrs['unsubscribe']:
+            raise serializers.ValidationError('Нужно указать subscribe или unsubscribe')
+        overlap = set(attrs['subscribe']) & set(attrs['unsubscribe'])
+        if overlap:
+            raise serializers.ValidationError(
+                f'Курсы одновременно в subscribe и unsubscribe: {sorted(overlap)}'
+            )
+        return attrs
+
+
+class SubscriptionResultSerializer(serializers.Serializer):
+    course_id = serializers.IntegerField()
+    status = serializers.CharField()
+
+
+class SubscriptionBulkResponseSerializer(serializers.Serializer):
+    subscribe = SubscriptionResultSerializer(many=True)
+    unsubscribe = SubscriptionResultSerializer(many=True)
@@ -0,0 +1,115 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from config.services.image_service import track_image_fields
+from users.models import Payment
+from . import counters
+from .cache import bump_version_on_commit
+from .models import Course, Lesson, Subscription
+
+
+track_image_fields(Course, 'preview')
+track_image_fields(Lesson, 'preview')
+
+
+def deleted_with_course(origin):
+    """
+    Удаление каскадом от удаления курса: счетчики удаляемого курса не
+    нужны, версию кэша увеличит сигнал самого курса.
+    """
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model is Course
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def materials_changed(sender, origin=None, **kwargs):
+    """Инвалидация кэша ответов курсов и уроков"""
+    if sender is not Course and deleted_with_course(origin):
+        return
+    bump_version_on_commit()
+
+
+# Счетчики курса. Загрузка фикстур (raw) счетчики не меняет:
+# после loaddata их пересчитывает команда loaddata из materials
+
+@receiver(pre_save, sender=Lesson)
+def lesson_pre_save(sender, instance, raw, **kwargs):
+    # Курс до сохранения нужен, чтобы учесть перенос урока
+    instance._counter_course_id = None
+    if instance.pk and not raw:
+        instance._counter_course_id = Lesson.objects.filter(pk=instance.pk).values_list(
+            'course_id', flat=True
+        ).first()
+
+
+@receiver(post_save, sender=Lesson)
+def lesson_saved(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    old_course_id = getattr(instance, '_counter_course_id', None)
+    if created or old_course_id is None:
+        counters.adjust(instance.course_id, lessons_count=1)
+    elif old_course_id != instance.course_id:
+        counters.adjust(old_course_id, lessons_count=-1)
+        counters.adjust(instance.course_id, lessons_count=1)
+
+
+@receiver(post_delete, sender=Lesson)
+def lesson_deleted(sender, instance, origin=None, **kwargs):
+    if deleted_with_course(origin):
+        return
+    counters.adjust(instance.course_id, lessons_count=-1)
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_saved(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        counters.adjust(instance.course_id, subscribers_count=1)
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(sender, instance, origin=None, **kwargs):
+    if deleted_with_course(origin):
+        return
+    counters.adjust(instance.course_id, subscribers_count=-1)
+
+
+def _payment_revenue(course_id, amount, is_paid):
+    """Вклад платежа в выручку: (курс, сумма)"""
+    return (course_id, amount) if is_paid and course_id else (None, 0)
+
+
+@receiver(pre_save, sender=Payment)
+def payment_pre_save(sender, instance, raw, **kwargs):
+    instance._counter_revenue = (None, 0)
+    if instance.pk and not raw:
+        old = Payment.objects.filter(pk=instance.pk).values_list(
+            'paid_course_id', 'amount', 'is_paid'
+        ).first()
+        if old:
+            instance._counter_revenue = _payment_revenue(*old)
+
+
+@receiver(post_save, sender=Payment)
+def payment_saved(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    old_course_id, old_amount = getattr(instance, '_counter_revenue', (None, 0))
+    new_course_id, new_amount = _payment_revenue(instance.paid_course_id, instance.amount, instance.is_paid)
+    if old_course_id == new_course_id:
+        counters.adjust(new_course_id, revenue=new_amount - old_amount)
+    else:
+        counters.adjust(old_course_id, revenue=-old_amount)
+        counters.adjust(new_course_id, revenue=new_amount)
+
+
+@receiver(post_delete, sender=Payment)
+def payment_deleted(sender, instance, **kwargs):
+    course_id, amount = _payment_revenue(instance.paid_course_id, instance.amount, instance.is_paid)
+    counters.adjust(course_id, revenue=-amount)
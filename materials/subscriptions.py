@@ -0,0 +1,105 @@
+"""
+Массовая подписка и отписка от курсов.
+
+Независимо от количества id выполняется фиксированное число запросов:
+проверка курсов, выборка текущих подписок, один bulk INSERT, выборка и
+один DELETE удаляемых подписок, один UPDATE счетчиков подписчиков и одно
+изменение версии кэша ответов.
+
+От гонок с параллельными запросами защищает unique_together (user, course):
+если параллельный запрос успел создать часть подписок, bulk INSERT
+откатывается до точки сохранения и подписки создаются по одной, а курсы
+с чужими подписками получают статус already_subscribed и не меняют счетчик.
+"""
+from django.db import IntegrityError, transaction
+
+from . import counters
+from .cache import single_bump
+from .models import Course, Subscription
+
+CREATED = 'created'
+ALREADY_SUBSCRIBED = 'already_subscribed'
+DELETED = 'deleted'
+NOT_SUBSCRIBED = 'not_subscribed'
+NOT_FOUND = 'not_found'
+
+
+def _create(user, course_ids):
+    """Создание подписок; возвращает id курсов, подписки на которые созданы этим вызовом"""
+    try:
+        with transaction.atomic():
+            Subscription.objects.bulk_create(
+                [Subscription(user=user, course_id=course_id) for course_id in course_ids]
+            )
+        return course_ids
+    except IntegrityError:
+        pass
+    created = []
+    for course_id in course_ids:
+        try:
+            with transaction.atomic():
+                Subscription.objects.bulk_create([Subscription(user=user, course_id=course_id)])
+        except IntegrityError:
+            continue
+        created.append(course_id)
+    return created
+
+
+def bulk_update_subscriptions(user, subscribe=(), unsubscribe=()):
+    """
+    Подписка на курсы subscribe и отписка от курсов unsubscribe.
+
+    Возвращает словарь {'subscribe': [...], 'unsubscribe': [...]} с результатом
+    {'course_id': ..., 'status': ...} для каждого id в исходном порядке.
+    """
+    subscribe = list(dict.fromkeys(subscribe))
+    unsubscribe = list(dict.fromkeys(unsubscribe))
+
+    with transaction.atomic():
+        existing_courses = set(
+            Course.objects.filter(id__in=subscribe).values_list('id', flat=True)
+        ) if subscribe else set()
+        # Блокировка текущих подписок: параллельная отписка дождется нас,
+        # и счетчик подписчиков не уменьшится дважды
+        subscribed = set(
+            Subscription.objects.select_for_update().filter(
+                user=user, course_id__in=subscribe + unsubscribe
+            ).values_list('course_id', flat=True)
+        )
+
+        to_create = [
+            course_id for course_id in subscribe
+            if course_id in existing_courses and course_id not in subscribed
+        ]
+        to_delete = [course_id for course_id in unsubscribe if course_id in subscribed]
+
+        created = _create(user, to_create) if to_create else []
+        # Версия кэша ответов меняется один раз на всю операцию
+        with single_bump():
+            if to_delete:
+                # delete() выбирает строки и отправляет post_delete на каждую, но
+                # сигналы не меняют счетчики: ниже они обновляются одним UPDATE
+                with counters.suspended():
+                    Subscription.objects.filter(user=user, course_id__in=to_delete).delete()
+            # bulk_create не вызывает сигналы materials: счетчики обновляются здесь
+            counters.apply_deltas('subscribers_count', {
+                **{course_id: 1 for course_id in created},
+                **{course_id: -1 for course_id in to_delete},
+            })
+
+    created, deleted = set(created), set(to_delete)
+    return {
+        'subscribe': [
+            {
+                'course_id': course_id,
+                'status': CREATED if course_id in created
+                else ALREADY_SUBSCRIBED if course_id in subscribed or course_id in existing_courses
+                else NOT_FOUND
+            }
+            for course_id in subscribe
+        ],
+        'unsubscribe': [
+            {'course_id': course_id, 'status': DELETED if course_id in deleted else NOT_SUBSCRIBED}
+            for course_id in unsubscribe
+        ],
+    }
@@ -1,9 +1,25 @@
+import io
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status, serializers
 from rest_framework.test import APITestCase
-from users.models import CustomUser as User
+from rest_framework_simplejwt.tokens import AccessToken
+from users.models import CustomUser as User, Payment
+from users.roles import invalidate_user_groups
 from django.contrib.auth.models import Group
+from materials.cache import get_stats
+from materials.checks import check_response_cache
 from materials.models import Course, Lesson, Subscription
+from materials.serializers import CourseSerializer
 from materials.validators import YouTubeLinkValidator
 
 
@@ -188,3 +204,723 @@ class SubscriptionTestCase(APITestCase):
             user=self.user,
             course=self.course
         ).exists())
+
+
+class SubscriptionBulkTestCase(APITestCase):
+    """Тесты массовой подписки на курсы"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            username='testuser'
+        )
+        self.courses = [Course.objects.create(name=f'Course {i}', owner=self.user) for i in range(4)]
+        self.url = reverse('subscription-bulk')
+        self.client.force_authenticate(user=self.user)
+
+    def test_bulk_subscribe_and_unsubscribe(self):
+        """Результат возвращается для каждого id"""
+        first, second, third, fourth = self.courses
+        Subscription.objects.create(user=self.user, course=second)
+        Subscription.objects.create(user=self.user, course=third)
+        response = self.client.post(self.url, {
+            'subscribe': [first.id, second.id, 999999],
+            'unsubscribe': [third.id, fourth.id]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {
+            'subscribe': [
+                {'course_id': first.id, 'status': 'created'},
+                {'course_id': second.id, 'status': 'already_subscribed'},
+                {'course_id': 999999, 'status': 'not_found'}
+            ],
+            'unsubscribe': [
+                {'course_id': third.id, 'status': 'deleted'},
+                {'course_id': fourth.id, 'status': 'not_subscribed'}
+            ]
+        })
+        self.assertEqual(
+            set(Subscription.objects.filter(user=self.user).values_list('course_id', flat=True)),
+            {first.id, second.id}
+        )
+
+    def test_query_count_independent_of_ids(self):
+        """Число запросов не зависит от количества курсов"""
+        Subscription.objects.create(user=self.user, course=self.courses[3])
+        ids = [course.id for course in self.courses[:3]]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(self.url, {
+                'subscribe': ids, 'unsubscribe': [self.courses[3].id]
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # SAVEPOINT/RELEASE внутри тестовой транзакции + 6 запросов
+        self.assertEqual(
+            len([query for query in context.captured_queries if 'SAVEPOINT' not in query['sql']]), 6
+        )
+        counts = dict(Course.objects.values_list('id', 'subscribers_count'))
+        self.assertEqual([counts[course.id] for course in self.courses], [1, 1, 1, 0])
+
+    @override_settings(CACHES={
+        **settings.CACHES,
+        'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'bulk_test_cache'},
+    })
+    def test_query_count_with_database_cache(self):
+        """С кэшем в БД версия кэша ответов меняется один раз, а не на каждую подписку"""
+        call_command('createcachetable', 'bulk_test_cache', verbosity=0)
+        courses = [Course.objects.create(name=f'Extra {i}', owner=self.user) for i in range(30)]
+
+        def count_queries(data):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post(self.url, data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len([query for query in context.captured_queries if 'SAVEPOINT' not in query['sql']])
+
+        few, many = [course.id for course in courses[:2]], [course.id for course in courses]
+        self.assertEqual(count_queries({'subscribe': many}), count_queries({'subscribe': few + [self.courses[0].id]}))
+        self.assertEqual(count_queries({'unsubscribe': many}), count_queries({'unsubscribe': [self.courses[0].id]}))
+        self.assertFalse(Subscription.objects.filter(user=self.user).exists())
+
+    def test_concurrent_subscription_not_counted(self):
+        """Подписка, созданная параллельным запросом, не считается созданной повторно"""
+        first, second = self.courses[:2]
+        bulk_create = Subscription.objects.bulk_create
+
+        def concurrent_bulk_create(objs, *args, **kwargs):
+            # Параллельный запрос подписывает на первый курс между выборкой и вставкой
+            if not Subscription.objects.filter(user=self.user, course=first).exists():
+                bulk_create([Subscription(user=self.user, course=first)])
+            return bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(Subscription.objects, 'bulk_create', side_effect=concurrent_bulk_create):
+            response = self.client.post(self.url, {'subscribe': [first.id, second.id]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['subscribe'], [
+            {'course_id': first.id, 'status': 'already_subscribed'},
+            {'course_id': second.id, 'status': 'created'},
+        ])
+        counts = dict(Course.objects.values_list('id', 'subscribers_count'))
+        # Счетчик первого курса меняет тот, кто создал подписку (здесь - bulk_create без сигналов)
+        self.assertEqual((counts[first.id], counts[second.id]), (0, 1))
+
+    def test_overlapping_ids_rejected(self):
+        course_id = self.courses[0].id
+        response = self.client.post(self.url, {
+            'subscribe': [course_id], 'unsubscribe': [course_id]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CourseCountersTestCase(APITestCase):
+    """Тесты счетчиков курса"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            username='testuser'
+        )
+        self.course = Course.objects.create(name='Course', owner=self.user)
+        self.other = Course.objects.create(name='Other', owner=self.user)
+
+    def assertCounters(self, course, lessons, subscribers, revenue):
+        course.refresh_from_db()
+        self.assertEqual(
+            (course.lessons_count, course.subscribers_count, course.revenue),
+            (lessons, subscribers, revenue)
+        )
+
+    def test_lesson_and_subscription_counters(self):
+        lesson = Lesson.objects.create(name='Lesson', course=self.course, owner=self.user)
+        Lesson.objects.create(name='Lesson 2', course=self.course, owner=self.user)
+        subscription = Subscription.objects.create(user=self.user, course=self.course)
+        self.assertCounters(self.course, 2, 1, 0)
+
+        lesson.course = self.other
+        lesson.save()
+        subscription.delete()
+        self.assertCounters(self.course, 1, 0, 0)
+        self.assertCounters(self.other, 1, 0, 0)
+
+        lesson.delete()
+        self.assertCounters(self.other, 0, 0, 0)
+
+    def test_revenue_counts_paid_payments(self):
+        payment = Payment.objects.create(
+            user=self.user, paid_course=self.course, amount=500, payment_method='cash'
+        )
+        self.assertCounters(self.course, 0, 0, 0)
+
+        payment.is_paid = True
+        payment.save()
+        self.assertCounters(self.course, 0, 0, 500)
+
+        payment.paid_course = self.other
+        payment.save()
+        self.assertCounters(self.course, 0, 0, 0)
+        self.assertCounters(self.other, 0, 0, 500)
+
+        payment.delete()
+        self.assertCounters(self.other, 0, 0, 0)
+
+    def test_course_save_keeps_counters(self):
+        """Сохранение курса не затирает счетчики, измененные после его чтения"""
+        stale = Course.objects.get(pk=self.course.pk)
+        Lesson.objects.create(name='Lesson', course=self.course, owner=self.user)
+        stale.name = 'Renamed'
+        stale.save()
+        self.assertCounters(self.course, 1, 0, 0)
+        self.assertEqual(self.course.name, 'Renamed')
+
+        # Урок создается, пока запрос PATCH держит курс, прочитанный до этого
+        update = CourseSerializer.update
+
+        def update_with_lesson(serializer, instance, validated_data):
+            Lesson.objects.create(name='Lesson 2', course=self.course, owner=self.user)
+            return update(serializer, instance, validated_data)
+
+        self.client.force_authenticate(user=self.user)
+        with mock.patch.object(CourseSerializer, 'update', update_with_lesson):
+            response = self.client.patch(
+                reverse('courses-detail', args=[self.course.pk]), {'price': 100}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('revenue', response.json())
+        self.assertCounters(self.course, 2, 0, 0)
+
+    def test_reconcile_command(self):
+        Lesson.objects.create(name='Lesson', course=self.course, owner=self.user)
+        Subscription.objects.create(user=self.user, course=self.course)
+        Payment.objects.create(
+            user=self.user, paid_course=self.course, amount=700, payment_method='cash', is_paid=True
+        )
+        Course.objects.update(lessons_count=0, subscribers_count=5, revenue=0)
+
+        call_command('reconcile_course_counters', batch_size=1, stdout=io.StringIO())
+        self.assertCounters(self.course, 1, 1, 700)
+        self.assertCounters(self.other, 0, 0, 0)
+
+    def test_decrement_clamped(self):
+        """Счетчик, разошедшийся с данными, не уходит ниже нуля"""
+        lesson = Lesson.objects.create(name='Lesson', course=self.course, owner=self.user)
+        subscription = Subscription.objects.create(user=self.user, course=self.course)
+        Course.objects.update(lessons_count=0, subscribers_count=0)
+        lesson.delete()
+        subscription.delete()
+        self.assertCounters(self.course, 0, 0, 0)
+
+    def test_loaddata_reconciles(self):
+        """После загрузки фикстур по Hint.md счетчики совпадают с данными"""
+        call_command('loaddata', 'courses.json', verbosity=0)
+        call_command('loaddata', 'lessons.json', verbosity=0)
+        course = Course.objects.get(pk=1)
+        self.assertEqual(course.lessons_count, Lesson.objects.filter(course=course).count())
+        self.assertGreater(course.lessons_count, 0)
+        Lesson.objects.filter(course=course).first().delete()
+        self.assertCounters(course, Lesson.objects.filter(course=course).count(), 0, 0)
+
+    def test_course_delete_skips_cascaded_counters(self):
+        """Число запросов удаления курса не зависит от числа уроков и подписок"""
+        def delete_queries(lessons):
+            course = Course.objects.create(name='Deleted', owner=self.user)
+            for i in range(lessons):
+                Lesson.objects.create(name=f'Lesson {i}', course=course, owner=self.user)
+                subscriber = User.objects.create(email=f'{lessons}-{i}@test.com', username=f'{lessons}-{i}')
+                Subscription.objects.create(user=subscriber, course=course)
+            with CaptureQueriesContext(connection) as context:
+                course.delete()
+            return len(context.captured_queries)
+
+        self.assertEqual(delete_queries(20), delete_queries(2))
+
+    def test_ordering_by_popularity(self):
+        Subscription.objects.create(user=self.user, course=self.other)
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('courses-list'), {'ordering': '-popularity'})
+        self.assertEqual(
+            [course['id'] for course in response.json()['results']],
+            [self.other.id, self.course.id]
+        )
+        response = self.client.get(reverse('courses-list'), {'min_subscribers': 1})
+        self.assertEqual([course['id'] for course in response.json()['results']], [self.other.id])
+
+
+class SearchTestCase(APITestCase):
+    """Тесты полнотекстового поиска"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            username='testuser'
+        )
+        self.course = Course.objects.create(name='Веб-разработка', description='Курс про Python', owner=self.user)
+        self.python = Lesson.objects.create(name='Основы Python', course=self.course, owner=self.user)
+        self.django = Lesson.objects.create(
+            name='Django', description='Веб-приложения на python', course=self.course, owner=self.user
+        )
+        self.drawing = Lesson.objects.create(name='Рисование', course=self.course, owner=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def search_lessons(self, query):
+        response = self.client.get(reverse('lessons-list'), {'search': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [lesson['id'] for lesson in response.json()['results']]
+
+    def test_ranked_by_relevance(self):
+        """Совпадение в названии важнее совпадения в описании"""
+        self.assertEqual(self.search_lessons('PYTHON'), [self.python.id, self.django.id])
+
+    def test_index_follows_updates(self):
+        self.drawing.name = 'Python и рисование'
+        self.drawing.save()
+        self.python.delete()
+        self.assertEqual(self.search_lessons('python'), [self.drawing.id, self.django.id])
+
+    def test_query_syntax_is_escaped(self):
+        """Операторы FTS5 в запросе не вызывают ошибок"""
+        self.assertEqual(self.search_lessons('python" OR name:*'), [])
+        self.assertEqual(self.search_lessons('"*'), [])
+
+    def test_course_search(self):
+        Course.objects.create(name='Рисование', owner=self.user)
+        response = self.client.get(reverse('courses-list'), {'search': 'python'})
+        self.assertEqual([course['id'] for course in response.json()['results']], [self.course.id])
+
+
+class CourseListQueryCountTestCase(APITestCase):
+    """Число запросов списка курсов не зависит от размера страницы"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            username='testuser'
+        )
+        self.moderator = User.objects.create_user(
+            email='moderator@test.com',
+            password='testpass123',
+            username='moderatoruser'
+        )
+        moderator_group = Group.objects.create(name='moderators')
+        self.moderator.groups.add(moderator_group)
+
+        for i in range(20):
+            course = Course.objects.create(name=f'Course {i}', owner=self.user)
+            Lesson.objects.create(name=f'Lesson {i}', course=course, owner=self.user)
+            if i % 2:
+                Subscription.objects.create(user=self.user, course=course)
+
+    def get_query_count(self, user, page_size):
+        invalidate_user_groups()
+        self.client.force_authenticate(user=user)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('courses-list'), {'page_size': page_size, 'expand': 'lessons'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()['results']), page_size)
+        return len(context)
+
+    def test_owner_query_count_is_fixed(self):
+        """Для владельца число запросов одинаково на любой странице"""
+        self.assertEqual(
+            self.get_query_count(self.user, 2),
+            self.get_query_count(self.user, 20)
+        )
+
+    def test_moderator_query_count_is_fixed(self):
+        """Для модератора число запросов одинаково на любой странице"""
+        self.assertEqual(
+            self.get_query_count(self.moderator, 2),
+            self.get_query_count(self.moderator, 20)
+        )
+
+    def test_list_contains_annotations(self):
+        """lessons_count берется из счетчика курса, is_subscribed - из аннотации queryset"""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('courses-list'), {'page_size': 2, 'expand': 'lessons'})
+        first, second = response.json()['results']
+        self.assertEqual(first['lessons_count'], 1)
+        self.assertEqual(len(first['lessons']), 1)
+        self.assertFalse(first['is_subscribed'])
+        self.assertTrue(second['is_subscribed'])
+
+
+class SparseFieldsetsTestCase(APITestCase):
+    """Тесты параметров fields и expand"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            username='testuser'
+        )
+        self.course = Course.objects.create(name='Курс', description='Описание', owner=self.user)
+        self.lesson = Lesson.objects.create(name='Урок', course=self.course, owner=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def get_courses(self, params=None):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('courses-list'), params or {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()['results'][0], context.captured_queries
+
+    def test_compact_list(self):
+        """Список по умолчанию без уроков, уроки не загружаются"""
+        course, queries = self.get_courses()
+        self.assertNotIn('lessons', course)
+        self.assertEqual(course['description'], 'Описание')
+        self.assertIn('materials_link', course)
+        self.assertEqual(course['lessons_count'], 1)
+        self.assertFalse(any('materials_lesson' in query['sql'] for query in queries))
+
+    def test_expand_lessons(self):
+        course, _ = self.get_courses({'expand': 'lessons'})
+        self.assertEqual([lesson['id'] for lesson in course['lessons']], [self.lesson.id])
+        self.assertIn('name', course['lessons'][0])
+
+    def test_fields_limit_columns(self):
+        """Выбираются только колонки запрошенных полей"""
+        course, queries = self.get_courses({'fields': 'id,name,unknown'})
+        self.assertEqual(course, {'id': self.course.id, 'name': 'Курс'})
+        select = next(query['sql'] for query in queries if 'FROM "materials_course"' in query['sql'])
+        self.assertNotIn('"description"', select)
+
+    def test_retrieve_fields(self):
+        response = self.client.get(reverse('courses-detail', args=[self.course.id]), {'fields': 'description'})
+        self.assertEqual(response.json(), {'description': 'Описание'})
+        response = self.client.get(reverse('courses-detail', args=[self.course.id]))
+        self.assertIn('lessons', response.json())
+
+    def test_lesson_fields(self):
+        response = self.client.get(reverse('lessons-list'), {'fields': 'id,course'})
+        self.assertEqual(response.json()['results'], [{'id': self.lesson.id, 'course': self.course.id}])
+
+    def test_update_ignores_fields(self):
+        """fields не влияет на запись и ответ на нее"""
+        response = self.client.patch(
+            reverse('courses-detail', args=[self.course.id]) + '?fields=id', {'name': 'Новый'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['name'], 'Новый')
+
+
+class LessonPaginationTestCase(APITestCase):
+    """Тесты режимов пагинации уроков"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            username='testuser'
+        )
+        self.course = Course.objects.create(name='Test Course', owner=self.user)
+        self.lessons = [
+            Lesson.objects.create(name=f'Lesson {i}', course=self.course, owner=self.user)
+            for i in range(7)
+        ]
+        self.client.force_authenticate(user=self.user)
+
+    def test_page_number_is_default(self):
+        """Без параметров используется постраничная пагинация"""
+        response = self.client.get(reverse('lessons-list'), {'page_size': 5})
+        self.assertEqual(response.json()['count'], 7)
+
+    def test_cursor_pagination(self):
+        """Режим cursor обходит все уроки без COUNT(*)"""
+        response = self.client.get(reverse('lessons-list'), {'pagination': 'cursor', 'page_size': 5})
+        data = response.json()
+        self.assertNotIn('count', data)
+        ids = [lesson['id'] for lesson in data['results']]
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(data['next'])
+        self.assertFalse(any('COUNT(' in query['sql'] for query in context.captured_queries))
+        data = response.json()
+        ids += [lesson['id'] for lesson in data['results']]
+        self.assertIsNone(data['next'])
+        self.assertEqual(ids, [lesson.id for lesson in self.lessons])
+
+    def test_cursor_rejects_own_ordering(self):
+        """Курсор не учитывает порядок поиска и ?ordering=, поэтому их сочетание - 400"""
+        response = self.client.get(reverse('lessons-list'), {'pagination': 'cursor', 'search': 'Lesson'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('search', response.json())
+
+        response = self.client.get(reverse('courses-list'), {'cursor': 'cD0x', 'ordering': '-popularity'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ordering', response.json())
+
+        response = self.client.get(reverse('lessons-list'), {'pagination': 'cursor', 'course': self.course.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_approximate_count_falls_back_to_exact(self):
+        """Вне PostgreSQL ?count=approx возвращает точное количество"""
+        response = self.client.get(reverse('lessons-list'), {'count': 'approx'})
+        self.assertEqual(response.json()['count'], 7)
+
+
+@override_settings(RESPONSE_CACHE_ALLOW_LOCAL=True)
+class ResponseCacheTestCase(APITestCase):
+    """Тесты кэширования ответов курсов и уроков"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            username='testuser'
+        )
+        self.course = Course.objects.create(name='Test Course', owner=self.user)
+        self.lesson = Lesson.objects.create(name='Test Lesson', course=self.course, owner=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def test_repeated_request_served_from_cache(self):
+        url = reverse('lessons-detail', args=[self.lesson.id])
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.json()['name'], 'Test Lesson')
+
+    def test_not_modified(self):
+        """Совпадающий If-None-Match возвращает 304 без тела"""
+        url = reverse('courses-list')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    def test_invalidated_on_change(self):
+        """Изменение урока или подписки сбрасывает кэш"""
+        url = reverse('courses-detail', args=[self.course.id])
+        etag = self.client.get(url)['ETag']
+
+        self.lesson.name = 'Renamed Lesson'
+        self.lesson.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['lessons'][0]['name'], 'Renamed Lesson')
+
+        Subscription.objects.create(user=self.user, course=self.course)
+        self.assertTrue(self.client.get(url).json()['is_subscribed'])
+
+    def test_stats(self):
+        before = get_stats()
+        url = reverse('lessons-list')
+        self.client.get(url)
+        self.client.get(url)
+        after = get_stats()
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(after['hits'] - before['hits'], 1)
+
+    @override_settings(RESPONSE_CACHE_ALLOW_LOCAL=False)
+    def test_disabled_for_local_backend(self):
+        """С LocMemCache ответы не кэшируются, check --deploy предупреждает об этом"""
+        url = reverse('lessons-detail', args=[self.lesson.id])
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertNotIn('X-Cache', response)
+        self.assertEqual([error.id for error in check_response_cache(None)], ['materials.W001'])
+
+
+class AsyncViewsTestCase(APITestCase):
+    """Тесты async-вариантов чтения курсов и уроков и подписки"""
+
+    def setUp(self):
+        invalidate_user_groups()
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            username='testuser'
+        )
+        self.other = User.objects.create_user(
+            email='other@test.com',
+            password='testpass123',
+            username='otheruser'
+        )
+        self.moderator = User.objects.create_user(
+            email='moderator@test.com',
+            password='testpass123',
+            username='moderatoruser'
+        )
+        self.moderator.groups.add(Group.objects.create(name='moderators'))
+
+        for i in range(7):
+            course = Course.objects.create(name=f'Course {i}', owner=self.user if i < 5 else self.other)
+            Lesson.objects.create(name=f'Lesson {i}', course=course, owner=course.owner)
+            if i % 2:
+                Subscription.objects.create(user=self.user, course=course)
+        self.course = Course.objects.filter(owner=self.user).first()
+
+    def assertSameResponse(self, name, params=None, args=None):
+        sync_response = self.client.get(reverse(name, args=args), params)
+        async_response = self.client.get(reverse(f'async-{name}', args=args), params)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        sync_data, async_data = sync_response.json(), async_response.json()
+        if 'results' in sync_data:
+            for key in ('next', 'previous'):
+                self.assertEqual(bool(async_data.pop(key)), bool(sync_data.pop(key)))
+        self.assertEqual(async_data, sync_data)
+        return async_data
+
+    def test_same_responses(self):
+        """Ответы совпадают с синхронными view для пользователя и модератора"""
+        for user, count in ((self.user, 5), (self.moderator, 7)):
+            self.client.force_authenticate(user=user)
+            data = self.assertSameResponse('courses-list', {'page': 2, 'page_size': 2})
+            self.assertEqual(data['count'], count)
+            data = self.assertSameResponse('courses-list', {'page': 'last', 'page_size': 2})
+            self.assertEqual(len(data['results']), count % 2)
+            self.assertSameResponse('lessons-list', {'page': 'last', 'page_size': 3})
+            self.assertSameResponse('courses-list', {'expand': 'lessons', 'ordering': '-popularity'})
+            self.assertSameResponse('courses-detail', args=[self.course.pk])
+            self.assertSameResponse('lessons-list', {'fields': 'id,name'})
+            self.assertSameResponse('lessons-detail', args=[self.course.lessons.first().pk])
+
+    def test_errors(self):
+        response = self.client.get(reverse('async-courses-list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('WWW-Authenticate', response)
+
+        self.client.force_authenticate(user=self.user)
+        other_course = Course.objects.filter(owner=self.other).first()
+        response = self.client.get(reverse('async-courses-detail', args=[other_course.pk]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(reverse('async-courses-list'), {'page': 10})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(reverse('async-courses-list'), {'min_lessons': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('min_lessons', response.json())
+
+    def test_jwt(self):
+        """Пользователь из claims токена и пользователь из БД для токена без claims"""
+        response = self.client.post(
+            reverse('token_obtain_pair'),
+            {'email': 'moderator@test.com', 'password': 'testpass123'},
+            format='json'
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.json()['access']}")
+        self.assertEqual(self.client.get(reverse('async-courses-list')).json()['count'], 7)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.assertEqual(self.client.get(reverse('async-courses-list')).json()['count'], 5)
+
+    def test_subscription(self):
+        self.client.force_authenticate(user=self.user)
+        url = reverse('async-subscription')
+        course = Course.objects.filter(owner=self.other).last()
+
+        response = self.client.post(url, {'course_id': course.pk}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Subscription.objects.filter(user=self.user, course=course).exists())
+
+        response = self.client.post(url, {'course_id': course.pk}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'message': 'Подписка удалена'})
+        self.assertFalse(Subscription.objects.filter(user=self.user, course=course).exists())
+
+        self.assertEqual(self.client.post(url, {}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, {'course_id': 999999}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CourseTransferTestCase(APITestCase):
+    """Тесты импорта и выгрузки курса с уроками"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            username='testuser'
+        )
+        self.other = User.objects.create_user(
+            email='other@test.com',
+            password='testpass123',
+            username='otheruser'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.payload = {
+            'name': 'Курс',
+            'description': 'Описание',
+            'materials_link': 'https://www.youtube.com/course',
+            'price': 1000,
+            'lessons': [
+                {
+                    'name': f'Урок {i}',
+                    'description': f'Описание {i}',
+                    'video_link': f'https://www.youtube.com/watch?v={i}',
+                    'materials_link': None
+                }
+                for i in range(5)
+            ]
+        }
+
+    def test_import_json(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('courses-import'), self.payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        course = Course.objects.get(pk=response.json()['id'])
+        self.assertEqual((course.owner, course.lessons_count, course.price), (self.user, 5, 1000))
+        self.assertEqual(
+            list(course.lessons.order_by('pk').values_list('name', flat=True)),
+            [f'Урок {i}' for i in range(5)]
+        )
+        self.assertFalse(course.lessons.exclude(owner=self.user).exists())
+        # Уроки вставляются одним запросом
+        self.assertEqual(sum('INSERT INTO "materials_lesson"' in query['sql'] for query in queries), 1)
+
+    def test_all_lessons_validated_before_insert(self):
+        self.payload['lessons'][1]['video_link'] = 'https://vimeo.com/1'
+        self.payload['lessons'][3]['name'] = ''
+        response = self.client.post(reverse('courses-import'), self.payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.json()['lessons']
+        self.assertEqual([bool(error) for error in errors], [False, True, False, True, False])
+        self.assertIn('YouTube', str(errors[1]))
+        self.assertFalse(Course.objects.exists())
+        self.assertFalse(Lesson.objects.exists())
+
+    def test_export_roundtrip(self):
+        course_id = self.client.post(reverse('courses-import'), self.payload, format='json').json()['id']
+        url = reverse('courses-export', args=[course_id])
+
+        response = self.client.get(url, {'export_format': 'json'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), self.payload)
+
+        response = self.client.get(url)
+        content = b''.join(response.streaming_content)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(len(content.splitlines()), 6)
+
+        response = self.client.post(reverse('courses-import'), content, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()['lessons_count'], 5)
+
+        self.assertEqual(self.client.get(url, {'export_format': 'xml'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.client.force_authenticate(user=self.other)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_ndjson(self):
+        response = self.client.post(
+            reverse('courses-import'), b'{"name": "Course"}\n{oops\n', content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('строка 2', response.json()['detail'])
+
+    def test_commands(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'course.ndjson'
+            path.write_bytes(b''.join(
+                json.dumps(row, ensure_ascii=False).encode() + b'\n'
+                for row in [{k: v for k, v in self.payload.items() if k != 'lessons'}, *self.payload['lessons']]
+            ))
+            call_command('import_course', str(path), owner='user@test.com', stdout=io.StringIO())
+            course = Course.objects.get()
+            self.assertEqual((course.owner, course.lessons_count), (self.user, 5))
+
+            output = Path(directory) / 'course.json'
+            call_command('export_course', course.pk, format='json', output=str(output))
+            self.assertEqual(json.loads(output.read_bytes()), self.payload)
+
+        with self.assertRaises(CommandError):
+            call_command('export_course', 999999, stdout=io.StringIO())
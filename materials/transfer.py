@@ -0,0 +1,92 @@
+"""
+Импорт и экспорт курса с уроками.
+
+Формат одинаков для импорта и экспорта:
+
+- JSON - объект курса с полем lessons (список уроков);
+- NDJSON - первая строка курс, каждая следующая - урок.
+
+Поля курса и урока - CourseTransferSerializer и LessonTransferSerializer;
+превью, владелец и счетчики не переносятся.
+
+Импорт сначала проверяет курс и все уроки (YouTubeLinkValidator и поля
+модели, ошибки собираются по всем урокам сразу), затем в одной транзакции
+создает курс и вставляет уроки через bulk_create. bulk_create не вызывает
+сигналы, поэтому lessons_count задается при создании курса, а кэш ответов
+сбрасывает post_save курса в той же транзакции.
+"""
+from django.conf import settings
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from config.renderers import dumps, loads
+from users.exports import iter_export_rows
+from .models import Course, Lesson
+from .serializers import CourseImportSerializer, CourseTransferSerializer, LessonTransferSerializer
+
+FORMATS = ('json', 'ndjson')
+
+
+def from_rows(rows):
+    """Данные импорта из строк NDJSON: первая строка - курс, остальные - уроки"""
+    if not rows or not isinstance(rows[0], dict):
+        raise ValidationError({'non_field_errors': ['Первая строка должна быть объектом курса']})
+    return {**rows[0], 'lessons': rows[1:]}
+
+
+def read(content, import_format):
+    """Данные импорта из содержимого файла (bytes или str) в формате json или ndjson"""
+    try:
+        if import_format == 'json':
+            return loads(content)
+        lines = content.splitlines()
+        return from_rows([loads(line) for line in lines if line.strip()])
+    except ValueError as exc:
+        raise ValidationError({'non_field_errors': [f'Ошибка разбора {import_format}: {exc}']})
+
+
+def validate(data):
+    """Проверка курса и всех уроков; ValidationError содержит ошибки по каждому уроку"""
+    if isinstance(data, list):
+        data = from_rows(data)
+    serializer = CourseImportSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data
+
+
+def import_course(data, owner=None, batch_size=None):
+    """Создание курса с уроками из данных JSON (dict) или строк NDJSON (list)"""
+    course_data = dict(validate(data))
+    lessons = course_data.pop('lessons')
+    with transaction.atomic():
+        course = Course.objects.create(owner=owner, lessons_count=len(lessons), **course_data)
+        Lesson.objects.bulk_create(
+            [Lesson(course=course, owner=owner, **lesson) for lesson in lessons],
+            batch_size=batch_size or settings.COURSE_IMPORT_BATCH_SIZE
+        )
+    return course
+
+
+def _lessons(course):
+    return Lesson.objects.filter(course=course).order_by('pk')
+
+
+def stream_ndjson(course):
+    yield dumps(CourseTransferSerializer(course).data) + b'\n'
+    for names, row in iter_export_rows(_lessons(course), LessonTransferSerializer()):
+        yield dumps(dict(zip(names, row))) + b'\n'
+
+
+def stream_json(course):
+    # Объект курса без закрывающей скобки, затем уроки по одному
+    yield dumps(CourseTransferSerializer(course).data)[:-1] + b',"lessons":['
+    separator = b''
+    for names, row in iter_export_rows(_lessons(course), LessonTransferSerializer()):
+        yield separator + dumps(dict(zip(names, row)))
+        separator = b','
+    yield b']}'
+
+
+def export_course(course, export_format):
+    """Поток bytes с курсом и уроками в формате json или ndjson"""
+    return stream_json(course) if export_format == 'json' else stream_ndjson(course)
@@ -1,6 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CourseViewSet, SubscriptionAPIView, LessonViewSet
+
+from .async_views import AsyncCourseListAPIView, AsyncCourseRetrieveAPIView, AsyncLessonListAPIView, \
+    AsyncLessonRetrieveAPIView, AsyncSubscriptionAPIView
+from .views import CourseViewSet, SubscriptionAPIView, SubscriptionBulkAPIView, LessonViewSet
 
 router = DefaultRouter()
 router.register(r'courses', CourseViewSet, basename='courses')
@@ -9,4 +12,12 @@ router.register(r'lessons', LessonViewSet, basename='lessons')
 urlpatterns = [
     path('', include(router.urls)),
     path('subscription/', SubscriptionAPIView.as_view(), name='subscription'),
+    path('subscription/bulk/', SubscriptionBulkAPIView.as_view(), name='subscription-bulk'),
+
+    # Async-варианты для ASGI (materials.async_views)
+    path('async/courses/', AsyncCourseListAPIView.as_view(), name='async-courses-list'),
+    path('async/courses/<int:pk>/', AsyncCourseRetrieveAPIView.as_view(), name='async-courses-detail'),
+    path('async/lessons/', AsyncLessonListAPIView.as_view(), name='async-lessons-list'),
+    path('async/lessons/<int:pk>/', AsyncLessonRetrieveAPIView.as_view(), name='async-lessons-detail'),
+    path('async/subscription/', AsyncSubscriptionAPIView.as_view(), name='async-subscription'),
 ]
@@ -1,32 +1,64 @@
-from django.db import models
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .cache import CachedResponseMixin
+from .filters import CourseFilter, LessonFilter
 from .models import Course, Lesson, Subscription
-from .serializers import CourseSerializer, LessonSerializer
+from .serializers import CourseImportResultSerializer, CourseImportSerializer, CourseListSerializer, \
+    CourseSerializer, LessonSerializer, SubscriptionBulkSerializer, SubscriptionBulkResponseSerializer
 from .paginators import CoursePagination, LessonPagination  # Импортируем классы пагинации
+from .querysets import get_course_queryset
+from .subscriptions import bulk_update_subscriptions
+from . import transfer
+from config.renderers import NDJSONParser
+from config.fast_serialization import FastListMixin
+from config.serializers import only_serialized_fields
+from config.uploads import LimitedUploadMixin
 from users.permissions import IsModerator, IsOwner
+from users.roles import is_staff_or_moderator
 
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
+from rest_framework.settings import api_settings
+
+FIELDS_PARAMETER = OpenApiParameter(
+    name='fields',
+    type=str,
+    description='Поля ответа через запятую, например fields=id,name',
+    required=False
+)
+EXPAND_PARAMETER = OpenApiParameter(
+    name='expand',
+    type=str,
+    description='Дополнительные вложенные поля через запятую, например expand=lessons',
+    required=False
+)
+
+# Действия, для которых queryset ограничивается выводимыми колонками
+READ_ACTIONS = ('list', 'retrieve')
 
 
 @extend_schema(tags=['Курсы'])
-class CourseViewSet(viewsets.ModelViewSet):
-    queryset = Course.objects.annotate(
-        lessons_count=models.Count('lessons')).prefetch_related('lessons')
+class CourseViewSet(LimitedUploadMixin, CachedResponseMixin, viewsets.ModelViewSet):
+    queryset = Course.objects.all()
     serializer_class = CourseSerializer
     pagination_class = CoursePagination  # Добавляем пагинацию для курсов
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = CourseFilter
+    cache_per_user = True  # is_subscribed зависит от пользователя
 
     def get_permissions(self):
         """Динамическое определение прав доступа в зависимости от действия"""
-        if self.action == 'create':
+        if self.action in ['create', 'import_course']:
             self.permission_classes = [IsAuthenticated]
         elif self.action in ['update', 'partial_update', 'destroy']:
             self.permission_classes = [IsAuthenticated, IsModerator | IsOwner]
-        elif self.action in ['retrieve', 'list']:
+        elif self.action in ['retrieve', 'list', 'export']:
             self.permission_classes = [IsAuthenticated]
         return [permission() for permission in self.permission_classes]
 
@@ -34,17 +66,35 @@ class CourseViewSet(viewsets.ModelViewSet):
         """Автоматическое назначение владельца при создании курса"""
         serializer.save(owner=self.request.user)
 
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return CourseListSerializer
+        return super().get_serializer_class()
+
     def get_queryset(self):
         """Фильтрация queryset в зависимости от роли пользователя"""
-        if self.request.user.is_staff or self.request.user.groups.filter(name='moderators').exists():
-            return super().get_queryset()
-        return Course.objects.filter(owner=self.request.user)
+        if self.action not in READ_ACTIONS:
+            return get_course_queryset(
+                self.request.user,
+                only_owned=not is_staff_or_moderator(self.request)
+            )
+        serializer = self.get_serializer()
+        queryset = get_course_queryset(
+            self.request.user,
+            only_owned=not is_staff_or_moderator(self.request),
+            with_lessons='lessons' in serializer.fields
+        )
+        return only_serialized_fields(queryset, serializer)
 
     @extend_schema(
         summary='Список курсов',
         description='Возвращает список всех курсов с пагинацией. '
                     'Обычные пользователи видят только свои курсы, '
-                    'модераторы и администраторы - все.',
+                    'модераторы и администраторы - все. '
+                    'Сортировка: ordering=popularity, revenue, lessons (с "-" - по убыванию). '
+                    'Поиск: search - по названию и описанию, результаты по релевантности. '
+                    'По умолчанию курс выводится без уроков, '
+                    'уроки добавляются параметром expand=lessons.',
         parameters=[
             OpenApiParameter(
                 name='page',
@@ -52,6 +102,8 @@ class CourseViewSet(viewsets.ModelViewSet):
                 description='Номер страницы для пагинации',
                 required=False
             ),
+            FIELDS_PARAMETER,
+            EXPAND_PARAMETER,
         ],
         examples=[
             OpenApiExample(
@@ -61,7 +113,7 @@ class CourseViewSet(viewsets.ModelViewSet):
                     "next": "http://api.example.com/courses/?page=2",
                     "previous": None,
                     "results": [
-                        {"id": 1, "title": "Курс 1", "lessons_count": 5},
+                        {"id": 1, "title": "Курс 1", "lessons_count": 5, "subscribers_count": 12},
                     ]
                 }
             )
@@ -79,12 +131,67 @@ class CourseViewSet(viewsets.ModelViewSet):
     def create(self, request, *args, **kwargs):
         return super().create(request, *args, **kwargs)
 
+    @extend_schema(parameters=[FIELDS_PARAMETER])
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @extend_schema(
+        summary='Импорт курса с уроками',
+        description='Создает курс со всеми уроками в одной транзакции. Тело - JSON (курс с полем lessons) '
+                    'или NDJSON (application/x-ndjson: первая строка курс, остальные - уроки). '
+                    'Все уроки проверяются до записи, ошибки возвращаются по индексам в lessons.',
+        request={
+            'application/json': CourseImportSerializer,
+            'application/x-ndjson': {'type': 'string'},
+        },
+        responses={201: CourseImportResultSerializer}
+    )
+    @action(
+        detail=False, methods=['post'], url_path='import', url_name='import',
+        parser_classes=[*api_settings.DEFAULT_PARSER_CLASSES, NDJSONParser]
+    )
+    def import_course(self, request):
+        course = transfer.import_course(request.data, owner=request.user)
+        return Response(CourseImportResultSerializer(course).data, status=status.HTTP_201_CREATED)
+
+    @extend_schema(
+        summary='Выгрузка курса с уроками',
+        description='Потоковая выгрузка курса в формате импорта: NDJSON (по умолчанию) или JSON.',
+        parameters=[
+            OpenApiParameter(
+                name='export_format',
+                type=str,
+                enum=transfer.FORMATS,
+                description='Формат выгрузки (по умолчанию ndjson)',
+                required=False
+            ),
+        ],
+        responses={200: {'description': 'Поток курса и уроков в выбранном формате'}}
+    )
+    @action(detail=True, methods=['get'], url_path='export')
+    def export(self, request, pk=None):
+        """Выгрузка курса с постоянным потреблением памяти"""
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format not in transfer.FORMATS:
+            return Response(
+                {'error': 'export_format должен быть ndjson или json'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        course = self.get_object()
+        content_type = 'application/json' if export_format == 'json' else 'application/x-ndjson'
+        response = StreamingHttpResponse(transfer.export_course(course, export_format), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="course-{course.pk}.{export_format}"'
+        return response
+
 
 @extend_schema(tags=['Уроки'])
-class LessonViewSet(viewsets.ModelViewSet):
-    queryset = Lesson.objects.all()
+class LessonViewSet(LimitedUploadMixin, CachedResponseMixin, FastListMixin, viewsets.ModelViewSet):
+    queryset = Lesson.objects.order_by('id')
     serializer_class = LessonSerializer
     pagination_class = LessonPagination  # Добавляем пагинацию для уроков
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = LessonFilter
 
     def get_permissions(self):
         """Динамическое определение прав доступа в зависимости от действия"""
@@ -102,9 +209,20 @@ class LessonViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """Фильтрация queryset в зависимости от роли пользователя"""
-        if self.request.user.is_staff or self.request.user.groups.filter(name='moderators').exists():
-            return super().get_queryset()
-        return Lesson.objects.filter(owner=self.request.user)
+        queryset = super().get_queryset()
+        if not is_staff_or_moderator(self.request):
+            queryset = queryset.filter(owner=self.request.user)
+        if self.action in READ_ACTIONS:
+            queryset = only_serialized_fields(queryset, self.get_serializer())
+        return queryset
+
+    @extend_schema(parameters=[FIELDS_PARAMETER])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @extend_schema(parameters=[FIELDS_PARAMETER])
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
     @extend_schema(
         summary='Создание урока',
@@ -199,3 +317,40 @@ class SubscriptionAPIView(APIView):
             status_code = status.HTTP_201_CREATED
 
         return Response({"message": message}, status=status_code)
+
+
+class SubscriptionBulkAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        summary='Массовая подписка/отписка от курсов',
+        description='Подписывает пользователя на курсы из subscribe и отписывает от курсов из unsubscribe. '
+                    'Результат возвращается для каждого id: created, already_subscribed, not_found, '
+                    'deleted, not_subscribed',
+        request=SubscriptionBulkSerializer,
+        responses={200: SubscriptionBulkResponseSerializer},
+        examples=[
+            OpenApiExample(
+                'Пример запроса',
+                value={'subscribe': [1, 2, 3], 'unsubscribe': [4]},
+                request_only=True
+            ),
+            OpenApiExample(
+                'Пример ответа',
+                value={
+                    'subscribe': [
+                        {'course_id': 1, 'status': 'created'},
+                        {'course_id': 2, 'status': 'already_subscribed'},
+                        {'course_id': 3, 'status': 'not_found'}
+                    ],
+                    'unsubscribe': [{'course_id': 4, 'status': 'deleted'}]
+                },
+                response_only=True
+            )
+        ]
+    )
+    def post(self, request):
+        serializer = SubscriptionBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = bulk_update_subscriptions(request.user, **serializer.validated_data)
+        return Response(result, status=status.HTTP_200_OK)
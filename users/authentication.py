@@ -0,0 +1,152 @@
+"""
+JWT-аутентификация без запроса пользователя к БД.
+
+Токены, выданные CustomTokenObtainPairView, содержат is_staff и группы
+пользователя. По ним строится ClaimsUser, остальные поля которого
+загружаются только при обращении к ним.
+
+Кэш отзыва (CACHES['auth']) позволяет быстро отключить деактивированного
+пользователя и перестать доверять claims, выпущенным до изменения его
+прав: такие токены проверяются по БД, как в стандартном JWTAuthentication.
+Метки отзыва должны быть видны всем воркерам и не вытесняться, поэтому для
+них нужен отдельный общий кэш в памяти (Redis, Memcached). С другими
+бэкендами claims не используются и пользователь читается из БД: локальный
+кэш не видит отзыва из других процессов, а чтение меток из DatabaseCache
+стоит столько же, сколько запрос пользователя. Исключение - LocMemCache
+при AUTH_CACHE_ALLOW_LOCAL (один процесс, тесты).
+
+aauthenticate - вариант для async view (config.async_views): кэш читается
+через async API, проверка по БД выполняется в потоке.
+"""
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from config.caches import is_shared_memory
+from users.models import ClaimsUser
+
+STAFF_CLAIM = 'is_staff'
+GROUPS_CLAIM = 'groups'
+
+REVOKED_KEY = 'auth:revoked:{}'
+CHANGED_KEY = 'auth:changed:{}'
+ALL_CHANGED_KEY = 'auth:changed:all'
+
+CACHE_ALIAS = 'auth'
+
+
+def _get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def claims_enabled():
+    """Можно ли брать пользователя из claims (см. описание модуля)"""
+    if isinstance(_get_cache(), LocMemCache):
+        return settings.AUTH_CACHE_ALLOW_LOCAL
+    return is_shared_memory(CACHE_ALIAS)
+
+
+def _get_timeout():
+    # Access-токен, обновленный по refresh, наследует claims и iat refresh-токена,
+    # поэтому ключи живут не меньше времени жизни обоих токенов
+    lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+    return int(lifetime.total_seconds())
+
+
+def add_user_claims(token, user):
+    token[STAFF_CLAIM] = user.is_staff
+    token[GROUPS_CLAIM] = sorted(user.groups.values_list('name', flat=True))
+    return token
+
+
+def revoke_user(user_id):
+    """Запрет аутентификации по уже выданным токенам пользователя"""
+    _get_cache().set(REVOKED_KEY.format(user_id), True, _get_timeout())
+
+
+def restore_user(user_id):
+    _get_cache().delete(REVOKED_KEY.format(user_id))
+
+
+def mark_claims_changed(user_ids=None):
+    """Claims токенов, выпущенных раньше текущего момента, больше не актуальны"""
+    now = time.time()
+    if user_ids is None:
+        _get_cache().set(ALL_CHANGED_KEY, now, _get_timeout())
+    else:
+        _get_cache().set_many({CHANGED_KEY.format(user_id): now for user_id in user_ids}, _get_timeout())
+
+
+def _get_state_keys(user_id):
+    return [REVOKED_KEY.format(user_id), CHANGED_KEY.format(user_id), ALL_CHANGED_KEY]
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication, который берет пользователя из claims токена"""
+
+    def get_claims_user(self, validated_token, user_id, state):
+        """Пользователь из claims или None, если токен нужно проверить по БД"""
+        if state.get(REVOKED_KEY.format(user_id)):
+            raise AuthenticationFailed('Пользователь деактивирован', code='user_inactive')
+
+        changed_at = max(state.get(CHANGED_KEY.format(user_id), 0), state.get(ALL_CHANGED_KEY, 0))
+        if STAFF_CLAIM not in validated_token or validated_token.get('iat', 0) <= changed_at:
+            # Токен без claims или выпущен до изменения прав - проверяем по БД
+            return None
+
+        user = ClaimsUser.from_db(
+            None,
+            ['id', 'is_staff', 'is_active'],
+            [user_id, validated_token[STAFF_CLAIM], True]
+        )
+        user.token_groups = frozenset(validated_token.get(GROUPS_CLAIM, ()))
+        return user
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            return super().get_user(validated_token)
+        if not claims_enabled():
+            return super().get_user(validated_token)
+
+        state = _get_cache().get_many(_get_state_keys(user_id))
+        user = self.get_claims_user(validated_token, user_id, state)
+        if user is None:
+            return super().get_user(validated_token)
+        return user
+
+    async def aget_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            user_id = None
+
+        if user_id is not None and claims_enabled():
+            state = await _get_cache().aget_many(_get_state_keys(user_id))
+            user = self.get_claims_user(validated_token, user_id, state)
+            if user is not None:
+                return user
+        return await sync_to_async(super().get_user)(validated_token)
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+
+class ClaimsJWTScheme(SimpleJWTScheme):
+    """Схема безопасности OpenAPI (Bearer JWT) для ClaimsJWTAuthentication"""
+    target_class = 'users.authentication.ClaimsJWTAuthentication'
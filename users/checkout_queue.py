@@ -0,0 +1,133 @@
+"""
+Очередь фонового создания сессий оплаты Stripe.
+
+Очередь хранится в БД (CheckoutJob), поэтому не требует Redis или брокера.
+Задачи выполняет команда run_checkout_worker.
+"""
+import logging
+import random
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from config.services.stripe_service import create_stripe_checkout_session, get_or_create_course_price
+from users.models import CheckoutJob, Payment
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_checkout(payment, success_url, cancel_url):
+    """Постановка платежа в очередь на создание сессии Stripe"""
+    return CheckoutJob.objects.create(
+        payment=payment,
+        success_url=success_url,
+        cancel_url=cancel_url
+    )
+
+
+def get_retry_delay(attempts):
+    """Экспоненциальная задержка перед повтором с разбросом"""
+    delay = min(
+        settings.CHECKOUT_RETRY_BASE_DELAY * 2 ** (attempts - 1),
+        settings.CHECKOUT_RETRY_MAX_DELAY
+    )
+    return timedelta(seconds=delay * random.uniform(0.5, 1))
+
+
+def claim_jobs(limit=1):
+    """
+    Захват готовых к выполнению задач.
+
+    SKIP LOCKED позволяет нескольким воркерам разбирать очередь без
+    блокировок друг друга. Зависшие задачи (воркер упал) возвращаются
+    в работу по истечении CHECKOUT_JOB_TIMEOUT. Каждый захват выдает новый
+    lease: результат воркера, у которого задачу забрали, не сохраняется.
+    """
+    now = timezone.now()
+    lease = uuid.uuid4()
+    stale = now - timedelta(seconds=settings.CHECKOUT_JOB_TIMEOUT)
+    with transaction.atomic():
+        jobs = list(
+            CheckoutJob.objects.select_for_update(skip_locked=True).filter(
+                status=CheckoutJob.STATUS_PENDING, run_after__lte=now
+            ).order_by('run_after')[:limit]
+        )
+        if len(jobs) < limit:
+            jobs += list(
+                CheckoutJob.objects.select_for_update(skip_locked=True).filter(
+                    status=CheckoutJob.STATUS_RUNNING, locked_at__lt=stale
+                ).order_by('locked_at')[:limit - len(jobs)]
+            )
+        CheckoutJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            status=CheckoutJob.STATUS_RUNNING, locked_at=now, lease=lease
+        )
+    for job in jobs:
+        job.status, job.locked_at, job.lease = CheckoutJob.STATUS_RUNNING, now, lease
+    return jobs
+
+
+def run_job(job):
+    """
+    Выполнение задачи: запросы к Stripe и сохранение ссылки на оплату.
+
+    Результат сохраняется, только если задача все еще принадлежит этому
+    захвату (job.lease). Ключ идемпотентности совпадает у воркеров, одновременно
+    выполняющих одну попытку, поэтому Stripe вернет им одну и ту же сессию.
+    """
+    payment = Payment.objects.select_related('paid_course').get(pk=job.payment_id)
+    job.attempts += 1
+    owned = CheckoutJob.objects.filter(pk=job.pk, lease=job.lease)
+    try:
+        stripe_price = get_or_create_course_price(payment.paid_course)
+        session = create_stripe_checkout_session(
+            price_id=stripe_price.stripe_price_id,
+            success_url=job.success_url,
+            cancel_url=job.cancel_url,
+            idempotency_key=f'checkout-{payment.pk}-{job.attempts}'
+        )
+    except Exception as e:
+        logger.warning('Checkout job %s failed (attempt %s): %s', job.pk, job.attempts, e)
+        job.last_error = str(e)
+        if job.attempts >= settings.CHECKOUT_JOB_MAX_ATTEMPTS:
+            job.status = CheckoutJob.STATUS_FAILED
+        else:
+            job.status = CheckoutJob.STATUS_PENDING
+            job.run_after = timezone.now() + get_retry_delay(job.attempts)
+        job.locked_at = job.lease = None
+        with transaction.atomic():
+            if not owned.update(
+                attempts=job.attempts, last_error=job.last_error, status=job.status,
+                run_after=job.run_after, locked_at=None, lease=None
+            ):
+                logger.warning('Checkout job %s lease lost, result discarded', job.pk)
+            elif job.status == CheckoutJob.STATUS_FAILED:
+                Payment.objects.filter(pk=payment.pk).update(stripe_payment_status='failed')
+        return False
+
+    with transaction.atomic():
+        if not owned.update(
+            attempts=job.attempts, last_error=None, status=CheckoutJob.STATUS_DONE, locked_at=None, lease=None
+        ):
+            logger.warning('Checkout job %s lease lost, result discarded', job.pk)
+            return False
+        Payment.objects.filter(pk=payment.pk).update(
+            stripe_product_id=stripe_price.stripe_product_id,
+            stripe_price_id=stripe_price.stripe_price_id,
+            stripe_session_id=session.id,
+            stripe_payment_link=session.url,
+            stripe_payment_status='open'
+        )
+        job.status = CheckoutJob.STATUS_DONE
+        job.last_error = job.locked_at = job.lease = None
+    return True
+
+
+def process_jobs(limit=10):
+    """Выполнение пачки задач, возвращает количество обработанных"""
+    jobs = claim_jobs(limit)
+    for job in jobs:
+        run_job(job)
+    return len(jobs)
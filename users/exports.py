@@ -0,0 +1,49 @@
+import csv
+
+from config.fast_serialization import compile_fields
+from config.renderers import dumps
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: возвращает строку вместо записи"""
+
+    def write(self, value):
+        return value
+
+
+def get_export_columns(serializer):
+    """
+    Тройки (имя поля, колонка БД, функция представления) для потоковой выгрузки.
+
+    Формат значений совпадает с API (см. config.fast_serialization).
+    """
+    columns = compile_fields(serializer)
+    if columns is None:
+        raise ValueError(f'{type(serializer).__name__} не поддерживает выгрузку по колонкам')
+    return columns
+
+
+def iter_export_rows(queryset, serializer, chunk_size=EXPORT_CHUNK_SIZE):
+    """Строки выгрузки через серверный курсор без создания объектов модели"""
+    columns = get_export_columns(serializer)
+    names = [name for name, _, _ in columns]
+    db_columns = [column for _, column, _ in columns]
+    for values in queryset.values_list(*db_columns).iterator(chunk_size=chunk_size):
+        yield names, [
+            value if value is None or represent is None else represent(value)
+            for value, (_, _, represent) in zip(values, columns)
+        ]
+
+
+def stream_ndjson(queryset, serializer):
+    for names, row in iter_export_rows(queryset, serializer):
+        yield dumps(dict(zip(names, row))) + b'\n'
+
+
+def stream_csv(queryset, serializer):
+    writer = csv.writer(Echo())
+    yield writer.writerow([name for name, _, _ in get_export_columns(serializer)])
+    for _, row in iter_export_rows(queryset, serializer):
+        yield writer.writerow(row)
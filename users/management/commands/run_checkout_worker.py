@@ -0,0 +1,53 @@
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from users.checkout_queue import process_jobs
+
+
+class Command(BaseCommand):
+    help = 'Запуск пула воркеров, создающих сессии оплаты Stripe из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Количество потоков')
+        parser.add_argument('--batch-size', type=int, default=5, help='Задач за один захват')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Пауза при пустой очереди (сек)')
+        parser.add_argument('--once', action='store_true', help='Обработать очередь и завершиться')
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.processed = 0
+
+        threads = [
+            threading.Thread(target=self.work, args=(options,), name=f'checkout-worker-{i}')
+            for i in range(options['workers'])
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f'Запущено воркеров: {len(threads)}')
+
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+        self.stdout.write(self.style.SUCCESS(f'Обработано задач: {self.processed}'))
+
+    def work(self, options):
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                count = process_jobs(options['batch_size'])
+                with self.lock:
+                    self.processed += count
+                if not count:
+                    if options['once']:
+                        break
+                    self.stop.wait(options['poll_interval'])
+        finally:
+            connection.close()
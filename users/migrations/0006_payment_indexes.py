@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-18 04:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('materials', '0011_alter_subscription_course_alter_subscription_user'),
+        ('users', '0005_payment_is_paid_payment_stripe_payment_link_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['-payment_date'], name='payment_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['paid_course', '-payment_date'], name='payment_course_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['paid_lesson', '-payment_date'], name='payment_lesson_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['payment_method', '-payment_date'], name='payment_method_date_idx'),
+        ),
+    ]
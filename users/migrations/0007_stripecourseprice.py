@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-18 04:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('materials', '0012_course_price'),
+        ('users', '0006_payment_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StripeCoursePrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_name', models.CharField(max_length=255, verbose_name='Название продукта в Stripe')),
+                ('unit_amount', models.PositiveIntegerField(verbose_name='Цена в Stripe (в копейках)')),
+                ('currency', models.CharField(default='rub', max_length=3, verbose_name='Валюта')),
+                ('stripe_product_id', models.CharField(max_length=100, verbose_name='ID продукта в Stripe')),
+                ('stripe_price_id', models.CharField(max_length=100, verbose_name='ID цены в Stripe')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stripe_price', to='materials.course', verbose_name='Курс')),
+            ],
+            options={
+                'verbose_name': 'Цена курса в Stripe',
+                'verbose_name_plural': 'Цены курсов в Stripe',
+            },
+        ),
+    ]
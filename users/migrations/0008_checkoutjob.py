@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-18 04:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_stripecourseprice'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckoutJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('success_url', models.URLField(max_length=512, verbose_name='URL успешной оплаты')),
+                ('cancel_url', models.URLField(max_length=512, verbose_name='URL отмены оплаты')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Выполнена'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Количество попыток')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Не раньше')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='Взята в работу')),
+                ('last_error', models.TextField(blank=True, null=True, verbose_name='Последняя ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('payment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='checkout_job', to='users.payment', verbose_name='Платеж')),
+            ],
+            options={
+                'verbose_name': 'Задача оплаты',
+                'verbose_name_plural': 'Задачи оплаты',
+                'indexes': [models.Index(fields=['status', 'run_after'], name='checkout_job_queue_idx')],
+            },
+        ),
+    ]
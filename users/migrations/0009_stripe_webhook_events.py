@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-18 04:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_checkoutjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='stripe_session_id',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True, verbose_name='ID сессии в Stripe'),
+        ),
+        migrations.CreateModel(
+            name='StripeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=255, unique=True, verbose_name='ID события в Stripe')),
+                ('event_type', models.CharField(max_length=100, verbose_name='Тип события')),
+                ('session_id', models.CharField(blank=True, max_length=100, null=True, verbose_name='ID сессии в Stripe')),
+                ('payment_status', models.CharField(blank=True, max_length=20, null=True, verbose_name='Статус оплаты сессии')),
+                ('received_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата получения')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата обработки')),
+            ],
+            options={
+                'verbose_name': 'Событие Stripe',
+                'verbose_name_plural': 'События Stripe',
+                'indexes': [models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['received_at'], name='stripe_event_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 06:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_claimsuser'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='checkoutjob',
+            name='lease',
+            field=models.UUIDField(blank=True, null=True, verbose_name='Токен захвата'),
+        ),
+    ]
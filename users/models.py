@@ -1,5 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
 
 from DRY import NULLABLE
 from materials.models import Course, Lesson
@@ -52,6 +54,23 @@ class CustomUser(AbstractUser):
         verbose_name_plural = 'Пользователи'
 
 
+class ClaimsUser(CustomUser):
+    """
+    Пользователь, восстановленный из claims JWT без запроса к БД.
+
+    Загружены только поля из токена, остальные отложены и при первом
+    обращении к любому из них подгружаются все сразу одним запросом.
+    """
+    class Meta:
+        proxy = True
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = list(deferred)
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+
+
 class Payment(models.Model):
     PAYMENT_METHOD_CHOICES = [
         ('cash', 'Наличные'),
@@ -105,6 +124,7 @@ class Payment(models.Model):
     )
     stripe_session_id = models.CharField(
         max_length=100,
+        unique=True,
         **NULLABLE,
         verbose_name='ID сессии в Stripe'
     )
@@ -130,3 +150,172 @@ class Payment(models.Model):
         verbose_name = 'Платеж'
         verbose_name_plural = 'Платежи'
         ordering = ['-payment_date']
+        # Индексы под фильтры PaymentFilter с сортировкой по дате
+        indexes = [
+            models.Index(fields=['-payment_date'], name='payment_date_idx'),
+            models.Index(fields=['paid_course', '-payment_date'], name='payment_course_date_idx'),
+            models.Index(fields=['paid_lesson', '-payment_date'], name='payment_lesson_date_idx'),
+            models.Index(fields=['payment_method', '-payment_date'], name='payment_method_date_idx'),
+        ]
+
+
+class StripeCoursePrice(models.Model):
+    """Сохраненные продукт и цена Stripe для курса"""
+    course = models.OneToOneField(
+        Course,
+        on_delete=models.CASCADE,
+        related_name='stripe_price',
+        verbose_name='Курс'
+    )
+    product_name = models.CharField(
+        max_length=255,
+        verbose_name='Название продукта в Stripe'
+    )
+    unit_amount = models.PositiveIntegerField(
+        verbose_name='Цена в Stripe (в копейках)'
+    )
+    currency = models.CharField(
+        max_length=3,
+        default='rub',
+        verbose_name='Валюта'
+    )
+    stripe_product_id = models.CharField(
+        max_length=100,
+        verbose_name='ID продукта в Stripe'
+    )
+    stripe_price_id = models.CharField(
+        max_length=100,
+        verbose_name='ID цены в Stripe'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата обновления'
+    )
+
+    def __str__(self):
+        return f"{self.product_name} - {self.stripe_price_id}"
+
+    def matches(self, product_name, unit_amount, currency):
+        return (
+            self.product_name == product_name
+            and self.unit_amount == unit_amount
+            and self.currency == currency
+        )
+
+    class Meta:
+        verbose_name = 'Цена курса в Stripe'
+        verbose_name_plural = 'Цены курсов в Stripe'
+
+
+class CheckoutJob(models.Model):
+    """Задача фоновой очереди на создание сессии оплаты Stripe"""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'В очереди'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_DONE, 'Выполнена'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+
+    payment = models.OneToOneField(
+        Payment,
+        on_delete=models.CASCADE,
+        related_name='checkout_job',
+        verbose_name='Платеж'
+    )
+    success_url = models.URLField(
+        max_length=512,
+        verbose_name='URL успешной оплаты'
+    )
+    cancel_url = models.URLField(
+        max_length=512,
+        verbose_name='URL отмены оплаты'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        verbose_name='Статус'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Количество попыток'
+    )
+    run_after = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Не раньше'
+    )
+    locked_at = models.DateTimeField(
+        **NULLABLE,
+        verbose_name='Взята в работу'
+    )
+    lease = models.UUIDField(
+        **NULLABLE,
+        verbose_name='Токен захвата'
+    )
+    last_error = models.TextField(
+        **NULLABLE,
+        verbose_name='Последняя ошибка'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата создания'
+    )
+
+    def __str__(self):
+        return f"Оплата #{self.payment_id} ({self.status})"
+
+    class Meta:
+        verbose_name = 'Задача оплаты'
+        verbose_name_plural = 'Задачи оплаты'
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='checkout_job_queue_idx'),
+        ]
+
+
+class StripeEvent(models.Model):
+    """Полученное событие вебхука Stripe (для дедупликации и пакетной обработки)"""
+    event_id = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name='ID события в Stripe'
+    )
+    event_type = models.CharField(
+        max_length=100,
+        verbose_name='Тип события'
+    )
+    session_id = models.CharField(
+        max_length=100,
+        **NULLABLE,
+        verbose_name='ID сессии в Stripe'
+    )
+    payment_status = models.CharField(
+        max_length=20,
+        **NULLABLE,
+        verbose_name='Статус оплаты сессии'
+    )
+    received_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата получения'
+    )
+    processed_at = models.DateTimeField(
+        **NULLABLE,
+        verbose_name='Дата обработки'
+    )
+
+    def __str__(self):
+        return f"{self.event_type} ({self.event_id})"
+
+    class Meta:
+        verbose_name = 'Событие Stripe'
+        verbose_name_plural = 'События Stripe'
+        indexes = [
+            models.Index(
+                fields=['received_at'],
+                condition=Q(processed_at__isnull=True),
+                name='stripe_event_pending_idx'
+            ),
+        ]
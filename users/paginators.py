@@ -0,0 +1,8 @@
+from materials.paginators import KeysetPageNumberPagination
+
+
+class PaymentPagination(KeysetPageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_ordering = ('-payment_date', '-id')
@@ -1,16 +1,52 @@
+from asgiref.sync import sync_to_async
 from rest_framework import permissions
 
+from users.roles import ais_moderator, is_moderator
 
-class IsAdminOrOwner(permissions.BasePermission):
+
+class AsyncPermissionMixin:
+    """
+    Асинхронные проверки для async view (config.async_views).
+
+    По умолчанию синхронная проверка выполняется в потоке; классы без
+    обращений к БД переопределяют ahas_permission/ahas_object_permission.
+    """
+
+    async def ahas_permission(self, request, view):
+        return await sync_to_async(self.has_permission)(request, view)
+
+    async def ahas_object_permission(self, request, view, obj):
+        return await sync_to_async(self.has_object_permission)(request, view, obj)
+
+
+class IsAuthenticated(AsyncPermissionMixin, permissions.IsAuthenticated):
+    async def ahas_permission(self, request, view):
+        return self.has_permission(request, view)
+
+    async def ahas_object_permission(self, request, view, obj):
+        return self.has_object_permission(request, view, obj)
+
+
+class IsAdminOrOwner(AsyncPermissionMixin, permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         return request.user.is_staff or obj == request.user
 
+    async def ahas_object_permission(self, request, view, obj):
+        return self.has_object_permission(request, view, obj)
 
-class IsModerator(permissions.BasePermission):
+
+class IsModerator(AsyncPermissionMixin, permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='moderators').exists()
+        return is_moderator(request)
+
+    async def ahas_permission(self, request, view):
+        return await ais_moderator(request)
 
 
-class IsOwner(permissions.BasePermission):
+class IsOwner(AsyncPermissionMixin, permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         return obj.owner == request.user
+
+    async def ahas_object_permission(self, request, view, obj):
+        # owner_id вместо owner: без запроса владельца к БД
+        return obj.owner_id == request.user.pk
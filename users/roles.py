@@ -0,0 +1,111 @@
+import threading
+import time
+
+from django.conf import settings
+
+MODERATORS_GROUP = 'moderators'
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _get_ttl():
+    return getattr(settings, 'ROLE_CACHE_TTL', 60)
+
+
+def _get_cached_groups(user):
+    with _lock:
+        cached = _cache.get(user.pk)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    return None
+
+
+def _set_cached_groups(user, groups):
+    with _lock:
+        _cache[user.pk] = (time.monotonic() + _get_ttl(), groups)
+
+
+def _load_groups(user):
+    """Загрузка групп пользователя с учетом общего кэша процесса"""
+    groups = _get_cached_groups(user)
+    if groups is None:
+        groups = frozenset(user.groups.values_list('name', flat=True))
+        _set_cached_groups(user, groups)
+    return groups
+
+
+async def _aload_groups(user):
+    groups = _get_cached_groups(user)
+    if groups is None:
+        groups = frozenset([name async for name in user.groups.values_list('name', flat=True)])
+        _set_cached_groups(user, groups)
+    return groups
+
+
+def _get_request_groups(request):
+    """Группы, уже известные для запроса: сохраненные на нем или из JWT claims"""
+    # DRF Request оборачивает HttpRequest: храним значение на исходном запросе
+    http_request = getattr(request, '_request', request)
+    groups = getattr(http_request, '_user_groups', None)
+    if groups is None:
+        # Пользователь из JWT claims уже знает свои группы
+        groups = getattr(request.user, 'token_groups', None)
+    return http_request, groups
+
+
+def get_user_groups(request):
+    """
+    Названия групп текущего пользователя.
+
+    Результат сохраняется на запросе, поэтому права и get_queryset
+    внутри одного запроса обращаются к БД не больше одного раза.
+    """
+    user = request.user
+    if not user or not user.is_authenticated:
+        return frozenset()
+
+    http_request, groups = _get_request_groups(request)
+    if groups is None:
+        groups = _load_groups(user)
+    http_request._user_groups = groups
+    return groups
+
+
+async def aget_user_groups(request):
+    """Асинхронный вариант get_user_groups для async view"""
+    user = request.user
+    if not user or not user.is_authenticated:
+        return frozenset()
+
+    http_request, groups = _get_request_groups(request)
+    if groups is None:
+        groups = await _aload_groups(user)
+    http_request._user_groups = groups
+    return groups
+
+
+def is_moderator(request):
+    return MODERATORS_GROUP in get_user_groups(request)
+
+
+def is_staff_or_moderator(request):
+    return request.user.is_staff or is_moderator(request)
+
+
+async def ais_moderator(request):
+    return MODERATORS_GROUP in await aget_user_groups(request)
+
+
+async def ais_staff_or_moderator(request):
+    return request.user.is_staff or await ais_moderator(request)
+
+
+def invalidate_user_groups(user_ids=None):
+    """Сброс кэша групп для указанных пользователей (или для всех)"""
+    with _lock:
+        if user_ids is None:
+            _cache.clear()
+        else:
+            for user_id in user_ids:
+                _cache.pop(user_id, None)
@@ -1,5 +1,9 @@
 from django.contrib.auth.hashers import make_password
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+
+from config.serializers import ImageVariantsField, LazyImageField
+from .authentication import add_user_claims
 from .models import Payment, CustomUser
 
 
@@ -43,13 +47,18 @@ class PaymentSerializer(serializers.ModelSerializer):
 
 
 class UserSerializer(serializers.ModelSerializer):
+    avatar = LazyImageField()
+    avatar_variants = ImageVariantsField(source='avatar')
+
     class Meta:
         model = CustomUser
-        fields = ['id', 'email', 'password', 'phone', 'city', 'avatar']
+        fields = ['id', 'email', 'password', 'phone', 'city', 'avatar', 'avatar_variants']
         extra_kwargs = {'password': {'write_only': True}}
 
     def create(self, validated_data):
         validated_data['password'] = make_password(validated_data['password'])
+        # username уникален, но не передается: пустое значение допускает только одного пользователя
+        validated_data.setdefault('username', validated_data['email'])
         return super().create(validated_data)
 
 
@@ -62,11 +71,33 @@ class UserRegisterSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         user = CustomUser.objects.create(
             email=validated_data['email'],
+            username=validated_data['email'],
             password=make_password(validated_data['password'])
         )
         return user
 
 
+class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Токен с ролями пользователя для ClaimsJWTAuthentication"""
+
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
+
 class StripePaymentResponseSerializer(serializers.Serializer):
     payment_url = serializers.URLField()
     payment_id = serializers.IntegerField(required=False)
+
+
+class PaymentStatusSerializer(serializers.ModelSerializer):
+    payment_id = serializers.IntegerField(source='id', read_only=True)
+    job_status = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Payment
+        fields = ['payment_id', 'is_paid', 'stripe_payment_status', 'stripe_payment_link', 'job_status']
+
+    def get_job_status(self, obj) -> str | None:
+        job = getattr(obj, 'checkout_job', None)
+        return job.status if job else None
@@ -0,0 +1,58 @@
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from config.services.image_service import track_image_fields
+from users.authentication import mark_claims_changed, restore_user, revoke_user
+from users.models import ClaimsUser, CustomUser
+from users.roles import invalidate_user_groups
+
+track_image_fields(CustomUser, 'avatar')
+
+
+@receiver(m2m_changed, sender=CustomUser.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Сброс кэша ролей при изменении состава групп"""
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    if not reverse:
+        invalidate_user_groups([instance.pk])
+        mark_claims_changed([instance.pk])
+    elif pk_set:
+        invalidate_user_groups(pk_set)
+        mark_claims_changed(pk_set)
+    else:
+        # group.customuser_set.clear(): затронутые пользователи неизвестны
+        invalidate_user_groups()
+        mark_claims_changed()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, **kwargs):
+    """Переименование или удаление группы затрагивает всех ее участников"""
+    invalidate_user_groups()
+    mark_claims_changed()
+
+
+# ClaimsUser - proxy: его сохранение отправляет сигнал с sender=ClaimsUser
+@receiver(post_save, sender=CustomUser)
+@receiver(post_save, sender=ClaimsUser)
+def user_changed(sender, instance, created, **kwargs):
+    invalidate_user_groups([instance.pk])
+    if created:
+        return
+    # Уже выданные токены: деактивация отзывает их, остальные изменения
+    # (например, is_staff) заставляют сверить claims с БД
+    if instance.is_active:
+        restore_user(instance.pk)
+    else:
+        revoke_user(instance.pk)
+    mark_claims_changed([instance.pk])
+
+
+@receiver(post_delete, sender=CustomUser)
+@receiver(post_delete, sender=ClaimsUser)
+def user_deleted(sender, instance, **kwargs):
+    invalidate_user_groups([instance.pk])
+    revoke_user(instance.pk)
@@ -0,0 +1,114 @@
+"""
+Обработка событий вебхука Stripe.
+
+События сохраняются в StripeEvent (уникальный event_id отсекает повторные
+доставки) и применяются пачками: на каждый итоговый статус платежа
+выполняется один UPDATE, независимо от количества событий.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.utils import timezone
+
+from materials import counters
+from users.models import Payment, StripeEvent
+
+SESSION_COMPLETED = 'checkout.session.completed'
+SESSION_PAYMENT_SUCCEEDED = 'checkout.session.async_payment_succeeded'
+SESSION_PAYMENT_FAILED = 'checkout.session.async_payment_failed'
+SESSION_EXPIRED = 'checkout.session.expired'
+
+HANDLED_EVENTS = {
+    SESSION_COMPLETED,
+    SESSION_PAYMENT_SUCCEEDED,
+    SESSION_PAYMENT_FAILED,
+    SESSION_EXPIRED,
+}
+
+
+def record_event(event):
+    """
+    Сохранение события для последующей обработки.
+
+    Повторная доставка того же события игнорируется уникальным индексом
+    event_id. Возвращает False для неподдерживаемых типов событий.
+    """
+    if event['type'] not in HANDLED_EVENTS:
+        return False
+    session = event['data']['object']
+    StripeEvent.objects.bulk_create([
+        StripeEvent(
+            event_id=event['id'],
+            event_type=event['type'],
+            session_id=session.get('id'),
+            payment_status=session.get('payment_status')
+        )
+    ], ignore_conflicts=True)
+    return True
+
+
+def mark_sessions_paid(session_ids):
+    """
+    Отметка платежей по сессиям как оплаченных.
+
+    update() не вызывает сигналы, поэтому выручка курсов пересчитывается
+    здесь же: по сумме оплаченных платежей на курс.
+    """
+    with transaction.atomic():
+        payments = list(
+            Payment.objects.select_for_update().filter(
+                stripe_session_id__in=session_ids, is_paid=False
+            ).order_by().values_list('pk', 'paid_course_id', 'amount')
+        )
+        if not payments:
+            return 0
+        Payment.objects.filter(pk__in=[pk for pk, _, _ in payments]).update(
+            is_paid=True, stripe_payment_status='paid'
+        )
+        revenue = Counter()
+        for _, course_id, amount in payments:
+            revenue[course_id] += amount
+        counters.apply_deltas('revenue', revenue)
+    return len(payments)
+
+
+def mark_sessions_status(session_ids, payment_status):
+    """Смена статуса неоплаченных платежей (оплаченные не откатываются)"""
+    return Payment.objects.filter(
+        stripe_session_id__in=session_ids, is_paid=False
+    ).update(stripe_payment_status=payment_status)
+
+
+def process_pending_events(limit=1000):
+    """Применение необработанных событий пачкой, возвращает их количество"""
+    with transaction.atomic():
+        events = list(
+            StripeEvent.objects.select_for_update(skip_locked=True).filter(
+                processed_at__isnull=True
+            ).order_by('received_at')[:limit]
+        )
+        if not events:
+            return 0
+
+        paid, failed, expired = set(), set(), set()
+        for event in events:
+            if event.event_type == SESSION_PAYMENT_SUCCEEDED or (
+                event.event_type == SESSION_COMPLETED and event.payment_status == 'paid'
+            ):
+                paid.add(event.session_id)
+            elif event.event_type == SESSION_PAYMENT_FAILED:
+                failed.add(event.session_id)
+            elif event.event_type == SESSION_EXPIRED:
+                expired.add(event.session_id)
+
+        if paid:
+            mark_sessions_paid(paid)
+        if failed:
+            mark_sessions_status(failed, 'failed')
+        if expired:
+            mark_sessions_status(expired, 'expired')
+
+        StripeEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+            processed_at=timezone.now()
+        )
+    return len(events)
@@ -1,3 +1,516 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import json
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+import stripe
+
+from materials.models import Course, Lesson
+from users.checkout_queue import claim_jobs, process_jobs, run_job
+from users.models import CheckoutJob, ClaimsUser, CustomUser as User, Payment, StripeEvent
+from users.stripe_events import process_pending_events, record_event
+from users.roles import invalidate_user_groups
+
+
+class RoleCacheTestCase(APITestCase):
+    """Тесты кэша ролей пользователя"""
+
+    def setUp(self):
+        invalidate_user_groups()
+        self.owner = User.objects.create_user(
+            email='owner@test.com',
+            password='testpass123',
+            username='owner'
+        )
+        self.moderator = User.objects.create_user(
+            email='moderator@test.com',
+            password='testpass123',
+            username='moderator'
+        )
+        self.group = Group.objects.create(name='moderators')
+        self.moderator.groups.add(self.group)
+        self.course = Course.objects.create(name='Test Course', owner=self.owner)
+        self.lesson = Lesson.objects.create(name='Test Lesson', course=self.course, owner=self.owner)
+
+    def count_group_queries(self, queries):
+        return sum('auth_group' in query['sql'] for query in queries)
+
+    def test_groups_loaded_once_per_request(self):
+        """Права и get_queryset используют одну загрузку групп"""
+        self.client.force_authenticate(user=self.moderator)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(
+                reverse('lessons-detail', args=[self.lesson.id]),
+                {'name': 'Updated Lesson'},
+                format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.count_group_queries(context.captured_queries), 1)
+
+    def test_groups_cached_between_requests(self):
+        """Повторный запрос берет группы из кэша процесса"""
+        self.client.force_authenticate(user=self.moderator)
+        self.client.get(reverse('lessons-list'))
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('lessons-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.count_group_queries(context.captured_queries), 0)
+
+    def test_cache_invalidated_on_group_change(self):
+        """Изменение групп сразу отражается на правах"""
+        self.client.force_authenticate(user=self.moderator)
+        response = self.client.get(reverse('lessons-list'))
+        self.assertEqual(response.json()['count'], 1)
+
+        self.moderator.groups.remove(self.group)
+        response = self.client.get(reverse('lessons-list'))
+        self.assertEqual(response.json()['count'], 0)
+
+        self.group.customuser_set.add(self.moderator)
+        response = self.client.get(reverse('lessons-list'))
+        self.assertEqual(response.json()['count'], 1)
+
+
+@override_settings(AUTH_CACHE_ALLOW_LOCAL=True)
+class ClaimsJWTAuthenticationTestCase(APITestCase):
+    """Тесты аутентификации по claims JWT"""
+
+    def setUp(self):
+        invalidate_user_groups()
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            username='user'
+        )
+        self.group = Group.objects.create(name='moderators')
+        self.user.groups.add(self.group)
+        course = Course.objects.create(name='Test Course', owner=self.user)
+        Lesson.objects.create(name='Test Lesson', course=course, owner=self.user)
+        # Токен должен быть выпущен позже изменения групп
+        caches['auth'].clear()
+
+    def authenticate(self):
+        response = self.client.post(
+            reverse('token_obtain_pair'),
+            {'email': 'user@test.com', 'password': 'testpass123'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.json()['access']}")
+
+    def test_no_user_queries(self):
+        """Пользователь и его группы берутся из токена"""
+        self.authenticate()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('lessons-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['count'], 1)
+        for query in context.captured_queries:
+            self.assertNotIn('users_customuser', query['sql'].split('WHERE')[0])
+            self.assertNotIn('auth_group', query['sql'])
+
+    def test_deactivated_user_rejected(self):
+        """Деактивация пользователя отзывает уже выданные токены"""
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(reverse('lessons-list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_claims_user_save_revokes(self):
+        """Сохранение пользователя, построенного из claims, тоже отзывает токены"""
+        self.authenticate()
+        user = ClaimsUser.from_db(None, ['id', 'is_staff', 'is_active'], [self.user.pk, False, True])
+        user.is_active = False
+        user.save()
+        response = self.client.get(reverse('lessons-list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revocation_survives_default_cache_eviction(self):
+        """Метки отзыва не вытесняются записями кэша ответов"""
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        max_entries = cache._max_entries
+        cache.set_many({f'filler:{i}': i for i in range(max_entries * 2)})
+        response = self.client.get(reverse('lessons-list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_claims_need_shared_memory_cache(self):
+        """С локальным кэшем auth или кэшем в БД пользователь читается из БД"""
+        backends = [
+            ({'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'auth'}, False),
+            ({'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'auth_test_cache'}, True),
+        ]
+        self.authenticate()
+        for backend, allow_local in backends:
+            caches_setting = {**settings.CACHES, 'auth': backend}
+            with self.subTest(backend=backend['BACKEND']), \
+                    override_settings(CACHES=caches_setting, AUTH_CACHE_ALLOW_LOCAL=allow_local):
+                call_command('createcachetable', 'auth_test_cache', verbosity=0)
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.get(reverse('lessons-list'))
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                sql = [query['sql'] for query in context.captured_queries]
+                self.assertTrue(any('users_customuser' in query for query in sql))
+                self.assertFalse(any('auth_test_cache' in query for query in sql))
+
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        with override_settings(AUTH_CACHE_ALLOW_LOCAL=False):
+            response = self.client.get(reverse('lessons-list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_changed_claims_checked_in_db(self):
+        """После смены групп claims старого токена не используются"""
+        self.authenticate()
+        self.user.groups.remove(self.group)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('lessons-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(any('auth_group' in query['sql'] for query in context.captured_queries))
+
+    def test_deferred_fields_loaded_once(self):
+        """Отложенные поля подгружаются одним запросом"""
+        user = ClaimsUser.from_db(None, ['id', 'is_staff', 'is_active'], [self.user.pk, False, True])
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, 'user@test.com')
+            self.assertEqual(user.username, 'user')
+            self.assertEqual(user.phone, self.user.phone)
+
+
+class PaymentListTestCase(APITestCase):
+    """Тесты списка и выгрузки платежей"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            username='testuser'
+        )
+        self.course = Course.objects.create(name='Test Course', owner=self.user)
+        Payment.objects.bulk_create([
+            Payment(
+                user=self.user,
+                paid_course=self.course if i % 2 else None,
+                amount=100 * (i + 1),
+                payment_method='cash' if i % 2 else 'transfer'
+            )
+            for i in range(25)
+        ])
+        self.client.force_authenticate(user=self.user)
+
+    def test_list_is_paginated(self):
+        """Список платежей отдается постранично"""
+        response = self.client.get(reverse('payment-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['count'], 25)
+        self.assertEqual(len(response.json()['results']), 20)
+
+    def test_export_ndjson(self):
+        """Выгрузка NDJSON учитывает фильтры и совпадает с форматом API"""
+        response = self.client.get(
+            reverse('payment-export'),
+            {'payment_method': 'cash'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(len(rows), 12)
+
+        api_rows = self.client.get(
+            reverse('payment-list'),
+            {'payment_method': 'cash'}
+        ).json()['results']
+        self.assertEqual(rows, api_rows)
+
+    def test_export_csv(self):
+        """Выгрузка CSV содержит заголовок и все платежи"""
+        response = self.client.get(reverse('payment-export'), {'export_format': 'csv'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 26)
+        self.assertTrue(lines[0].startswith('id,'))
+
+    def test_export_unknown_format(self):
+        response = self.client.get(reverse('payment-export'), {'export_format': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class StubStripe:
+    """Локальная заглушка клиента Stripe, считающая вызовы API"""
+
+    def __init__(self):
+        self.calls = []
+        self.Product = self._resource('product', 'prod')
+        self.Price = self._resource('price', 'price')
+        self.checkout = SimpleNamespace(Session=self._resource('session', 'cs'))
+
+    def _resource(self, kind, prefix):
+        def create(**params):
+            self.calls.append((kind, params))
+            object_id = f'{prefix}_{len(self.calls)}'
+            return SimpleNamespace(id=object_id, url=f'https://checkout.test/{object_id}', **params)
+        return SimpleNamespace(create=create)
+
+    def count(self, kind):
+        return sum(call_kind == kind for call_kind, _ in self.calls)
+
+
+class StripeCheckoutTestCase(APITestCase):
+    """Тесты создания оплаты с сохраненными продуктом и ценой Stripe"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            username='testuser'
+        )
+        self.course = Course.objects.create(name='Test Course', owner=self.user, price=1500)
+        self.stripe = StubStripe()
+        patcher = patch('config.services.stripe_service.stripe', self.stripe)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.force_authenticate(user=self.user)
+
+    def checkout(self):
+        response = self.client.post(reverse('create-stripe-payment', args=[self.course.id]))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response
+
+    def test_product_and_price_created_once(self):
+        """Повторные оплаты создают только сессию"""
+        self.checkout()
+        self.checkout()
+        self.assertEqual(self.stripe.count('product'), 1)
+        self.assertEqual(self.stripe.count('price'), 1)
+        self.assertEqual(self.stripe.count('session'), 2)
+        price_params = dict(self.stripe.calls)['price']
+        self.assertEqual(price_params['unit_amount'], 150000)
+
+        payments = Payment.objects.filter(paid_course=self.course)
+        self.assertEqual(payments.count(), 2)
+        self.assertEqual(len({payment.stripe_price_id for payment in payments}), 1)
+
+    def test_price_change_creates_new_price(self):
+        """Изменение цены создает новую цену для прежнего продукта"""
+        self.checkout()
+        self.course.price = 2000
+        self.course.save()
+        self.checkout()
+        self.assertEqual(self.stripe.count('product'), 1)
+        self.assertEqual(self.stripe.count('price'), 2)
+
+    def test_name_change_creates_new_product(self):
+        """Изменение названия создает новый продукт и цену"""
+        self.checkout()
+        self.course.name = 'Renamed Course'
+        self.course.save()
+        self.checkout()
+        self.assertEqual(self.stripe.count('product'), 2)
+        self.assertEqual(self.stripe.count('price'), 2)
+
+
+class AsyncCheckoutTestCase(APITestCase):
+    """Тесты асинхронного создания оплаты через очередь"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            username='testuser'
+        )
+        self.course = Course.objects.create(name='Test Course', owner=self.user, price=1500)
+        self.stripe = StubStripe()
+        patcher = patch('config.services.stripe_service.stripe', self.stripe)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.force_authenticate(user=self.user)
+
+    def enqueue(self):
+        response = self.client.post(
+            reverse('create-stripe-payment', args=[self.course.id]) + '?async=true'
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        return response.json()
+
+    def test_async_checkout(self):
+        """Запрос не обращается к Stripe, ссылку создает воркер"""
+        data = self.enqueue()
+        self.assertEqual(self.stripe.calls, [])
+
+        response = self.client.get(data['status_url'])
+        self.assertEqual(response.json()['stripe_payment_status'], 'pending')
+        self.assertIsNone(response.json()['stripe_payment_link'])
+
+        self.assertEqual(process_jobs(), 1)
+        response = self.client.get(data['status_url'])
+        self.assertEqual(response.json()['job_status'], CheckoutJob.STATUS_DONE)
+        self.assertEqual(response.json()['stripe_payment_status'], 'open')
+        self.assertTrue(response.json()['stripe_payment_link'].startswith('https://checkout.test/'))
+
+    def test_failed_job_is_retried_with_backoff(self):
+        """Ошибка Stripe откладывает задачу, после лимита попыток платеж помечается ошибочным"""
+        data = self.enqueue()
+        self.stripe.Product.create = Mock(side_effect=RuntimeError('Stripe недоступен'))
+
+        with self.assertLogs('users.checkout_queue', 'WARNING'):
+            self.assertEqual(process_jobs(), 1)
+        job = CheckoutJob.objects.get(payment_id=data['payment_id'])
+        self.assertEqual(job.status, CheckoutJob.STATUS_PENDING)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertEqual(process_jobs(), 0)
+
+        with self.settings(CHECKOUT_JOB_MAX_ATTEMPTS=2):
+            CheckoutJob.objects.update(run_after=timezone.now())
+            with self.assertLogs('users.checkout_queue', 'WARNING'):
+                self.assertEqual(process_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, CheckoutJob.STATUS_FAILED)
+        self.assertEqual(job.payment.stripe_payment_status, 'failed')
+
+    def test_reclaimed_job_result_discarded(self):
+        """Медленный воркер, у которого задачу забрали по таймауту, не перезаписывает сессию"""
+        data = self.enqueue()
+        [slow] = claim_jobs()
+        stale = timezone.now() - timedelta(seconds=settings.CHECKOUT_JOB_TIMEOUT + 1)
+        CheckoutJob.objects.update(locked_at=stale)
+        [fresh] = claim_jobs()
+        self.assertNotEqual(slow.lease, fresh.lease)
+
+        self.assertTrue(run_job(fresh))
+        link = Payment.objects.get(pk=data['payment_id']).stripe_payment_link
+        with self.assertLogs('users.checkout_queue', 'WARNING'):
+            self.assertFalse(run_job(slow))
+        self.assertEqual(Payment.objects.get(pk=data['payment_id']).stripe_payment_link, link)
+        self.assertEqual(CheckoutJob.objects.get(pk=fresh.pk).status, CheckoutJob.STATUS_DONE)
+
+        # Оба воркера выполняли одну попытку: Stripe получил одинаковый ключ
+        keys = [params['idempotency_key'] for kind, params in self.stripe.calls if kind == 'session']
+        self.assertEqual(keys, [f"checkout-{data['payment_id']}-1"] * 2)
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET='whsec_test')
+class StripeWebhookTestCase(APITestCase):
+    """Тесты подтверждения оплаты вебхуком Stripe"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+            username='testuser'
+        )
+        self.course = Course.objects.create(name='Test Course', owner=self.user, price=1000)
+        self.payments = [
+            Payment.objects.create(
+                user=self.user,
+                paid_course=self.course,
+                amount=1000,
+                payment_method='stripe',
+                stripe_session_id=f'cs_test_{i}'
+            )
+            for i in range(3)
+        ]
+
+    def send(self, event, secret='whsec_test'):
+        payload = json.dumps(event)
+        timestamp = int(time.time())
+        signature = hmac.new(
+            secret.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256
+        ).hexdigest()
+        return self.client.post(
+            reverse('payment-webhook'),
+            data=payload,
+            content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=f't={timestamp},v1={signature}'
+        )
+
+    def make_event(self, event_id, session_id, event_type='checkout.session.completed'):
+        return {
+            'id': event_id,
+            'object': 'event',
+            'type': event_type,
+            'data': {'object': {'id': session_id, 'object': 'checkout.session', 'payment_status': 'paid'}},
+        }
+
+    def test_completed_event_marks_payment_paid(self):
+        response = self.send(self.make_event('evt_1', 'cs_test_0'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.payments[0].refresh_from_db()
+        self.assertTrue(self.payments[0].is_paid)
+        self.assertEqual(self.payments[0].stripe_payment_status, 'paid')
+        self.assertFalse(Payment.objects.filter(pk=self.payments[1].pk, is_paid=True).exists())
+
+    def test_invalid_signature_rejected(self):
+        response = self.send(self.make_event('evt_1', 'cs_test_0'), secret='whsec_other')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(StripeEvent.objects.exists())
+
+    def test_duplicate_event_stored_once(self):
+        event = self.make_event('evt_1', 'cs_test_0')
+        self.send(event)
+        self.send(event)
+        self.assertEqual(StripeEvent.objects.count(), 1)
+
+    def test_events_applied_in_batch(self):
+        """Пачка событий применяется фиксированным числом запросов"""
+        for i, payment in enumerate(self.payments):
+            record_event(self.make_event(f'evt_{i}', payment.stripe_session_id))
+        record_event(self.make_event('evt_expired', 'cs_test_0', 'checkout.session.expired'))
+
+        # Оплата: выборка платежей, UPDATE платежей и один UPDATE выручки курсов
+        with self.assertNumQueries(10):
+            self.assertEqual(process_pending_events(), 4)
+        self.assertEqual(Payment.objects.filter(is_paid=True).count(), 3)
+        self.assertEqual(Payment.objects.filter(stripe_payment_status='paid').count(), 3)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.revenue, 3000)
+
+    def test_success_page_verifies_session(self):
+        """Страница успешной оплаты проверяет статус сессии в Stripe"""
+        self.client.force_authenticate(user=self.user)
+        url = reverse('payment-success')
+        with patch('users.views.retrieve_stripe_session', return_value=SimpleNamespace(payment_status='unpaid')):
+            response = self.client.get(url, {'session_id': 'cs_test_0'})
+        self.assertEqual(response.json()['status'], 'Payment processed')
+        self.assertFalse(Payment.objects.filter(is_paid=True).exists())
+
+        with patch('users.views.retrieve_stripe_session', return_value=SimpleNamespace(payment_status='paid')):
+            response = self.client.get(url, {'session_id': 'cs_test_0'})
+        self.assertEqual(response.json()['status'], 'Payment successful')
+        self.payments[0].refresh_from_db()
+        self.assertTrue(self.payments[0].is_paid)
+
+    def test_success_page_stripe_error(self):
+        """Ошибка Stripe не ломает страницу успешной оплаты"""
+        self.client.force_authenticate(user=self.user)
+        error = stripe.InvalidRequestError('No such checkout.session', 'id')
+        with patch('users.views.retrieve_stripe_session', side_effect=error), self.assertLogs('users.views', 'WARNING'):
+            response = self.client.get(reverse('payment-success'), {'session_id': 'cs_test_0'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['status'], 'Payment processed')
+        self.assertFalse(Payment.objects.filter(is_paid=True).exists())
+
+
+class RegisterTestCase(APITestCase):
+    """Тесты регистрации"""
+
+    def test_register_several_users(self):
+        """username заполняется email, поэтому регистрируется больше одного пользователя"""
+        for email in ('first@test.com', 'second@test.com'):
+            response = self.client.post(reverse('register'), {'email': email, 'password': 'testpass123'})
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(User.objects.get(email='second@test.com').username, 'second@test.com')
@@ -1,32 +1,49 @@
+import logging
 from datetime import date
 
+from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, generics, permissions, status
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
+import stripe
 
-from config.services.stripe_service import create_stripe_product, create_stripe_price, create_stripe_checkout_session
+from config.services.stripe_service import get_or_create_course_price, create_stripe_checkout_session, \
+    construct_webhook_event, retrieve_stripe_session
+from config.fast_serialization import FastListMixin
+from config.uploads import LimitedUploadMixin
 from materials.models import Course
+from users.checkout_queue import enqueue_checkout
+from users.exports import stream_csv, stream_ndjson
 from users.filters import PaymentFilter
 from users.models import Payment, CustomUser
+from users.paginators import PaymentPagination
 from users.permissions import IsAdminOrOwner
-from users.serializers import PaymentSerializer, UserSerializer, UserRegisterSerializer, StripePaymentResponseSerializer
+from users.serializers import PaymentSerializer, UserSerializer, UserRegisterSerializer, \
+    StripePaymentResponseSerializer, PaymentStatusSerializer, CustomTokenObtainPairSerializer
+from users.stripe_events import mark_sessions_paid, process_pending_events, record_event
 
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
 
+logger = logging.getLogger(__name__)
+
 
 @extend_schema(
     tags=['Платежи'],
     description='Управление платежами пользователей'
 )
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(FastListMixin, viewsets.ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = PaymentFilter
+    pagination_class = PaymentPagination
 
     @extend_schema(
         summary='Список платежей',
@@ -54,28 +71,70 @@ class PaymentViewSet(viewsets.ModelViewSet):
         examples=[
             OpenApiExample(
                 'Пример ответа',
-                value=[
-                    {
-                        "id": 1,
-                        "user": 1,
-                        "payment_date": "2023-10-15T12:00:00Z",
-                        "course": 5,
-                        "amount": 10000,
-                        "payment_method": "transfer"
-                    }
-                ]
+                value={
+                    "count": 1,
+                    "next": None,
+                    "previous": None,
+                    "results": [
+                        {
+                            "id": 1,
+                            "user": 1,
+                            "payment_date": "2023-10-15 12:00:00",
+                            "paid_course": 5,
+                            "amount": 10000,
+                            "payment_method": "transfer"
+                        }
+                    ]
+                }
             )
         ]
     )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
+    @extend_schema(
+        summary='Выгрузка платежей',
+        description='Потоковая выгрузка отфильтрованных платежей в NDJSON или CSV. '
+                    'Поддерживает те же фильтры, что и список.',
+        parameters=[
+            OpenApiParameter(
+                name='export_format',
+                type=str,
+                enum=['ndjson', 'csv'],
+                description='Формат выгрузки (по умолчанию ndjson)',
+                required=False
+            ),
+        ],
+        responses={200: {'description': 'Поток платежей в выбранном формате'}}
+    )
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        """Выгрузка платежей с постоянным потреблением памяти"""
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format == 'csv':
+            stream, content_type, extension = stream_csv, 'text/csv', 'csv'
+        elif export_format == 'ndjson':
+            stream, content_type, extension = stream_ndjson, 'application/x-ndjson', 'ndjson'
+        else:
+            return Response(
+                {'error': 'export_format должен быть ndjson или csv'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(
+            stream(queryset, self.get_serializer()),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = f'attachment; filename="payments.{extension}"'
+        return response
+
 
 @extend_schema(
     tags=['Пользователи'],
     description='Управление пользователями (только для администраторов)'
 )
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(LimitedUploadMixin, viewsets.ModelViewSet):
     queryset = CustomUser.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated, IsAdminOrOwner]
@@ -184,6 +243,7 @@ class RegisterView(generics.CreateAPIView):
     ]
 )
 class CustomTokenObtainPairView(TokenObtainPairView):
+    serializer_class = CustomTokenObtainPairSerializer
     permission_classes = [permissions.AllowAny]
 
 
@@ -198,7 +258,29 @@ class StripePaymentCreateAPIView(APIView):
 
     @extend_schema(
         summary='Создать платеж Stripe',
+        description='В асинхронном режиме (?async=true или STRIPE_CHECKOUT_ASYNC) платеж '
+                    'создается сразу, а сессия Stripe - фоновым воркером. '
+                    'Ссылку на оплату нужно получать по status_url.',
+        parameters=[
+            OpenApiParameter(
+                name='async',
+                type=bool,
+                description='Создать сессию оплаты в фоне',
+                required=False
+            ),
+        ],
         responses={
+            202: {
+                'description': 'Платеж поставлен в очередь',
+                'content': {
+                    'application/json': {
+                        'example': {
+                            'payment_id': 1,
+                            'status_url': 'http://api.example.com/users/payments/1/status/'
+                        }
+                    }
+                }
+            },
             201: {
                 'description': 'Ссылка для оплаты',
                 'content': {
@@ -218,18 +300,6 @@ class StripePaymentCreateAPIView(APIView):
         try:
             course = Course.objects.get(id=course_id)
 
-            # Создаем продукт в Stripe
-            product = create_stripe_product(
-                name=f'Курс: {course.name}',
-                description=course.description[:500]
-            )
-
-            # Создаем цену в Stripe (умножаем на 100 для перевода в копейки)
-            price = create_stripe_price(
-                product_id=product.id,
-                amount=course.price * 100 if course.price else 0
-            )
-
             # URL для редиректа после оплаты
             success_url = request.build_absolute_uri(
                 reverse('payment-success') + f'?session_id={{CHECKOUT_SESSION_ID}}'
@@ -238,9 +308,31 @@ class StripePaymentCreateAPIView(APIView):
                 reverse('payment-cancel')
             )
 
+            if self.use_async(request):
+                # Запросы к Stripe выполнит воркер run_checkout_worker
+                with transaction.atomic():
+                    payment = Payment.objects.create(
+                        user=request.user,
+                        paid_course=course,
+                        amount=course.price,
+                        payment_method='stripe',
+                        stripe_payment_status='pending'
+                    )
+                    enqueue_checkout(payment, success_url, cancel_url)
+                return Response({
+                    'payment_id': payment.id,
+                    'status_url': request.build_absolute_uri(
+                        reverse('payment-status', args=[payment.id])
+                    )
+                }, status=status.HTTP_202_ACCEPTED)
+
+            # Продукт и цена создаются в Stripe только при первой оплате
+            # или после изменения названия/цены курса
+            stripe_price = get_or_create_course_price(course)
+
             # Создаем сессию оплаты в Stripe
             session = create_stripe_checkout_session(
-                price_id=price.id,
+                price_id=stripe_price.stripe_price_id,
                 success_url=success_url,
                 cancel_url=cancel_url
             )
@@ -251,8 +343,8 @@ class StripePaymentCreateAPIView(APIView):
                 paid_course=course,
                 amount=course.price,
                 payment_method='stripe',
-                stripe_product_id=product.id,
-                stripe_price_id=price.id,
+                stripe_product_id=stripe_price.stripe_product_id,
+                stripe_price_id=stripe_price.stripe_price_id,
                 stripe_session_id=session.id,
                 stripe_payment_link=session.url
             )
@@ -273,6 +365,25 @@ class StripePaymentCreateAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    def use_async(self, request):
+        value = request.query_params.get('async')
+        if value is None:
+            return settings.STRIPE_CHECKOUT_ASYNC
+        return value.lower() in ('1', 'true')
+
+
+@extend_schema(
+    tags=['Платежи'],
+    summary='Статус платежа',
+    description='Статус платежа и ссылка на оплату (появляется после обработки фоновым воркером)'
+)
+class PaymentStatusAPIView(generics.RetrieveAPIView):
+    serializer_class = PaymentStatusSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return Payment.objects.filter(user=self.request.user).select_related('checkout_job')
+
 
 class PaymentSuccessAPIView(APIView):
     """Обработка успешной оплаты"""
@@ -280,16 +391,44 @@ class PaymentSuccessAPIView(APIView):
     def get(self, request):
         session_id = request.GET.get('session_id')
         if session_id:
-            try:
-                payment = Payment.objects.get(stripe_session_id=session_id)
+            payment = Payment.objects.filter(stripe_session_id=session_id).first()
+            # Статус подтверждается вебхуком; если он еще не пришел,
+            # проверяем сессию в Stripe, а не доверяем параметру запроса
+            if payment and not payment.is_paid and self.session_paid(session_id):
+                mark_sessions_paid([session_id])
                 payment.is_paid = True
-                payment.stripe_payment_status = 'paid'
-                payment.save()
+            if payment and payment.is_paid:
                 return Response({'status': 'Payment successful'})
-            except Payment.DoesNotExist:
-                pass
         return Response({'status': 'Payment processed'})
 
+    def session_paid(self, session_id):
+        try:
+            return retrieve_stripe_session(session_id).payment_status == 'paid'
+        except stripe.StripeError as e:
+            # Платеж все равно подтвердит вебхук
+            logger.warning('Failed to retrieve Stripe session %s: %s', session_id, e)
+            return False
+
+
+@extend_schema(exclude=True)
+class StripeWebhookAPIView(APIView):
+    """Прием вебхуков Stripe с проверкой подписи"""
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request):
+        try:
+            event = construct_webhook_event(
+                request.body,
+                request.META.get('HTTP_STRIPE_SIGNATURE', '')
+            )
+        except (ValueError, stripe.SignatureVerificationError):
+            return Response({'error': 'Неверная подпись'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if record_event(event):
+            process_pending_events()
+        return Response({'received': True})
+
 
 class PaymentCancelAPIView(APIView):
     """Обработка отмены оплаты"""